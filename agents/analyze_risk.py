@@ -1,30 +1,56 @@
+import numpy as np
 import pandas as pd
 
+from agents import config
+from agents.state import get_inventory_frame, set_inventory_frame
+
+def effective_daily_demand(df: pd.DataFrame, dtype=np.float64) -> np.ndarray:
+    """Average daily demand, falling back to the 30-day forecast where it is 0 or missing."""
+    average = df['average_daily_demand'].fillna(0).to_numpy(dtype=dtype)
+    if 'forecasted_demand_30d' in df:
+        forecast = df['forecasted_demand_30d'].fillna(0).to_numpy(dtype=dtype) / dtype(30)
+    else:
+        forecast = np.zeros(len(df), dtype=dtype)
+    return np.where(average != 0, average, forecast)
+
+def compute_risk_metrics(df: pd.DataFrame, dtype=np.float64) -> pd.DataFrame:
+    """Vectorized stockout risk for every row of ``df``.
+
+    Rows with no demand get ``at_risk_of_stockout=False``, a missing
+    ``days_until_stockout`` and zero expected consumption.
+    """
+    dtype = np.dtype(dtype).type
+    daily_demand = effective_daily_demand(df, dtype)
+    available = df['available_stock'].to_numpy(dtype=dtype)
+    lead_time = df['average_lead_time_days'].to_numpy(dtype=dtype)
+
+    has_demand = daily_demand != 0
+    safe_demand = np.where(has_demand, daily_demand, dtype(1))
+    expected_consumption = daily_demand * lead_time
+
+    return pd.DataFrame({
+        'at_risk_of_stockout': has_demand & (available < expected_consumption),
+        'days_until_stockout': np.where(has_demand, np.round(available / safe_demand, 2), np.nan).astype(dtype),
+        'expected_consumption_during_lead_time': np.where(has_demand, np.round(expected_consumption, 2), 0).astype(dtype),
+    }, index=df.index)
+
 def risk_analyzer_node(state: dict) -> dict:
-    df = pd.DataFrame(state['inventory_data'])
+    df = get_inventory_frame(state).copy(deep=False)
 
     # Ensure demand values are filled
     df['average_daily_demand'] = df['average_daily_demand'].fillna(0)
-    df['forecasted_demand_30d'] = df.get('forecasted_demand_30d', 0)
-
-    def calculate_risk(row):
-        daily_demand = row['average_daily_demand'] or (row['forecasted_demand_30d'] / 30)
-        if daily_demand == 0:
-            return pd.Series({
-                'at_risk_of_stockout': False,
-                'days_until_stockout': None,
-                'expected_consumption_during_lead_time': 0
-            })
-
-        expected_consumption = daily_demand * row['average_lead_time_days']
-        return pd.Series({
-            'at_risk_of_stockout': row['available_stock'] < expected_consumption,
-            'days_until_stockout': round(row['available_stock'] / daily_demand, 2),
-            'expected_consumption_during_lead_time': round(expected_consumption, 2)
-        })
-
-    risk_metrics = df.apply(calculate_risk, axis=1)
-    df = pd.concat([df, risk_metrics], axis=1)
-
-    state['inventory_data'] = df.to_dict(orient='records')
-    return state
\ No newline at end of file
+    if 'forecasted_demand_30d' not in df:
+        df['forecasted_demand_30d'] = 0
+
+    risk_metrics = compute_risk_metrics(df, dtype=config.FLOAT_DTYPE)
+    if config.RISK_METHOD == 'simulation':
+        from agents.simulation import simulate_stockouts
+
+        simulated = simulate_stockouts(df)
+        risk_metrics['at_risk_of_stockout'] = simulated['stockout_probability'] > config.SIMULATION_RISK_THRESHOLD
+        risk_metrics[simulated.columns] = simulated
+    elif config.RISK_METHOD != 'deterministic':
+        raise ValueError(f"Unknown risk method {config.RISK_METHOD!r}; expected 'deterministic' or 'simulation'")
+    df[risk_metrics.columns] = risk_metrics
+
+    return set_inventory_frame(state, df)
@@ -1,38 +1,101 @@
+import numpy as np
 import pandas as pd
 
+from agents import config
+from agents.schema import ABC_CLASSES, ABC_XYZ_CLASSES, XYZ_CLASSES
+from agents.state import get_inventory_frame, set_inventory_frame
+
+FINANCIAL_CUTOFFS = (0.7, 0.9)  # cumulative revenue share closing the A and B classes
+
+def compute_revenue(df: pd.DataFrame) -> np.ndarray:
+    """30-day revenue per row, the basis of the financial ABC classification."""
+    return df["average_daily_demand"].fillna(0).to_numpy(dtype=float) * df["unit_cost"].to_numpy(dtype=float) * 30
+
+def abc_thresholds(revenue: np.ndarray, cutoffs=FINANCIAL_CUTOFFS) -> tuple:
+    """Smallest revenue still inside each class, from the catalog-wide revenue distribution.
+
+    A row belongs to the first class whose threshold its revenue reaches, so
+    the thresholds computed once over the whole catalog can classify any
+    subset of it (e.g. a shard) locally. Rows with equal revenue always share a class.
+    Only the revenue vector is sorted; the cut points are found with
+    ``np.searchsorted`` on its cumulative share.
+    """
+    revenue = -np.sort(-np.asarray(revenue, dtype=float))  # descending
+    total = revenue.sum()
+    if total <= 0:
+        return tuple(np.inf for _ in cutoffs)
+
+    share = np.cumsum(revenue) / total
+    # Rows whose running share stays within each cutoff, then back off to the
+    # start of a tie group that straddles the cutoff
+    inside = np.searchsorted(share, cutoffs, side="right")
+    last = revenue[np.maximum(inside - 1, 0)]
+    straddles = (inside < len(revenue)) & (revenue[np.minimum(inside, len(revenue) - 1)] == last)
+    group_start = len(revenue) - np.searchsorted(revenue[::-1], last, side="right")
+    first_outside = np.where(straddles, group_start, inside)
+    thresholds = np.where(first_outside > 0, revenue[np.maximum(first_outside - 1, 0)], np.inf)
+    return tuple(float(t) for t in thresholds)
+
+def assign_abc(revenue: np.ndarray, thresholds: tuple) -> pd.Categorical:
+    """Vectorized A/B/C assignment from precomputed revenue thresholds."""
+    threshold_a, threshold_b = thresholds
+    codes = np.where(revenue >= threshold_a, 0, np.where(revenue >= threshold_b, 1, 2))
+    return pd.Categorical.from_codes(codes, categories=ABC_CLASSES)
+
+def demand_variation(df: pd.DataFrame) -> np.ndarray:
+    """Coefficient of variation of daily demand; NaN where there is no demand or no variance estimate."""
+    mean = df["average_daily_demand"].to_numpy(dtype=float, na_value=np.nan)
+    if "recent_demand_variance" in df:
+        std = np.sqrt(np.maximum(df["recent_demand_variance"].to_numpy(dtype=float, na_value=np.nan), 0))
+    elif "demand_std_dev" in df:
+        std = df["demand_std_dev"].to_numpy(dtype=float, na_value=np.nan)
+    else:
+        std = np.full(len(df), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(mean > 0, std / mean, np.nan)
+
+def assign_xyz(variation: np.ndarray, cutoffs=None) -> pd.Categorical:
+    """X (steady) / Y (variable) / Z (erratic or no demand) from the coefficient of variation."""
+    cutoff_x, cutoff_y = cutoffs or config.XYZ_CUTOFFS
+    codes = np.where(variation <= cutoff_x, 0, np.where(variation <= cutoff_y, 1, 2))  # NaN -> Z
+    return pd.Categorical.from_codes(codes, categories=XYZ_CLASSES)
+
+def assign_operational_risk(df: pd.DataFrame) -> pd.Categorical:
+    """A when lead time is long and shelf life short, B for either, C otherwise."""
+    lead_time = df["average_lead_time_days"].to_numpy(dtype=float, na_value=np.nan)
+    shelf_life = df["shelf_life_days"].to_numpy(dtype=float, na_value=np.nan)
+    risk_flags = (lead_time > 14).astype(int) + (shelf_life < 30).astype(int)
+    return pd.Categorical.from_codes(2 - risk_flags, categories=ABC_CLASSES)
+
+def classify_products(df: pd.DataFrame, thresholds: tuple = None, criteria=None) -> pd.DataFrame:
+    """Classification columns for every row of ``df``, in its original row order.
+
+    ``thresholds`` are the ABC revenue thresholds (computed from ``df`` when
+    not given). ``criteria`` containing "xyz" adds the demand variability
+    class and the combined ABC-XYZ class.
+    """
+    criteria = config.CLASSIFICATION_CRITERIA if criteria is None else criteria
+    revenue = compute_revenue(df)
+    if thresholds is None:
+        thresholds = abc_thresholds(revenue)
+
+    financial = assign_abc(revenue, thresholds)
+    columns = {
+        "computed_financial_class": financial,
+        "computed_operational_risk": assign_operational_risk(df),
+    }
+    if "xyz" in criteria:
+        variability = assign_xyz(demand_variation(df))
+        columns["computed_variability_class"] = variability
+        columns["computed_abc_xyz_class"] = pd.Categorical.from_codes(
+            financial.codes * len(XYZ_CLASSES) + variability.codes, categories=ABC_XYZ_CLASSES)
+    return pd.DataFrame(columns, index=df.index)
+
 def classify_product_node(state: dict) -> dict:
-    df = pd.DataFrame(state["inventory_data"])
-
-    # 1. Financial classification based on 30-day revenue
-    df["recent_revenue"] = df["average_daily_demand"].fillna(0) * df["unit_cost"] * 30
-    df = df.sort_values("recent_revenue", ascending=False).reset_index(drop=True)
-    total_revenue = df["recent_revenue"].sum()
-    df["revenue_pct"] = df["recent_revenue"].cumsum() / total_revenue
-
-    def assign_financial_class(pct):
-        if pct <= 0.7:
-            return "A"
-        elif pct <= 0.9:
-            return "B"
-        else:
-            return "C"
-
-    df["computed_financial_class"] = df["revenue_pct"].apply(assign_financial_class)
-
-    # 2. Operational risk classification based on lead time and shelf life
-    def assign_operational_risk(row):
-        long_lead = row["average_lead_time_days"] is not None and row["average_lead_time_days"] > 14
-        short_shelf = row["shelf_life_days"] is not None and row["shelf_life_days"] < 30
-
-        if long_lead and short_shelf:
-            return "A"
-        elif long_lead or short_shelf:
-            return "B"
-        else:
-            return "C"
-
-    df["computed_operational_risk"] = df.apply(assign_operational_risk, axis=1)
-
-    # Replace inventory_data with enriched version
-    state["inventory_data"] = df.drop(columns=["revenue_pct", "recent_revenue"]).to_dict(orient="records")
-    return state
+    df = get_inventory_frame(state).copy(deep=False)
+
+    # Sharded and streaming runs pass catalog-wide thresholds to classify their subset locally
+    classes = classify_products(df, state.get("abc_thresholds"))
+    df[classes.columns] = classes
+
+    return set_inventory_frame(state, df)
@@ -0,0 +1,113 @@
+import json
+import os
+
+# Floating point precision used by the vectorized engines. "float32" halves
+# memory for large catalogs at the cost of ~7 significant digits.
+FLOAT_DTYPE = os.getenv('SUPPLY_CHAIN_FLOAT_DTYPE', 'float64')
+
+# Reorder policy selection (see agents/policies.py). REORDER_POLICY_BY names a
+# column such as "category" or "computed_financial_class" whose values are
+# looked up in REORDER_POLICY_MAP, e.g. '{"A": "service_level", "C": "sQ"}'.
+# REORDER_POLICY_PARAMS overrides kernel arguments per policy, e.g.
+# '{"heuristic": {"reorder_days_coverage": 45}}'.
+REORDER_POLICY = os.getenv('SUPPLY_CHAIN_REORDER_POLICY', 'heuristic')
+REORDER_POLICY_BY = os.getenv('SUPPLY_CHAIN_REORDER_POLICY_BY') or None
+REORDER_POLICY_MAP = json.loads(os.getenv('SUPPLY_CHAIN_REORDER_POLICY_MAP', '{}'))
+REORDER_POLICY_PARAMS = json.loads(os.getenv('SUPPLY_CHAIN_REORDER_POLICY_PARAMS', '{}'))
+
+# classify_product_node always assigns the revenue ABC class and operational
+# risk; adding "xyz" to SUPPLY_CHAIN_CLASSIFICATION (e.g. "abc,xyz") also
+# classifies demand variability by coefficient of variation (X up to the
+# first XYZ cutoff, Y up to the second, Z above or without demand) and the
+# combined ABC-XYZ class ("AX" ... "CZ"), usable as REORDER_POLICY_BY.
+CLASSIFICATION_CRITERIA = tuple(
+    c.strip() for c in os.getenv('SUPPLY_CHAIN_CLASSIFICATION', 'abc').split(',') if c.strip()
+)
+XYZ_CUTOFFS = tuple(float(c) for c in os.getenv('SUPPLY_CHAIN_XYZ_CUTOFFS', '0.5,1.0').split(','))
+
+# Database connection and pool settings (see agents/db.py)
+DATABASE_URL = os.getenv(
+    'SUPPLY_CHAIN_DATABASE_URL',
+    f"postgresql://{os.getenv('USER')}@localhost:5432/supply_chain_optimizer",
+)
+DB_POOL_SIZE = int(os.getenv('SUPPLY_CHAIN_DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('SUPPLY_CHAIN_DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('SUPPLY_CHAIN_DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('SUPPLY_CHAIN_DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('SUPPLY_CHAIN_DB_POOL_PRE_PING', '1') == '1'
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('SUPPLY_CHAIN_DB_STATEMENT_TIMEOUT_MS', '0'))  # 0 = no limit
+
+# Where fetch_inventory_node reads recent demand from: "raw" aggregates
+# demand_history on every run, "rollup" reads the demand_rollups summary table
+# after an incremental refresh (see agents/rollups.py).
+DEMAND_SOURCE = os.getenv('SUPPLY_CHAIN_DEMAND_SOURCE', 'raw')
+# Seconds a demand_history insert may take to commit after its created_at
+# timestamp was taken and still be counted by a rollup refresh
+ROLLUP_LAG = float(os.getenv('SUPPLY_CHAIN_ROLLUP_LAG', '600'))
+
+# forecast_demand_node: "model" fits Holt-Winters / Croston per SKU over
+# FORECAST_HISTORY_DAYS of demand_history (agents/forecasting.py);
+# "rolling_sum" uses the plain sum of the last 30 days.
+FORECAST_METHOD = os.getenv('SUPPLY_CHAIN_FORECAST_METHOD', 'model')
+FORECAST_HISTORY_DAYS = int(os.getenv('SUPPLY_CHAIN_FORECAST_HISTORY_DAYS', '180'))
+
+# Streaming mode (pipeline/streaming.py): memory budget for one in-flight batch
+STREAM_MAX_MEMORY_MB = int(os.getenv('SUPPLY_CHAIN_STREAM_MAX_MEMORY_MB', '512'))
+
+# Incremental mode (pipeline/incremental.py): where the previous run's
+# per-product results and change-tracking watermarks are kept, and how many
+# seconds before those watermarks a run looks for changes that committed late
+INCREMENTAL_STORE_DIR = os.getenv('SUPPLY_CHAIN_INCREMENTAL_STORE_DIR', '.supply_chain_state')
+INCREMENTAL_LAG = float(os.getenv('SUPPLY_CHAIN_INCREMENTAL_LAG', '600'))
+
+# Result cache (pipeline/cache.py): in-process LRU budget and optional on-disk tier
+CACHE_MAX_MB = int(os.getenv('SUPPLY_CHAIN_CACHE_MAX_MB', '256'))
+CACHE_DIR = os.getenv('SUPPLY_CHAIN_CACHE_DIR') or None
+CACHE_DISK_MAX_MB = int(os.getenv('SUPPLY_CHAIN_CACHE_DISK_MAX_MB', '2048'))
+
+# Multi-supplier sourcing (agents/sourcing.py). Landed unit cost is unit_cost
+# marked up by SOURCING_WEIGHTS per lead-time day, per day of lead-time std
+# dev and per unit of unreliability (1 - reliability_score), e.g.
+# '{"lead_time_days": 0.002}'. SOURCING_ORDER_COST is the fixed cost of
+# each purchase order line, so orders are only split when it pays off.
+SOURCING_WEIGHTS = {
+    "lead_time_days": 0.001,
+    "lead_time_std_dev": 0.002,
+    "unreliability": 1.0,
+    **json.loads(os.getenv('SUPPLY_CHAIN_SOURCING_WEIGHTS', '{}')),
+}
+SOURCING_ORDER_COST = float(os.getenv('SUPPLY_CHAIN_SOURCING_ORDER_COST', '25'))
+SOURCING_TIME_LIMIT = float(os.getenv('SUPPLY_CHAIN_SOURCING_TIME_LIMIT', '60'))  # seconds per solve
+SOURCING_MIP_GAP = float(os.getenv('SUPPLY_CHAIN_SOURCING_MIP_GAP', '0.001'))
+
+# risk_analyzer_node: "deterministic" flags rows whose stock is below mean
+# demand over mean lead time; "simulation" also runs the Monte Carlo model in
+# agents/simulation.py and flags rows whose stockout probability exceeds
+# SIMULATION_RISK_THRESHOLD. Scenario arrays of one chunk are kept within
+# SIMULATION_MAX_MEMORY_MB; SIMULATION_WORKERS > 1 simulates chunks on a
+# process pool.
+RISK_METHOD = os.getenv('SUPPLY_CHAIN_RISK_METHOD', 'deterministic')
+SIMULATION_SCENARIOS = int(os.getenv('SUPPLY_CHAIN_SIMULATION_SCENARIOS', '10000'))
+SIMULATION_SEED = int(os.getenv('SUPPLY_CHAIN_SIMULATION_SEED', '0'))
+SIMULATION_MAX_MEMORY_MB = float(os.getenv('SUPPLY_CHAIN_SIMULATION_MAX_MEMORY_MB', '256'))
+SIMULATION_WORKERS = int(os.getenv('SUPPLY_CHAIN_SIMULATION_WORKERS', '1'))
+SIMULATION_RISK_THRESHOLD = float(os.getenv('SUPPLY_CHAIN_SIMULATION_RISK_THRESHOLD', '0.5'))
+
+# Stockout alerting (pipeline/alerts.py): seconds between polls when no
+# LISTEN/NOTIFY wake-up arrives, and most supply_events applied per poll.
+ALERT_POLL_INTERVAL = float(os.getenv('SUPPLY_CHAIN_ALERT_POLL_INTERVAL', '0.5'))
+ALERT_BATCH_SIZE = int(os.getenv('SUPPLY_CHAIN_ALERT_BATCH_SIZE', '10000'))
+# Seconds a change may take to commit after its last_updated timestamp or
+# event id was taken and still be picked up
+ALERT_LAG = float(os.getenv('SUPPLY_CHAIN_ALERT_LAG', '30'))
+
+# purchase_order_node (agents/purchase_orders.py) writes the run's reorder
+# lines to purchase_orders / order_items only when enabled
+PURCHASE_ORDERS = os.getenv('SUPPLY_CHAIN_PURCHASE_ORDERS', '0') == '1'
+
+# Policy backtesting (pipeline/backtest.py): yearly holding cost as a fraction
+# of unit cost, days of history that seed the trailing demand estimate before
+# the replay starts, and processes used for policy sweeps
+BACKTEST_HOLDING_COST_RATE = float(os.getenv('SUPPLY_CHAIN_BACKTEST_HOLDING_COST_RATE', '0.25'))
+BACKTEST_WARMUP_DAYS = int(os.getenv('SUPPLY_CHAIN_BACKTEST_WARMUP_DAYS', '30'))
+BACKTEST_WORKERS = int(os.getenv('SUPPLY_CHAIN_BACKTEST_WORKERS', '1'))
@@ -0,0 +1,223 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from agents import config
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# Async engines hold connections bound to the event loop that opened them,
+# so there is one per running loop
+_async_engines = weakref.WeakKeyDictionary()
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+class PoolMetrics:
+    """Counters for the shared connection pool, exported in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connections_created = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.checkout_wait_seconds = 0.0
+            self.checkout_wait_max_seconds = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkout_wait_seconds += seconds
+            self.checkout_wait_max_seconds = max(self.checkout_wait_max_seconds, seconds)
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+pool_metrics = PoolMetrics()
+
+
+def _install_pool_listeners(engine):
+    pool = engine.pool
+    event.listen(pool, "connect", lambda *args: pool_metrics.increment("connections_created"))
+    event.listen(pool, "checkout", lambda *args: pool_metrics.increment("checkouts"))
+    event.listen(pool, "checkin", lambda *args: pool_metrics.increment("checkins"))
+    event.listen(pool, "invalidate", lambda *args: pool_metrics.increment("invalidations"))
+
+
+def create_pooled_engine(url: str = None):
+    """Build an engine from config. Prefer get_engine(), which shares one per process."""
+    url = make_url(url or config.DATABASE_URL)
+    kwargs = {"pool_pre_ping": config.DB_POOL_PRE_PING}
+
+    if url.get_backend_name() == "postgresql":
+        kwargs.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+        )
+        if config.DB_STATEMENT_TIMEOUT_MS:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"}
+
+    engine = create_engine(url, **kwargs)
+    _install_pool_listeners(engine)
+    return engine
+
+
+def create_async_pooled_engine(url: str = None):
+    """Async counterpart of create_pooled_engine (asyncpg for Postgres, aiosqlite for SQLite)."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(url or config.DATABASE_URL)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r}; expected one of {sorted(ASYNC_DRIVERS)}")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    kwargs = {"pool_pre_ping": config.DB_POOL_PRE_PING}
+
+    if backend == "postgresql":
+        kwargs.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+        )
+        if config.DB_STATEMENT_TIMEOUT_MS:
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}}
+    else:
+        # aiosqlite connections each own a thread; don't keep them past their use
+        kwargs["poolclass"] = NullPool
+
+    engine = create_async_engine(url, **kwargs)
+    _install_pool_listeners(engine.sync_engine)
+    return engine
+
+
+def get_async_engine():
+    """The async engine shared by everything running on the current event loop."""
+    loop = asyncio.get_running_loop()
+    engine = _async_engines.get(loop)
+    if engine is None:
+        engine = _async_engines[loop] = create_async_pooled_engine()
+    return engine
+
+
+async def dispose_async_engine():
+    """Close the current loop's async engine, e.g. on service shutdown."""
+    engine = _async_engines.pop(asyncio.get_running_loop(), None)
+    if engine is not None:
+        await engine.dispose()
+
+
+def get_engine():
+    """Process-wide SQLAlchemy engine shared by every node."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_pooled_engine()
+    return _engine
+
+
+def dispose_engine():
+    """Close all pooled connections and drop the shared engine."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def _reset_after_fork():
+    # Connections inherited from the parent must not be reused or closed here
+    global _engine
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine = None
+    _async_engines.clear()
+    pool_metrics.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@contextmanager
+def connect():
+    """Check out a pooled connection, recording how long the checkout waited."""
+    start = time.perf_counter()
+    with get_engine().connect() as conn:
+        pool_metrics.record_wait(time.perf_counter() - start)
+        yield conn
+
+
+@asynccontextmanager
+async def async_connect():
+    """Async connect(): check out a connection from the current loop's engine."""
+    start = time.perf_counter()
+    async with get_async_engine().connect() as conn:
+        pool_metrics.record_wait(time.perf_counter() - start)
+        yield conn
+
+
+async def aread_sql(query, params: dict = None) -> pd.DataFrame:
+    """pd.read_sql on its own async connection; awaits the database without blocking the loop."""
+    async with async_connect() as conn:
+        return await conn.run_sync(lambda sync_conn: pd.read_sql(query, sync_conn, params=params))
+
+
+@contextmanager
+def begin():
+    """Pooled connection with a transaction that commits on success."""
+    with connect() as conn, conn.begin():
+        yield conn
+
+
+def render_pool_metrics() -> str:
+    """Pool metrics in the Prometheus text exposition format."""
+    m = pool_metrics
+    lines = [
+        ("supply_chain_db_connections_created_total", "counter", "New DBAPI connections opened", m.connections_created),
+        ("supply_chain_db_pool_checkouts_total", "counter", "Connections checked out of the pool", m.checkouts),
+        ("supply_chain_db_pool_checkins_total", "counter", "Connections returned to the pool", m.checkins),
+        ("supply_chain_db_pool_invalidations_total", "counter", "Connections invalidated", m.invalidations),
+        ("supply_chain_db_pool_checkout_wait_seconds_total", "counter", "Time spent waiting for a connection", m.checkout_wait_seconds),
+        ("supply_chain_db_pool_checkout_wait_seconds_max", "gauge", "Longest wait for a connection", m.checkout_wait_max_seconds),
+    ]
+
+    pool = _engine.pool if _engine is not None else None
+    if pool is not None and hasattr(pool, "checkedout"):
+        lines += [
+            ("supply_chain_db_pool_size", "gauge", "Configured pool size", pool.size()),
+            ("supply_chain_db_pool_checked_out", "gauge", "Connections currently checked out", pool.checkedout()),
+            ("supply_chain_db_pool_overflow", "gauge", "Connections above pool_size", pool.overflow()),
+        ]
+
+    out = []
+    for name, kind, help_text, value in lines:
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.append(f"{name} {value}")
+    return "\n".join(out) + "\n"
+
+
+def write_pool_metrics(path: str):
+    """Write pool metrics for a node_exporter textfile collector."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_pool_metrics())
+    os.replace(tmp_path, path)
@@ -1,49 +1,299 @@
+import asyncio
+
 import pandas as pd
-import os
-from sqlalchemy import create_engine, text
+from datetime import date, timedelta
+from sqlalchemy import bindparam, text
 
-def get_sqlalchemy_engine():
-    user = os.getenv('USER')
-    return create_engine(f'postgresql://{user}@localhost:5432/supply_chain_optimizer')
+from agents import config
+from agents.classify_products import FINANCIAL_CUTOFFS
+from agents.db import aread_sql, connect
+from agents.rollups import refresh_rollups
+from agents.schema import apply_schema
+from agents.state import set_inventory_frame
 
-def fetch_inventory_node(state: dict) -> dict:
-    engine = get_sqlalchemy_engine()
+DEMAND_WINDOW_DAYS = 30
+MAX_PRODUCT_ID = 2**31 - 1
+
+# Demand is aggregated once over the 30-day window and joined by
+# (product_id, warehouse_id), so demand_history is scanned a single time
+# instead of probed per product and location.
+RAW_DEMAND_CTE = """
+    WITH recent_demand AS (
+        SELECT
+            product_id,
+            warehouse_id,
+            AVG(actual_demand) AS average_daily_demand,
+            SUM(actual_demand) AS recent_demand_30d,
+            AVG(actual_demand * actual_demand) - AVG(actual_demand) * AVG(actual_demand) AS recent_demand_variance
+        FROM demand_history
+        WHERE date >= :since{demand_filter}
+        GROUP BY product_id, warehouse_id
+    )
+"""
+
+# Same columns from the incrementally maintained demand_rollups table
+ROLLUP_DEMAND_CTE = """
+    WITH recent_demand AS (
+        SELECT
+            product_id,
+            warehouse_id,
+            CAST(demand_sum_30d AS FLOAT) / NULLIF(demand_count_30d, 0) AS average_daily_demand,
+            demand_sum_30d AS recent_demand_30d,
+            CAST(demand_sumsq_30d AS FLOAT) / NULLIF(demand_count_30d, 0)
+                - (CAST(demand_sum_30d AS FLOAT) / NULLIF(demand_count_30d, 0))
+                * (CAST(demand_sum_30d AS FLOAT) / NULLIF(demand_count_30d, 0)) AS recent_demand_variance
+        FROM demand_rollups
+        WHERE 1 = 1{demand_filter}
+    )
+"""
+
+INVENTORY_SELECT = """
+    SELECT
+        p.product_id,
+        i.warehouse_id,
+        p.sku,
+        p.name,
+        p.category,
+        i.current_stock,
+        i.committed_stock,
+        i.reorder_point,
+        (i.current_stock - i.committed_stock) AS available_stock,
+        ps.average_lead_time_days,
+        ps.lead_time_std_dev,
+        ps.worst_case_lead_time,
+        ps.unit_cost,
+        s.supplier_id,
+        s.reliability_score,
+        rd.average_daily_demand,
+        rd.recent_demand_30d,
+        rd.recent_demand_variance,
+        i.last_stockout_date,
+        p.shelf_life_days,
+        p.financial_classification,
+        p.operational_risk
+    {inventory_from}
+    ORDER BY p.product_id, i.warehouse_id;
+"""
+
+INVENTORY_FROM = """
+    FROM
+        products p
+    JOIN inventory i ON p.product_id = i.product_id
+    JOIN product_suppliers ps ON p.product_id = ps.product_id AND ps.is_primary
+    JOIN suppliers s ON ps.supplier_id = s.supplier_id
+    LEFT JOIN recent_demand rd ON rd.product_id = i.product_id AND rd.warehouse_id = i.warehouse_id
+    WHERE p.product_id BETWEEN :min_product_id AND :max_product_id{category_filter}
+"""
+
+# The three independent parts of the inventory query, issued concurrently by
+# afetch_inventory_node and joined in pandas
+INVENTORY_ROWS_SELECT = """
+    SELECT
+        p.product_id,
+        i.warehouse_id,
+        p.sku,
+        p.name,
+        p.category,
+        i.current_stock,
+        i.committed_stock,
+        i.reorder_point,
+        (i.current_stock - i.committed_stock) AS available_stock,
+        i.last_stockout_date,
+        p.shelf_life_days,
+        p.financial_classification,
+        p.operational_risk
+    FROM products p
+    JOIN inventory i ON p.product_id = i.product_id
+    WHERE p.product_id BETWEEN :min_product_id AND :max_product_id{category_filter}
+"""
 
-    query = text("""
+SUPPLIER_ROWS_QUERY = text("""
+    SELECT
+        ps.product_id,
+        ps.average_lead_time_days,
+        ps.lead_time_std_dev,
+        ps.worst_case_lead_time,
+        ps.unit_cost,
+        s.supplier_id,
+        s.reliability_score
+    FROM product_suppliers ps
+    JOIN suppliers s ON ps.supplier_id = s.supplier_id
+    WHERE ps.product_id BETWEEN :min_product_id AND :max_product_id
+      AND ps.is_primary
+""")
+
+RECENT_DEMAND_SELECT = """
+    SELECT product_id, warehouse_id, average_daily_demand, recent_demand_30d, recent_demand_variance
+    FROM recent_demand
+"""
+
+# One inventory row per stock location
+INVENTORY_KEY = ["product_id", "warehouse_id"]
+
+# Column order of INVENTORY_SELECT
+INVENTORY_COLUMNS = [
+    "product_id", "warehouse_id", "sku", "name", "category", "current_stock", "committed_stock", "reorder_point",
+    "available_stock", "average_lead_time_days", "lead_time_std_dev", "worst_case_lead_time", "unit_cost",
+    "supplier_id", "reliability_score", "average_daily_demand", "recent_demand_30d",
+    "recent_demand_variance", "last_stockout_date",
+    "shelf_life_days", "financial_classification", "operational_risk",
+]
+
+# Catalog-wide ABC revenue thresholds computed in the database (same rules as
+# classify_products.abc_thresholds), so streaming runs never hold all rows
+ABC_THRESHOLDS_SELECT = """
+    , revenue AS (
+        SELECT COALESCE(rd.average_daily_demand, 0) * ps.unit_cost * 30 AS recent_revenue
+        {inventory_from}
+    ),
+    ranked AS (
         SELECT
-            p.product_id,
-            p.sku,
-            p.name,
-            i.current_stock,
-            i.committed_stock,
-            i.reorder_point,
-            (i.current_stock - i.committed_stock) AS available_stock,
-            ps.average_lead_time_days,
-            ps.lead_time_std_dev,
-            ps.unit_cost,
-            s.supplier_id,
-            s.reliability_score,
-            (
-                SELECT AVG(actual_demand)
-                FROM demand_history dh
-                WHERE dh.product_id = p.product_id
-                  AND dh.date >= CURRENT_DATE - INTERVAL '30 days'
-            ) AS average_daily_demand,
-            i.last_stockout_date,
-            p.shelf_life_days,
-            p.financial_classification,
-            p.operational_risk
-        FROM
-            products p
-        JOIN inventory i ON p.product_id = i.product_id
-        JOIN product_suppliers ps ON p.product_id = ps.product_id
-        JOIN suppliers s ON ps.supplier_id = s.supplier_id
-        ORDER BY p.product_id;
-    """)
-
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn)
-
-    state['inventory_data'] = df.to_dict(orient='records')
-    return state
+            recent_revenue,
+            SUM(recent_revenue) OVER (ORDER BY recent_revenue DESC RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS running_revenue,
+            SUM(recent_revenue) OVER () AS total_revenue
+        FROM revenue
+    )
+    SELECT
+        MIN(CASE WHEN running_revenue <= :cutoff_a * total_revenue THEN recent_revenue END) AS threshold_a,
+        MIN(CASE WHEN running_revenue <= :cutoff_b * total_revenue THEN recent_revenue END) AS threshold_b,
+        MAX(total_revenue) AS total_revenue
+    FROM ranked;
+"""
+
+def _build_query(select: str, demand_source: str, by_category: bool, by_ids: bool = False,
+                 by_warehouse: bool = False):
+    cte = ROLLUP_DEMAND_CTE if demand_source == "rollup" else RAW_DEMAND_CTE
+    # Id and warehouse lists are applied inside the demand CTE as well, so only those rows' demand is aggregated
+    demand_filter = "\n          AND product_id IN :product_ids" if by_ids else ""
+    category_filter = "\n      AND p.category IN :categories" if by_category else ""
+    if by_ids:
+        category_filter += "\n      AND p.product_id IN :product_ids"
+    if by_warehouse:
+        demand_filter += "\n          AND warehouse_id IN :warehouse_ids"
+        category_filter += "\n      AND i.warehouse_id IN :warehouse_ids"
+    inventory_from = INVENTORY_FROM.format(category_filter=category_filter)
+    query = text(cte.format(demand_filter=demand_filter) + select.format(inventory_from=inventory_from))
+    if by_category:
+        query = query.bindparams(bindparam("categories", expanding=True))
+    if by_ids:
+        query = query.bindparams(bindparam("product_ids", expanding=True))
+    if by_warehouse:
+        query = query.bindparams(bindparam("warehouse_ids", expanding=True))
+    return query
+
+def build_inventory_query(demand_source: str = "raw", by_category: bool = False, by_ids: bool = False,
+                          by_warehouse: bool = False):
+    """Inventory query reading demand from ``demand_source``, optionally limited to categories,
+    product ids or warehouses."""
+    return _build_query(INVENTORY_SELECT, demand_source, by_category, by_ids, by_warehouse)
+
+def build_abc_thresholds_query(demand_source: str = "raw", by_category: bool = False, by_warehouse: bool = False):
+    """Query returning the catalog-wide A and B revenue thresholds in one row."""
+    return _build_query(ABC_THRESHOLDS_SELECT, demand_source, by_category, by_warehouse=by_warehouse)
+
+def shard_filters(shard: dict = None) -> dict:
+    """Which optional filters of the inventory query ``shard`` needs."""
+    shard = shard or {}
+    return {"by_category": bool(shard.get("categories")), "by_warehouse": bool(shard.get("warehouse_ids"))}
+
+INVENTORY_QUERY = build_inventory_query("raw")
+
+def inventory_query_params(shard: dict = None) -> dict:
+    """Bind parameters for the inventory query; ``shard`` limits the product_id range, categories or warehouses."""
+    shard = shard or {}
+    params = {
+        "since": date.today() - timedelta(days=DEMAND_WINDOW_DAYS),
+        "min_product_id": shard.get("min_product_id", 0),
+        "max_product_id": shard.get("max_product_id", MAX_PRODUCT_ID),
+    }
+    if shard.get("categories"):
+        params["categories"] = list(shard["categories"])
+    if shard.get("warehouse_ids"):
+        params["warehouse_ids"] = [int(w) for w in shard["warehouse_ids"]]
+    return params
+
+def fetch_inventory_node(state: dict) -> dict:
+    shard = state.get("shard")
+
+    # Sharded and streaming runs refresh once before fetching
+    if config.DEMAND_SOURCE == "rollup" and not state.get("rollups_fresh"):
+        refresh_rollups()
+    query = build_inventory_query(config.DEMAND_SOURCE, **shard_filters(shard))
+
+    with connect() as conn:
+        df = pd.read_sql(query, conn, params=inventory_query_params(shard))
+
+    return set_inventory_frame(state, apply_schema(df))
+
+def iter_inventory_batches(batch_size: int, shard: dict = None):
+    """Yield the inventory table in DataFrames of at most ``batch_size`` rows.
+
+    Uses a server-side cursor, so only one batch is held in memory at a time.
+    Batches arrive in (product_id, warehouse_id) order.
+    """
+    query = build_inventory_query(config.DEMAND_SOURCE, **shard_filters(shard))
+
+    with connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=batch_size)
+        for batch in pd.read_sql(query, conn, params=inventory_query_params(shard), chunksize=batch_size):
+            yield apply_schema(batch)
+
+def _split_inventory_queries(demand_source: str, by_category: bool, by_warehouse: bool = False) -> tuple:
+    category_filter = "\n      AND p.category IN :categories" if by_category else ""
+    demand_filter = "\n          AND product_id BETWEEN :min_product_id AND :max_product_id"
+    if by_warehouse:
+        category_filter += "\n      AND i.warehouse_id IN :warehouse_ids"
+        demand_filter += "\n          AND warehouse_id IN :warehouse_ids"
+    inventory = text(INVENTORY_ROWS_SELECT.format(category_filter=category_filter))
+    cte = ROLLUP_DEMAND_CTE if demand_source == "rollup" else RAW_DEMAND_CTE
+    demand = text(cte.format(demand_filter=demand_filter) + RECENT_DEMAND_SELECT)
+    if by_category:
+        inventory = inventory.bindparams(bindparam("categories", expanding=True))
+    if by_warehouse:
+        inventory = inventory.bindparams(bindparam("warehouse_ids", expanding=True))
+        demand = demand.bindparams(bindparam("warehouse_ids", expanding=True))
+    return inventory, SUPPLIER_ROWS_QUERY, demand
+
+async def afetch_inventory_node(state: dict) -> dict:
+    """Async fetch_inventory_node: inventory, supplier and demand queries run concurrently.
+
+    Category shards filter the inventory rows; supplier and demand rows are
+    read for the shard's id range and dropped by the join.
+    """
+    shard = state.get("shard")
+
+    if config.DEMAND_SOURCE == "rollup" and not state.get("rollups_fresh"):
+        await asyncio.to_thread(refresh_rollups)
+
+    params = inventory_query_params(shard)
+    inventory, suppliers, demand = await asyncio.gather(*(
+        aread_sql(query, params) for query in _split_inventory_queries(config.DEMAND_SOURCE, **shard_filters(shard))
+    ))
+
+    df = (inventory
+          .merge(suppliers, on="product_id", validate="many_to_one")
+          .merge(demand, on=INVENTORY_KEY, how="left", validate="one_to_one")
+          .sort_values(INVENTORY_KEY, kind="stable"))
+    return set_inventory_frame(state, apply_schema(df[INVENTORY_COLUMNS]))
+
+def fetch_inventory_for_products(product_ids, chunk_size: int = 10_000) -> pd.DataFrame:
+    """Inventory rows (every warehouse) for just ``product_ids``, in key order; missing ids are skipped."""
+    product_ids = sorted(int(i) for i in product_ids)
+    chunks = [product_ids[i:i + chunk_size] for i in range(0, len(product_ids), chunk_size)] or [[]]
+    query = build_inventory_query(config.DEMAND_SOURCE, by_ids=True)
+    with connect() as conn:
+        frames = [pd.read_sql(query, conn, params={**inventory_query_params(), "product_ids": chunk})
+                  for chunk in chunks]
+    return apply_schema(pd.concat(frames, ignore_index=True))
+
+def fetch_abc_thresholds(shard: dict = None, cutoffs=FINANCIAL_CUTOFFS) -> tuple:
+    """Catalog-wide (A, B) revenue thresholds without loading the catalog."""
+    query = build_abc_thresholds_query(config.DEMAND_SOURCE, **shard_filters(shard))
+    params = {**inventory_query_params(shard), "cutoff_a": cutoffs[0], "cutoff_b": cutoffs[1]}
+
+    with connect() as conn:
+        row = conn.execute(query, params).one()
 
+    if not row.total_revenue:
+        return (float("inf"), float("inf"))
+    return tuple(float("inf") if t is None else float(t) for t in (row.threshold_a, row.threshold_b))
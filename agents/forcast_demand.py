@@ -1,35 +1,95 @@
+import asyncio
+
 import pandas as pd
-import os
-from sqlalchemy import create_engine, text
+from datetime import date, timedelta
+from sqlalchemy import text
+
+from agents import config
+from agents.db import connect
+from agents.forecasting import aload_demand_matrix, forecast_demand, load_demand_matrix
+from agents.state import get_inventory_frame, set_inventory_frame
+
+# 30-day demand totals per location, aggregated in the database rather than in pandas
+DEMAND_30D_QUERY = text("""
+    SELECT product_id, warehouse_id, SUM(actual_demand) AS forecasted_demand_30d
+    FROM demand_history
+    WHERE date >= :since
+      AND product_id BETWEEN :min_product_id AND :max_product_id
+    GROUP BY product_id, warehouse_id
+""")
+
+def _location_keys(frame: pd.DataFrame) -> list:
+    return ['product_id', 'warehouse_id'] if 'warehouse_id' in frame else ['product_id']
+
+def _warehouse_ids(inventory: pd.DataFrame):
+    return inventory['warehouse_id'].to_numpy() if 'warehouse_id' in inventory else None
+
+def attach_forecast(inventory: pd.DataFrame, forecast: pd.DataFrame) -> pd.DataFrame:
+    """Left-join forecasts onto the inventory table by product_id (and warehouse_id when both have it).
+
+    Row order of ``inventory`` is preserved; products without demand get 0.
+    """
+    inventory = inventory.drop(columns=['forecasted_demand_30d'], errors='ignore')
+    keys = _location_keys(inventory) if 'warehouse_id' in forecast else ['product_id']
+    if keys == ['product_id'] and forecast['product_id'].duplicated().any():
+        forecast = forecast.groupby('product_id', as_index=False)['forecasted_demand_30d'].sum()
+    merged = inventory.merge(
+        forecast[keys + ['forecasted_demand_30d']],
+        on=keys,
+        how='left',
+        validate='many_to_one',
+    )
+    merged['forecasted_demand_30d'] = merged['forecasted_demand_30d'].fillna(0).astype(int)
+    return merged
+
+def model_forecast(inventory: pd.DataFrame, history_days: int, as_of: date, history=None) -> pd.DataFrame:
+    """Fit the batched per-SKU models and attach forecasts and variances by row.
 
-def get_sqlalchemy_engine():
-    user = os.getenv('USER')
-    return create_engine(f'postgresql://{user}@localhost:5432/supply_chain_optimizer')
+    ``history`` is the demand matrix when already loaded (e.g. asynchronously).
+    """
+    if history is None:
+        history = load_demand_matrix(inventory['product_id'].to_numpy(), history_days, as_of,
+                                     warehouse_ids=_warehouse_ids(inventory))
+    first_weekday = (as_of - timedelta(days=history_days - 1)).weekday()
+    forecast = forecast_demand(history, first_weekday)
+    forecast.index = inventory.index
+
+    inventory = inventory.drop(columns=forecast.columns, errors='ignore')
+    return pd.concat([inventory, forecast], axis=1)
 
 def forecast_demand_node(state: dict) -> dict:
-    engine = get_sqlalchemy_engine()
-    product_ids = [item['product_id'] for item in state['inventory_data']]
-
-    query = text("""
-        SELECT product_id, date, actual_demand
-        FROM demand_history
-        WHERE date >= CURRENT_DATE - INTERVAL '30 days'
-          AND product_id = ANY(:product_ids)
-    """)
-
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params={"product_ids": product_ids})
-
-    # Calculate 30-day total demand per product
-    forecast_df = df.groupby('product_id')['actual_demand'].sum().reset_index()
-    forecast_df.rename(columns={'actual_demand': 'forecasted_demand_30d'}, inplace=True)
-
-    # Merge back into inventory_data
-    enriched = []
-    for record in state['inventory_data']:
-        match = forecast_df[forecast_df['product_id'] == record['product_id']]
-        record['forecasted_demand_30d'] = int(match['forecasted_demand_30d'].iloc[0]) if not match.empty else 0
-        enriched.append(record)
-
-    state['inventory_data'] = enriched
-    return state
+    inventory = get_inventory_frame(state)
+    if inventory.empty:
+        return set_inventory_frame(state, inventory.assign(forecasted_demand_30d=0))
+
+    if config.FORECAST_METHOD == "model":
+        # Fit on complete days only; today's demand is still accumulating
+        as_of = date.today() - timedelta(days=1)
+        return set_inventory_frame(state, model_forecast(inventory, config.FORECAST_HISTORY_DAYS, as_of))
+
+    # fetch_inventory_node already aggregated the same 30-day window
+    if 'recent_demand_30d' in inventory:
+        forecast = inventory['recent_demand_30d'].fillna(0).astype(int)
+        return set_inventory_frame(state, inventory.assign(forecasted_demand_30d=forecast))
+
+    params = {
+        "since": date.today() - timedelta(days=30),
+        "min_product_id": int(inventory['product_id'].min()),
+        "max_product_id": int(inventory['product_id'].max()),
+    }
+    with connect() as conn:
+        forecast_df = pd.read_sql(DEMAND_30D_QUERY, conn, params=params)
+
+    return set_inventory_frame(state, attach_forecast(inventory, forecast_df))
+
+async def aforecast_demand_node(state: dict) -> dict:
+    """Async forecast_demand_node: history is read with concurrent queries, models fit off the event loop."""
+    inventory = get_inventory_frame(state)
+    if inventory.empty or config.FORECAST_METHOD != "model":
+        return await asyncio.to_thread(forecast_demand_node, state)
+
+    as_of = date.today() - timedelta(days=1)
+    history = await aload_demand_matrix(inventory['product_id'].to_numpy(), config.FORECAST_HISTORY_DAYS, as_of,
+                                        warehouse_ids=_warehouse_ids(inventory))
+    frame = await asyncio.to_thread(model_forecast, inventory, config.FORECAST_HISTORY_DAYS, as_of, history)
+    return set_inventory_frame(state, frame)
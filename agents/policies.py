@@ -0,0 +1,108 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# Registry of reorder policies. Every policy is a vector kernel called once per
+# batch of rows:
+#
+#     kernel(df, daily_demand, **params) -> (should_reorder, reorder_qty, reason)
+#
+# where each return value is an array aligned with ``df``. Rows without demand
+# never reach a kernel; recommend.compute_reorder handles them up front.
+REORDER_POLICIES = {}
+
+def register_policy(name):
+    def decorator(kernel):
+        REORDER_POLICIES[name] = kernel
+        return kernel
+    return decorator
+
+def get_policy(name):
+    try:
+        return REORDER_POLICIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown reorder policy {name!r}; expected one of {sorted(REORDER_POLICIES)}") from None
+
+def _column(df: pd.DataFrame, name: str, default=0.0) -> np.ndarray:
+    if name not in df:
+        return np.full(len(df), default, dtype=float)
+    return df[name].fillna(default).to_numpy(dtype=float)
+
+def _order_up_to(target: np.ndarray, available: np.ndarray) -> np.ndarray:
+    return np.maximum(0, np.round(target - available))
+
+@register_policy("heuristic")
+def heuristic_policy(df, daily_demand, reorder_days_coverage=30, lead_time_buffer_std=1.0):
+    """Reorder when stock will not last the lead time plus a std-dev buffer; cover N days."""
+    available = _column(df, "available_stock")
+    effective_lead_time = _column(df, "average_lead_time_days") + lead_time_buffer_std * _column(df, "lead_time_std_dev")
+
+    should_reorder = available < daily_demand * effective_lead_time
+    qty = np.where(should_reorder, _order_up_to(daily_demand * reorder_days_coverage, available), 0)
+    reason = np.where(should_reorder, "Stockout risk within lead time", "Sufficient stock through lead time")
+    return should_reorder, qty, reason
+
+@register_policy("sQ")
+def fixed_quantity_policy(df, daily_demand, order_cycle_days=30, use_reorder_point=True):
+    """(s, Q): when stock falls to the reorder point s, order a fixed quantity Q."""
+    available = _column(df, "available_stock")
+    if use_reorder_point and "reorder_point" in df:
+        reorder_point = _column(df, "reorder_point")
+    else:
+        reorder_point = daily_demand * _column(df, "average_lead_time_days")
+
+    should_reorder = available <= reorder_point
+    qty = np.where(should_reorder, np.maximum(1, np.round(daily_demand * order_cycle_days)), 0)
+    reason = np.where(should_reorder, "Stock at or below reorder point", "Stock above reorder point")
+    return should_reorder, qty, reason
+
+@register_policy("sS")
+def order_up_to_policy(df, daily_demand, reorder_days_coverage=30, use_reorder_point=True):
+    """(s, S): when stock falls to s, order up to S = demand over lead time + coverage."""
+    available = _column(df, "available_stock")
+    lead_time = _column(df, "average_lead_time_days")
+    if use_reorder_point and "reorder_point" in df:
+        reorder_point = _column(df, "reorder_point")
+    else:
+        reorder_point = daily_demand * lead_time
+    order_up_to = np.maximum(reorder_point, daily_demand * (lead_time + reorder_days_coverage))
+
+    should_reorder = available <= reorder_point
+    qty = np.where(should_reorder, _order_up_to(order_up_to, available), 0)
+    reason = np.where(should_reorder, "Stock at or below reorder point", "Stock above reorder point")
+    return should_reorder, qty, reason
+
+@register_policy("service_level")
+def service_level_policy(df, daily_demand, service_level=0.95, reorder_days_coverage=30):
+    """Reorder point with safety stock sized for a cycle service level.
+
+    Safety stock is z * sqrt(L * sd_d^2 + d^2 * sd_L^2), using
+    ``lead_time_std_dev`` and the forecast's ``demand_std_dev``. Rows
+    without one (e.g. under the rolling_sum forecast) use the square root of
+    fetch_inventory's ``recent_demand_variance``.
+    """
+    if "demand_std_dev" not in df and "recent_demand_variance" not in df:
+        raise ValueError("service_level policy needs a demand_std_dev or recent_demand_variance column")
+    z = NormalDist().inv_cdf(service_level)
+    available = _column(df, "available_stock")
+    lead_time = _column(df, "average_lead_time_days")
+    lead_time_std = _column(df, "lead_time_std_dev")
+    recent_std = np.sqrt(np.maximum(_column(df, "recent_demand_variance"), 0))
+    demand_std = _column(df, "demand_std_dev", np.nan)
+    demand_std = np.where(np.isnan(demand_std), recent_std, demand_std)
+
+    safety_stock = z * np.sqrt(lead_time * demand_std ** 2 + daily_demand ** 2 * lead_time_std ** 2)
+    reorder_point = daily_demand * lead_time + safety_stock
+
+    should_reorder = available < reorder_point
+    qty = np.where(should_reorder, _order_up_to(reorder_point + daily_demand * reorder_days_coverage, available), 0)
+    reason = np.where(should_reorder, "Below service-level reorder point", "Above service-level reorder point")
+    return should_reorder, qty, reason
+
+def select_policies(df: pd.DataFrame, default: str, by: str = None, mapping: dict = None) -> pd.Series:
+    """Name of the policy to apply to each row, e.g. per category or ABC class."""
+    names = pd.Series(default, index=df.index, dtype=object)
+    if by and mapping and by in df:
+        names = df[by].astype(object).map(mapping).fillna(default)
+    return names
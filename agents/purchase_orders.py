@@ -0,0 +1,199 @@
+"""Purchase order generation from the run's reorder lines.
+
+Lines come from ``state["sourcing_plan"]`` (or, without one, from the rows
+flagged ``should_reorder`` at their primary supplier). They are grouped into
+one purchase order per (supplier, warehouse). An order is due after the
+longest lead time among its lines.
+
+PO numbers are derived from the run key, the supplier and the warehouse. The
+run key is ``state["po_run_key"]``; a run without one is keyed by the order
+date and a hash of its lines, stored back in the state, so a retried run with
+the same lines gets the same PO numbers.
+Orders are inserted with ON CONFLICT (po_number) DO NOTHING ... RETURNING, so
+re-running the same run adds nothing. Lines of orders that already exist are
+not written; they are counted as ``skipped_lines`` in the summary and logged.
+Orders and items are written in one transaction: orders as multi-row INSERTs,
+items with COPY on PostgreSQL and batched inserts elsewhere. PostgreSQL gets its tables from data/database_setup.py;
+other databases get a minimal copy on first write.
+"""
+import csv
+import hashlib
+import io
+import logging
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import column, insert, table, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from agents import config
+from agents.db import begin
+from agents.state import get_inventory_frame
+
+PURCHASE_ORDERS = table(
+    "purchase_orders",
+    column("po_id"), column("supplier_id"), column("warehouse_id"), column("po_number"), column("order_date"),
+    column("expected_delivery_date"), column("total_cost"), column("status"),
+)
+ORDER_ITEM_COLUMNS = ["po_id", "product_id", "quantity_ordered", "unit_cost"]
+ORDER_ITEMS = table("order_items", *(column(name) for name in ORDER_ITEM_COLUMNS))
+
+logger = logging.getLogger("supply_chain.purchase_orders")
+
+PO_KEY = ["supplier_id", "warehouse_id"]
+INSERT_BATCH_ROWS = 1000  # orders per multi-row INSERT, well inside every driver's parameter limit
+
+TABLES_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS purchase_orders (
+        po_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier_id INTEGER,
+        warehouse_id INTEGER NOT NULL DEFAULT 1,
+        po_number VARCHAR(50) UNIQUE,
+        order_date DATE NOT NULL,
+        expected_delivery_date DATE NOT NULL,
+        total_cost DECIMAL(12,2),
+        status VARCHAR(20) DEFAULT 'pending'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS order_items (
+        item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        po_id INTEGER REFERENCES purchase_orders(po_id),
+        product_id INTEGER,
+        quantity_ordered INTEGER NOT NULL,
+        quantity_received INTEGER DEFAULT 0,
+        unit_cost DECIMAL(10,2) NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_order_items_po ON order_items(po_id)",
+)
+
+
+def po_number(run_key: str, supplier_id: int, warehouse_id: int) -> str:
+    return f"PO-{run_key}-S{supplier_id}-W{warehouse_id}"
+
+
+def order_lines(state: dict) -> pd.DataFrame:
+    """One row per (supplier, warehouse, product) to order, with quantity, unit cost and lead time."""
+    plan = state.get("sourcing_plan")
+    if plan is not None:
+        lines = plan.rename(columns={"order_qty": "quantity_ordered"})
+    else:
+        inventory = get_inventory_frame(state)
+        if inventory.empty or "should_reorder" not in inventory:
+            lines = pd.DataFrame(columns=["product_id", "quantity_ordered"])
+        else:
+            lines = inventory.loc[inventory["should_reorder"].astype(bool)].rename(
+                columns={"recommended_reorder_qty": "quantity_ordered"})
+    if "warehouse_id" not in lines:
+        lines = lines.assign(warehouse_id=1)
+    lines = lines.loc[pd.to_numeric(lines["quantity_ordered"]) > 0]
+    return lines.reindex(columns=PO_KEY + ["product_id", "quantity_ordered", "unit_cost",
+                                           "average_lead_time_days"]).reset_index(drop=True)
+
+
+def default_run_key(lines: pd.DataFrame, order_date: date) -> str:
+    """``order_date`` and a digest of the (product, warehouse, supplier, quantity) lines, in any order."""
+    columns = ["product_id", "warehouse_id", "supplier_id", "quantity_ordered"]
+    values = np.column_stack([pd.to_numeric(lines[c]).fillna(-1).to_numpy(dtype=np.int64) for c in columns])
+    values = values[np.lexsort(values.T[::-1])] if len(values) else values.reshape(0, len(columns))
+    return f"{order_date:%Y%m%d}-{hashlib.sha256(values.tobytes()).hexdigest()[:10]}"
+
+
+def build_purchase_orders(lines: pd.DataFrame, order_date: date, run_key: str) -> tuple:
+    """(orders, items) frames; items reference their order by ``po_number``."""
+    lines = lines.assign(
+        quantity_ordered=lines["quantity_ordered"].to_numpy(dtype=np.int64),
+        unit_cost=lines["unit_cost"].to_numpy(dtype=float).round(2),
+    )
+    lines["line_total"] = lines["quantity_ordered"] * lines["unit_cost"]
+    orders = lines.groupby(PO_KEY, as_index=False, sort=True).agg(
+        total_cost=("line_total", "sum"), lead_time=("average_lead_time_days", "max"))
+
+    lead_days = np.ceil(orders.pop("lead_time").fillna(0).to_numpy(dtype=float)).astype(np.int64)
+    orders["po_number"] = [po_number(run_key, s, w) for s, w in
+                           zip(orders["supplier_id"].tolist(), orders["warehouse_id"].tolist())]
+    orders["order_date"] = order_date
+    orders["expected_delivery_date"] = [order_date + pd.Timedelta(days=int(d)) for d in lead_days]
+    orders["total_cost"] = orders["total_cost"].round(2)
+    orders["status"] = "pending"
+
+    items = lines.merge(orders[PO_KEY + ["po_number"]], on=PO_KEY)
+    return orders, items[["po_number", "product_id", "quantity_ordered", "unit_cost"]]
+
+
+def ensure_tables(conn):
+    """Create the purchase order tables where the schema setup script did not (e.g. SQLite)."""
+    if conn.dialect.name == "postgresql":
+        return
+    for ddl in TABLES_DDL:
+        conn.execute(text(ddl))
+
+
+def _dialect_insert(conn, target):
+    return (postgresql if conn.dialect.name == "postgresql" else sqlite).insert(target)
+
+
+def _insert_orders(conn, orders: pd.DataFrame) -> dict:
+    """Insert orders that do not exist yet; returns {po_number: po_id} of the new ones."""
+    created = {}
+    records = orders.astype(object).where(orders.notna(), None).to_dict(orient="records")
+    for start in range(0, len(records), INSERT_BATCH_ROWS):
+        statement = (_dialect_insert(conn, PURCHASE_ORDERS)
+                     .values(records[start:start + INSERT_BATCH_ROWS])
+                     .on_conflict_do_nothing(index_elements=["po_number"])
+                     .returning(PURCHASE_ORDERS.c.po_id, PURCHASE_ORDERS.c.po_number))
+        created.update({number: po_id for po_id, number in conn.execute(statement)})
+    return created
+
+
+def _insert_items(conn, items: pd.DataFrame):
+    if items.empty:
+        return
+    if conn.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        items.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+        buffer.seek(0)
+        with conn.connection.driver_connection.cursor() as cur:
+            cur.copy_expert(f"COPY order_items ({', '.join(ORDER_ITEM_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                            buffer)
+    else:
+        conn.execute(insert(ORDER_ITEMS), items.to_dict(orient="records"))
+
+
+def write_purchase_orders(orders: pd.DataFrame, items: pd.DataFrame) -> dict:
+    """Insert new orders and their items in one transaction; existing po_numbers are left untouched."""
+    with begin() as conn:
+        ensure_tables(conn)
+        created = _insert_orders(conn, orders)
+        new_items = items.loc[items["po_number"].isin(created.keys())]
+        new_items = new_items.assign(po_id=new_items["po_number"].map(created))[ORDER_ITEM_COLUMNS]
+        _insert_items(conn, new_items)
+    skipped = len(items) - len(new_items)
+    if skipped:
+        logger.warning("%d lines not written: their %d purchase orders already exist",
+                       skipped, len(orders) - len(created))
+    return {
+        "purchase_orders": len(created),
+        "order_lines": len(new_items),
+        "existing_orders": len(orders) - len(created),
+        "skipped_lines": skipped,
+        "total_cost": round(float(orders.loc[orders["po_number"].isin(created.keys()), "total_cost"].sum()), 2),
+    }
+
+
+def purchase_order_node(state: dict) -> dict:
+    """Write purchase orders for the run's reorder lines when SUPPLY_CHAIN_PURCHASE_ORDERS=1.
+
+    Sets ``state["purchase_order_summary"]`` and, when missing, ``state["po_run_key"]``.
+    """
+    if not config.PURCHASE_ORDERS:
+        return state
+    lines, today = order_lines(state), date.today()
+    run_key = state.get("po_run_key") or default_run_key(lines, today)
+    state["po_run_key"] = run_key
+    orders, items = build_purchase_orders(lines, today, run_key)
+    state["purchase_order_summary"] = write_purchase_orders(orders, items)
+    return state
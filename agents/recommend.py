@@ -1,44 +1,52 @@
+import numpy as np
 import pandas as pd
 
+from agents import config
+from agents.analyze_risk import effective_daily_demand
+from agents.policies import get_policy, select_policies
+from agents.schema import REORDER_REASONS, categorical
+from agents.state import get_inventory_frame, set_inventory_frame
+
+def compute_reorder(df: pd.DataFrame, policy: str = None, policy_by: str = None,
+                    policy_map: dict = None, policy_params: dict = None, reasons: bool = True) -> pd.DataFrame:
+    """Batched reorder recommendations for every row of ``df``.
+
+    Each row is routed to exactly one policy kernel (see agents/policies.py),
+    so mixing policies costs the same as running a single one. With
+    ``reasons=False`` the ``reorder_reason`` column is left out.
+    """
+    policy = policy or config.REORDER_POLICY
+    policy_by = policy_by if policy_by is not None else config.REORDER_POLICY_BY
+    policy_map = policy_map if policy_map is not None else config.REORDER_POLICY_MAP
+    policy_params = policy_params if policy_params is not None else config.REORDER_POLICY_PARAMS
+
+    n = len(df)
+    daily_demand = effective_daily_demand(df)
+    has_demand = daily_demand != 0
+
+    should_reorder = np.zeros(n, dtype=bool)
+    reorder_qty = np.zeros(n, dtype=np.int64)
+    reorder_reason = np.full(n, "No demand", dtype=object) if reasons else None
+
+    policy_names = select_policies(df, policy, policy_by, policy_map).to_numpy()
+    for name in pd.unique(policy_names[has_demand]):
+        rows = np.flatnonzero(has_demand & (policy_names == name))
+        kernel = get_policy(name)
+        flags, qty, reason = kernel(df.iloc[rows], daily_demand[rows], **policy_params.get(name, {}))
+        should_reorder[rows] = flags
+        reorder_qty[rows] = qty
+        if reasons:
+            reorder_reason[rows] = reason
+
+    result = pd.DataFrame({"should_reorder": should_reorder, "recommended_reorder_qty": reorder_qty}, index=df.index)
+    if reasons:
+        result["reorder_reason"] = categorical(reorder_reason, REORDER_REASONS)
+    return result
+
 def recommend_reorder_node(state: dict) -> dict:
-    df = pd.DataFrame(state["inventory_data"])
-
-    # Default assumptions
-    reorder_days_coverage = 30  # how many days to cover in reorder quantity
-
-    def calculate_reorder(row):
-        daily_demand = row["average_daily_demand"] or (row.get("forecasted_demand_30d", 0) / 30)
-        if daily_demand == 0:
-            return pd.Series({
-                "should_reorder": False,
-                "recommended_reorder_qty": 0,
-                "reorder_reason": "No demand"
-            })
-
-        # Use average lead time + 1 std deviation for buffer
-        lead_time_days = row.get("average_lead_time_days", 0)
-        lead_time_std_dev = row.get("lead_time_std_dev", 0)
-        effective_lead_time = lead_time_days + lead_time_std_dev
-
-        expected_consumption = daily_demand * effective_lead_time
-
-        if row["available_stock"] >= expected_consumption:
-            return pd.Series({
-                "should_reorder": False,
-                "recommended_reorder_qty": 0,
-                "reorder_reason": "Sufficient stock through lead time"
-            })
-
-        target_stock = daily_demand * reorder_days_coverage
-        reorder_qty = max(0, round(target_stock - row["available_stock"]))
-
-        return pd.Series({
-            "should_reorder": True,
-            "recommended_reorder_qty": reorder_qty,
-            "reorder_reason": "Stockout risk within lead time"
-        })
-
-    reorder_info = df.apply(calculate_reorder, axis=1)
-    df = pd.concat([df, reorder_info], axis=1)
-    state["inventory_data"] = df.to_dict(orient="records")
-    return state
+    df = get_inventory_frame(state).copy(deep=False)
+
+    reorder_info = compute_reorder(df)
+    df[reorder_info.columns] = reorder_info
+
+    return set_inventory_frame(state, df)
@@ -0,0 +1,333 @@
+"""Rolling per-location demand rollups maintained from demand_history.
+
+demand_rollups keeps, for every (product, warehouse), the sum, row count and sum of
+squares of ``actual_demand`` over the trailing 7/30/90 days as of the
+watermark date. All three are additive, so a refresh only has to read the
+demand rows inserted since the last watermark plus the rows that slid out of
+each window, instead of re-aggregating the whole history.
+
+``created_at`` is the inserting transaction's start time, so a slow insert
+can commit with a timestamp below rows already applied. The watermark
+therefore trails the newest applied ``created_at`` by ``ROLLUP_LAG``
+seconds: each refresh re-reads the rows created after it, and
+rollup_recent_rows records which of those were already applied so that none
+is counted twice. A row whose insert commits within ``ROLLUP_LAG`` seconds
+of its ``created_at`` is counted exactly once; later commits are missed
+until the next backfill.
+
+    python -m agents.rollups backfill   # rebuild from demand_history
+    python -m agents.rollups refresh    # apply new rows since the watermark
+    python -m agents.rollups verify     # compare against demand_history
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from agents import config
+from agents.db import begin, connect
+
+ROLLUP_NAME = "demand_rollups"
+WINDOWS = (7, 30, 90)
+STATS = ("sum", "count", "sumsq")
+ROLLUP_COLUMNS = [f"demand_{stat}_{w}d" for w in WINDOWS for stat in STATS]
+ROLLUP_KEY = ["product_id", "warehouse_id"]
+RECENT_COLUMNS = ROLLUP_KEY + ["date", "created_at"]
+
+
+def _window_sums(condition: str) -> str:
+    """SELECT list aggregating ``actual_demand`` per window under ``condition``."""
+    columns = []
+    for w in WINDOWS:
+        cond = condition.format(w=w)
+        columns += [
+            f"SUM(CASE WHEN {cond} THEN actual_demand ELSE 0 END) AS demand_sum_{w}d",
+            f"SUM(CASE WHEN {cond} THEN 1 ELSE 0 END) AS demand_count_{w}d",
+            f"SUM(CASE WHEN {cond} THEN actual_demand * actual_demand ELSE 0 END) AS demand_sumsq_{w}d",
+        ]
+    return ",\n            ".join(columns)
+
+
+def window_bounds(as_of: date, prefix: str = "since") -> dict:
+    return {f"{prefix}_{w}": as_of - timedelta(days=w) for w in WINDOWS}
+
+
+# Rows the rollups have seen: created up to the watermark, or applied since
+RECENTLY_APPLIED = """EXISTS (
+            SELECT 1 FROM rollup_recent_rows r
+            WHERE r.rollup_name = :name
+              AND r.product_id = demand_history.product_id
+              AND r.warehouse_id = demand_history.warehouse_id
+              AND r.date = demand_history.date
+        )"""
+APPLIED = f"(created_at <= :created_after OR {RECENTLY_APPLIED})"
+
+# Full aggregate as of :as_of over the applied rows
+FULL_ROLLUP_QUERY = text(f"""
+    SELECT
+        product_id,
+        warehouse_id,
+        {_window_sums("date >= :since_{w}")}
+    FROM demand_history
+    WHERE date >= :since_90
+      AND date <= :as_of
+      AND {APPLIED}
+    GROUP BY product_id, warehouse_id
+""")
+
+# Rows not applied yet, whatever their date
+NEW_ROWS_QUERY = text(f"""
+    SELECT product_id, warehouse_id, date, actual_demand, created_at
+    FROM demand_history
+    WHERE created_at > :created_after
+      AND NOT {RECENTLY_APPLIED}
+""")
+
+# Applied rows entering the windows: dated after the previous as-of date
+ADDED_ROWS_QUERY = text(f"""
+    SELECT
+        product_id,
+        warehouse_id,
+        {_window_sums("date >= :since_{w}")}
+    FROM demand_history
+    WHERE date >= :since_90
+      AND date <= :as_of
+      AND date > :previous_as_of
+      AND {APPLIED}
+    GROUP BY product_id, warehouse_id
+""")
+
+# Previously counted rows that slid out of each window
+DROPPED_ROWS_QUERY = text(f"""
+    SELECT
+        product_id,
+        warehouse_id,
+        {_window_sums("date >= :previous_since_{w} AND date < :since_{w}")}
+    FROM demand_history
+    WHERE date >= :previous_since_90
+      AND date < :since_7
+      AND date <= :previous_as_of
+      AND {APPLIED}
+    GROUP BY product_id, warehouse_id
+""")
+
+UPSERT_DELTA = text(f"""
+    INSERT INTO demand_rollups (product_id, warehouse_id, {", ".join(ROLLUP_COLUMNS)})
+    VALUES (:product_id, :warehouse_id, {", ".join(":" + c for c in ROLLUP_COLUMNS)})
+    ON CONFLICT (product_id, warehouse_id) DO UPDATE SET
+        {", ".join(f"{c} = demand_rollups.{c} + excluded.{c}" for c in ROLLUP_COLUMNS)},
+        refreshed_at = CURRENT_TIMESTAMP
+""")
+
+
+def _read_watermark(conn):
+    query = "SELECT as_of_date, last_created_at FROM rollup_watermarks WHERE rollup_name = :name"
+    if conn.dialect.name == "postgresql":
+        query += " FOR UPDATE"  # serialize concurrent refreshes
+    row = conn.execute(text(query), {"name": ROLLUP_NAME}).first()
+    if row is None:
+        return None, None
+    as_of = row.as_of_date
+    if isinstance(as_of, str):
+        as_of = date.fromisoformat(as_of)
+    return as_of, pd.Timestamp(row.last_created_at).to_pydatetime()
+
+
+def _write_watermark(conn, as_of, created_after):
+    params = {"name": ROLLUP_NAME, "as_of": as_of, "created": created_after}
+    updated = conn.execute(text("""
+        UPDATE rollup_watermarks SET as_of_date = :as_of, last_created_at = :created
+        WHERE rollup_name = :name
+    """), params)
+    if updated.rowcount == 0:
+        conn.execute(text("""
+            INSERT INTO rollup_watermarks (rollup_name, as_of_date, last_created_at)
+            VALUES (:name, :as_of, :created)
+        """), params)
+
+
+def _max_created_at(conn):
+    return conn.execute(text("SELECT MAX(created_at) FROM demand_history")).scalar()
+
+
+def _new_row_sums(rows: pd.DataFrame, as_of: date) -> pd.DataFrame:
+    """Window sums of ``rows`` (NEW_ROWS_QUERY columns) as of ``as_of``, indexed by ROLLUP_KEY."""
+    age = (pd.Timestamp(as_of) - pd.to_datetime(rows["date"])).dt.days.to_numpy()
+    demand = rows["actual_demand"].to_numpy(dtype=np.int64)
+    sums = rows[ROLLUP_KEY].copy()
+    for w in WINDOWS:
+        inside = (age >= 0) & (age <= w)
+        sums[f"demand_sum_{w}d"] = np.where(inside, demand, 0)
+        sums[f"demand_count_{w}d"] = inside.astype(np.int64)
+        sums[f"demand_sumsq_{w}d"] = np.where(inside, demand * demand, 0)
+    return sums.groupby(ROLLUP_KEY)[ROLLUP_COLUMNS].sum()
+
+
+def _apply_new_rows(conn, as_of, created_after, recent: pd.DataFrame) -> tuple:
+    """Read the rows not applied yet; returns (their window sums, new watermark).
+
+    ``recent`` holds the rows applied after ``created_after`` so far.
+    rollup_recent_rows is rewritten with those not older than the new
+    watermark, which trails the newest ``created_at`` by ROLLUP_LAG.
+    """
+    new = pd.read_sql(NEW_ROWS_QUERY, conn, params={"name": ROLLUP_NAME, "created_after": created_after})
+    seen = pd.concat([recent, new[RECENT_COLUMNS]], ignore_index=True)
+    seen["created_at"] = pd.to_datetime(seen["created_at"], format="ISO8601")
+    if len(seen):
+        created_after = max(created_after, seen["created_at"].max() - pd.Timedelta(seconds=config.ROLLUP_LAG))
+
+    # Rows stamped exactly at the watermark are kept: SQLite compares the stored text, which can sort after it
+    seen = seen.loc[seen["created_at"] >= created_after].reset_index(drop=True)
+    conn.execute(text("DELETE FROM rollup_recent_rows WHERE rollup_name = :name"), {"name": ROLLUP_NAME})
+    if len(seen):
+        conn.execute(
+            text("""
+                INSERT INTO rollup_recent_rows (rollup_name, product_id, warehouse_id, date, created_at)
+                VALUES (:name, :product_id, :warehouse_id, :date, :created_at)
+            """),
+            seen.assign(name=ROLLUP_NAME, date=pd.to_datetime(seen["date"]).dt.date,
+                        created_at=seen["created_at"].dt.to_pydatetime()).to_dict(orient="records"),
+        )
+    return _new_row_sums(new, as_of), pd.Timestamp(created_after).to_pydatetime()
+
+
+def _upsert(conn, delta: pd.DataFrame) -> int:
+    delta = delta.loc[delta.ne(0).any(axis=1)].astype(np.int64).reset_index()
+    if not delta.empty:
+        conn.execute(UPSERT_DELTA, delta.to_dict(orient="records"))
+    return len(delta)
+
+
+def _backfill(conn, as_of):
+    newest = _max_created_at(conn)
+    conn.execute(text("DELETE FROM demand_rollups"))
+    if newest is not None:
+        # Rows near the newest are applied like a refresh would, so that they are recorded as such
+        created_after = (pd.Timestamp(newest) - pd.Timedelta(seconds=config.ROLLUP_LAG)).to_pydatetime()
+        conn.execute(text("DELETE FROM rollup_recent_rows WHERE rollup_name = :name"), {"name": ROLLUP_NAME})
+        params = {"name": ROLLUP_NAME, "as_of": as_of, "created_after": created_after, **window_bounds(as_of)}
+        conn.execute(text(f"""
+            INSERT INTO demand_rollups (product_id, warehouse_id, {", ".join(ROLLUP_COLUMNS)})
+            {FULL_ROLLUP_QUERY.text}
+        """), params)
+        new, created_after = _apply_new_rows(conn, as_of, created_after, pd.DataFrame(columns=RECENT_COLUMNS))
+        _upsert(conn, new)
+        _write_watermark(conn, as_of, created_after)
+    count = conn.execute(text("SELECT COUNT(*) FROM demand_rollups")).scalar()
+    return {"mode": "backfill", "as_of": as_of, "products": count}
+
+
+def backfill_rollups(as_of: date = None) -> dict:
+    """Rebuild demand_rollups from scratch in one transaction."""
+    with begin() as conn:
+        return _backfill(conn, as_of or date.today())
+
+
+def refresh_rollups(as_of: date = None) -> dict:
+    """Apply demand rows not applied yet and slide the windows to ``as_of``.
+
+    Falls back to a backfill when there is no watermark yet or the windows
+    moved by more than the longest window.
+    """
+    as_of = as_of or date.today()
+    with begin() as conn:
+        previous_as_of, created_after = _read_watermark(conn)
+        if previous_as_of is None or (as_of - previous_as_of).days > max(WINDOWS) or as_of < previous_as_of:
+            return _backfill(conn, as_of)
+
+        params = {
+            "name": ROLLUP_NAME,
+            "as_of": as_of,
+            "previous_as_of": previous_as_of,
+            "created_after": created_after,
+            **window_bounds(as_of),
+            **window_bounds(previous_as_of, prefix="previous_since"),
+        }
+        # The windows move over the rows applied so far before the new rows are added
+        added = pd.read_sql(ADDED_ROWS_QUERY, conn, params=params)
+        dropped = pd.read_sql(DROPPED_ROWS_QUERY, conn, params=params) if as_of > previous_as_of else added.iloc[0:0]
+        recent = pd.read_sql(text(f"SELECT {', '.join(RECENT_COLUMNS)} FROM rollup_recent_rows "
+                                  "WHERE rollup_name = :name"), conn, params={"name": ROLLUP_NAME})
+        new, created_after = _apply_new_rows(conn, as_of, created_after, recent)
+
+        delta = (
+            pd.concat([added.set_index(ROLLUP_KEY), new, -dropped.set_index(ROLLUP_KEY)])
+            .groupby(level=ROLLUP_KEY).sum()
+        )
+        products = _upsert(conn, delta)
+        _write_watermark(conn, as_of, created_after)
+
+    return {"mode": "refresh", "as_of": as_of, "products": products}
+
+
+def _variance(total, count, sumsq):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (sumsq - total * total / count) / (count - 1)
+    return np.where(count > 1, np.maximum(var, 0), np.nan)
+
+
+def with_rollup_stats(rollups: pd.DataFrame) -> pd.DataFrame:
+    """Add average and sample variance columns for every window."""
+    rollups = rollups.copy()
+    for w in WINDOWS:
+        total = rollups[f"demand_sum_{w}d"].to_numpy(dtype=float)
+        count = rollups[f"demand_count_{w}d"].to_numpy(dtype=float)
+        sumsq = rollups[f"demand_sumsq_{w}d"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rollups[f"demand_avg_{w}d"] = np.where(count > 0, total / count, np.nan)
+        rollups[f"demand_var_{w}d"] = _variance(total, count, sumsq)
+    return rollups
+
+
+def load_demand_rollups() -> pd.DataFrame:
+    """One row per (product, warehouse) with rolling sums, counts, averages and variances."""
+    with connect() as conn:
+        rollups = pd.read_sql(
+            text(f"SELECT product_id, warehouse_id, {', '.join(ROLLUP_COLUMNS)} FROM demand_rollups"), conn
+        )
+    return with_rollup_stats(rollups)
+
+
+def verify_rollups() -> pd.DataFrame:
+    """(product, warehouse) rows whose stored rollups differ from a fresh aggregate of demand_history."""
+    with connect() as conn:
+        as_of, created_after = _read_watermark(conn)
+        if as_of is None:
+            raise RuntimeError("demand_rollups has no watermark; run `python -m agents.rollups backfill` first")
+        params = {"name": ROLLUP_NAME, "as_of": as_of, "created_after": created_after, **window_bounds(as_of)}
+        expected = pd.read_sql(FULL_ROLLUP_QUERY, conn, params=params).set_index(ROLLUP_KEY)
+        stored = pd.read_sql(
+            text(f"SELECT product_id, warehouse_id, {', '.join(ROLLUP_COLUMNS)} FROM demand_rollups"), conn
+        ).set_index(ROLLUP_KEY)
+
+    expected, stored = expected.align(stored, join="outer", fill_value=0)
+    mismatched = expected.astype(np.int64).ne(stored.astype(np.int64)).any(axis=1)
+    return expected.loc[mismatched].join(stored.loc[mismatched], lsuffix="_expected", rsuffix="_stored")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the demand_rollups summary table.")
+    parser.add_argument("command", choices=["backfill", "refresh", "verify"])
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="as-of date (default: today)")
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        print(backfill_rollups(args.as_of))
+    elif args.command == "refresh":
+        print(refresh_rollups(args.as_of))
+    else:
+        mismatches = verify_rollups()
+        if mismatches.empty:
+            print("demand_rollups matches demand_history")
+            return 0
+        print(f"{len(mismatches)} product-warehouse rows differ from demand_history:")
+        print(mismatches.to_string())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Typed column schema of the inventory frame shared by every node.
+
+Fetch casts query results once with ``apply_schema``: ids and stock counts
+become fixed-width integers, measurements use ``config.FLOAT_DTYPE`` and the
+low-cardinality labels (ABC classes, reorder reasons) are categoricals, so a
+row costs a few dozen bytes instead of a dict of boxed values.
+"""
+import pandas as pd
+
+from agents import config
+
+ABC_CLASSES = ["A", "B", "C"]
+XYZ_CLASSES = ["X", "Y", "Z"]
+ABC_XYZ_CLASSES = [abc + xyz for abc in ABC_CLASSES for xyz in XYZ_CLASSES]
+
+# Reasons emitted by the built-in reorder policies (agents/policies.py);
+# custom policies may add their own
+REORDER_REASONS = [
+    "No demand",
+    "Stockout risk within lead time",
+    "Sufficient stock through lead time",
+    "Stock at or below reorder point",
+    "Stock above reorder point",
+    "Below service-level reorder point",
+    "Above service-level reorder point",
+]
+
+FLOAT = "float"  # resolved to config.FLOAT_DTYPE when the schema is applied
+
+INVENTORY_SCHEMA = {
+    "product_id": "int64",
+    "warehouse_id": "int32",
+    "sku": "str",
+    "name": "str",
+    "category": "str",
+    "current_stock": "int32",
+    "committed_stock": "int32",
+    "reorder_point": "int32",
+    "available_stock": "int32",
+    "average_lead_time_days": FLOAT,
+    "lead_time_std_dev": FLOAT,
+    "worst_case_lead_time": FLOAT,
+    "unit_cost": FLOAT,
+    "supplier_id": "int32",
+    "reliability_score": FLOAT,
+    "average_daily_demand": FLOAT,
+    "recent_demand_30d": FLOAT,
+    "recent_demand_variance": FLOAT,
+    "last_stockout_date": "datetime64[s]",
+    "shelf_life_days": "int32",
+    "financial_classification": ABC_CLASSES,
+    "operational_risk": ABC_CLASSES,
+    "computed_financial_class": ABC_CLASSES,
+    "computed_operational_risk": ABC_CLASSES,
+    "computed_variability_class": XYZ_CLASSES,
+    "computed_abc_xyz_class": ABC_XYZ_CLASSES,
+    "reorder_reason": REORDER_REASONS,
+}
+
+REQUIRED_COLUMNS = ("product_id",)
+
+
+class SchemaError(ValueError):
+    """A column is missing or holds values its schema dtype cannot represent."""
+
+
+def categorical(values, categories: list) -> pd.Categorical:
+    """``values`` as a Categorical over ``categories``, extended by any values not listed."""
+    values = pd.Series(values, copy=False)
+    extra = sorted(set(values.dropna().unique()) - set(categories))
+    return pd.Categorical(values, categories=list(categories) + extra)
+
+
+def _cast(series: pd.Series, dtype) -> pd.Series:
+    if isinstance(dtype, list):
+        unknown = set(series.dropna().unique()) - set(dtype)
+        if unknown:
+            raise ValueError(f"unexpected values {sorted(map(str, unknown))}")
+        return series.astype(pd.CategoricalDtype(dtype))
+    if dtype == FLOAT:
+        return pd.to_numeric(series).astype(config.FLOAT_DTYPE)
+    if dtype.startswith("int"):
+        numeric = pd.to_numeric(series)
+        # Missing values (e.g. shelf life of non-perishables) keep the column floating
+        if numeric.isna().any():
+            return numeric.astype(config.FLOAT_DTYPE)
+        return numeric.astype(dtype)
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(series).astype(dtype)
+    return series.astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame, schema: dict = None) -> pd.DataFrame:
+    """Cast the columns of ``df`` listed in ``schema``; other columns pass through unchanged.
+
+    Raises SchemaError naming the column when a required column is missing or
+    a value cannot be converted.
+    """
+    schema = INVENTORY_SCHEMA if schema is None else schema
+    missing = [c for c in REQUIRED_COLUMNS if c not in df]
+    if missing:
+        raise SchemaError(f"Inventory frame is missing required columns {missing}")
+
+    columns = {}
+    for name, dtype in schema.items():
+        if name not in df:
+            continue
+        try:
+            columns[name] = _cast(df[name], dtype)
+        except (ValueError, TypeError) as exc:
+            raise SchemaError(f"Column {name!r} does not match schema dtype {dtype}: {exc}") from None
+    return df.assign(**columns)
+
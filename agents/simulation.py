@@ -0,0 +1,198 @@
+"""Monte Carlo stockout simulation over lead-time and demand scenarios.
+
+Every inventory row gets ``n_scenarios`` draws of a replenishment lead time
+and of the demand seen during it, held as (rows x scenarios) arrays:
+
+* Lead time is lognormal with the supplier's ``average_lead_time_days`` and
+  ``lead_time_std_dev``. With probability ``1 - reliability_score`` the
+  delivery is late and takes at least ``worst_case_lead_time``.
+* Demand over a lead time L is lognormal with mean ``d * L`` and variance
+  ``sd^2 * L``, using the forecast's ``demand_std_dev`` when present and a
+  Poisson-like ``sqrt(d)`` otherwise.
+
+Rows are processed in chunks sized to ``max_memory_mb``, optionally on a
+process pool. Each row draws from its own stream seeded by
+(seed, product_id, warehouse_id), so results do not depend on chunking,
+worker count, row order or sharding.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from agents import config
+from agents.analyze_risk import effective_daily_demand
+
+FILL_RATE_QUANTILES = (0.05, 0.5, 0.95)
+
+SIMULATION_COLUMNS = [
+    "stockout_probability", "expected_shortfall", "fill_rate_mean",
+    "fill_rate_p5", "fill_rate_p50", "fill_rate_p95",
+]
+
+# (rows x scenarios) arrays alive at once while a chunk is simulated
+_ARRAYS_PER_ROW = 5
+
+
+def _column(df: pd.DataFrame, name: str, default) -> np.ndarray:
+    if name not in df:
+        return np.full(len(df), default, dtype=np.float64)
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def simulation_inputs(df: pd.DataFrame) -> dict:
+    """Per-row parameters of the simulation as float64/int64 arrays."""
+    daily = effective_daily_demand(df)
+    demand_std = _column(df, "demand_std_dev", np.nan)
+    demand_std = np.where(np.isnan(demand_std), np.sqrt(daily), demand_std)
+
+    lead_time = np.nan_to_num(_column(df, "average_lead_time_days", 0.0))
+    lead_time_std = np.nan_to_num(_column(df, "lead_time_std_dev", 0.0))
+    worst = _column(df, "worst_case_lead_time", np.nan)
+    worst = np.where(np.isnan(worst), lead_time + 2 * lead_time_std, np.maximum(worst, lead_time))
+
+    reliability = np.clip(np.nan_to_num(_column(df, "reliability_score", 1.0), nan=1.0), 0.0, 1.0)
+    warehouse = df["warehouse_id"] if "warehouse_id" in df else pd.Series(1, index=df.index)
+    return {
+        "available": np.maximum(np.nan_to_num(_column(df, "available_stock", 0.0)), 0.0),
+        "daily_demand": daily,
+        "demand_std": demand_std,
+        "lead_time": lead_time,
+        "lead_time_std": lead_time_std,
+        "worst_lead_time": worst,
+        "reliability": reliability,
+        "product_id": df["product_id"].to_numpy(dtype=np.int64),
+        "warehouse_id": warehouse.fillna(1).to_numpy(dtype=np.int64),
+    }
+
+
+def chunk_rows(n_scenarios: int, max_memory_mb: float, dtype=np.float64) -> int:
+    """Rows per chunk so the scenario arrays of one chunk fit in ``max_memory_mb``."""
+    per_row = _ARRAYS_PER_ROW * n_scenarios * np.dtype(dtype).itemsize
+    return max(1, int(max_memory_mb * 2**20 // per_row))
+
+
+def _lognormal_params(mean, variance):
+    """(mu, sigma) of a lognormal with the given mean and variance; mean must be > 0."""
+    sigma2 = np.log1p(variance / mean ** 2)
+    return np.log(mean) - sigma2 / 2, np.sqrt(sigma2)
+
+
+def _draw(inputs: dict, n_scenarios: int, seed: int, dtype):
+    """Standard normal lead-time and demand shocks plus late-delivery uniforms, one stream per row."""
+    n = len(inputs["product_id"])
+    z_lead = np.empty((n, n_scenarios), dtype=dtype)
+    z_demand = np.empty((n, n_scenarios), dtype=dtype)
+    late = np.empty((n, n_scenarios), dtype=dtype)
+    for i, key in enumerate(zip(inputs["product_id"].tolist(), inputs["warehouse_id"].tolist())):
+        rng = np.random.default_rng([seed, *key])
+        rng.standard_normal(out=z_lead[i], dtype=dtype)
+        rng.standard_normal(out=z_demand[i], dtype=dtype)
+        rng.random(out=late[i], dtype=dtype)
+    return z_lead, z_demand, late
+
+
+def simulate_chunk(inputs: dict, n_scenarios: int, seed: int = 0, dtype=np.float64) -> dict:
+    """Simulate one chunk of rows; returns one array per SIMULATION_COLUMNS entry.
+
+    The (rows x scenarios) arrays are updated in place to stay within the
+    chunk's memory budget.
+    """
+    dtype = np.dtype(dtype).type
+    lead_time, demand, late = _draw(inputs, n_scenarios, seed, dtype)
+    col = {k: v[:, None].astype(dtype) for k, v in inputs.items() if v.dtype.kind == "f"}
+
+    # Lead time scenarios; a late delivery takes at least the worst case
+    has_lead_time = col["lead_time"] > 0
+    mu, sigma = _lognormal_params(np.where(has_lead_time, col["lead_time"], dtype(1)), col["lead_time_std"] ** 2)
+    lead_time *= sigma
+    lead_time += mu
+    np.exp(lead_time, out=lead_time)
+    lead_time *= has_lead_time
+    np.greater_equal(late, col["reliability"], out=late)
+    late *= col["worst_lead_time"]
+    np.maximum(lead_time, late, out=lead_time)
+    del late
+
+    # Demand over each lead time: d * L * exp(sigma * z - sigma^2 / 2) with
+    # sigma^2 = log(1 + cv^2 / L), cv being the daily coefficient of variation
+    daily = col["daily_demand"]
+    cv2 = np.where(daily > 0, col["demand_std"] ** 2 / np.where(daily > 0, daily, dtype(1)) ** 2, dtype(0))
+    sigma2 = np.maximum(lead_time, dtype(1e-6))
+    np.divide(cv2, sigma2, out=sigma2)
+    np.log1p(sigma2, out=sigma2)
+    demand *= np.sqrt(sigma2)
+    sigma2 *= dtype(0.5)
+    demand -= sigma2
+    del sigma2
+    np.exp(demand, out=demand)
+    demand *= lead_time
+    demand *= daily
+    del lead_time
+
+    # Shortfall and fill rate against available stock
+    shortfall = demand - col["available"]
+    np.maximum(shortfall, dtype(0), out=shortfall)
+    has_demand = demand > 0
+    np.divide(shortfall, demand, out=demand, where=has_demand)
+    np.subtract(dtype(1), demand, out=demand)
+    demand[~has_demand] = 1
+    fill_rate = demand
+    del has_demand
+
+    quantiles = np.quantile(fill_rate, FILL_RATE_QUANTILES, axis=1)
+    return {
+        "stockout_probability": np.count_nonzero(shortfall, axis=1) / n_scenarios,
+        "expected_shortfall": shortfall.mean(axis=1),
+        "fill_rate_mean": fill_rate.mean(axis=1),
+        "fill_rate_p5": quantiles[0],
+        "fill_rate_p50": quantiles[1],
+        "fill_rate_p95": quantiles[2],
+    }
+
+
+def _simulate_chunk_args(args):
+    return simulate_chunk(*args)
+
+
+def simulate_stockouts(
+    df: pd.DataFrame,
+    n_scenarios: int = None,
+    seed: int = None,
+    max_memory_mb: float = None,
+    workers: int = None,
+    dtype=None,
+    mp_context=None,
+) -> pd.DataFrame:
+    """Stockout probability, expected shortfall (units) and fill-rate distribution per row of ``df``.
+
+    ``workers > 1`` simulates chunks on a process pool; inside daemonic
+    processes (e.g. shard workers) chunks always run inline.
+    """
+    n_scenarios = n_scenarios or config.SIMULATION_SCENARIOS
+    seed = config.SIMULATION_SEED if seed is None else seed
+    max_memory_mb = max_memory_mb or config.SIMULATION_MAX_MEMORY_MB
+    workers = config.SIMULATION_WORKERS if workers is None else workers
+    dtype = np.dtype(dtype or config.FLOAT_DTYPE).type
+
+    inputs = simulation_inputs(df)
+    step = chunk_rows(n_scenarios, max_memory_mb, dtype)
+    tasks = [
+        ({k: v[start:start + step] for k, v in inputs.items()}, n_scenarios, seed, dtype)
+        for start in range(0, len(df), step)
+    ]
+
+    if workers > 1 and len(tasks) > 1 and not multiprocessing.current_process().daemon:
+        ctx = multiprocessing.get_context(mp_context)
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=ctx) as pool:
+            results = list(pool.map(_simulate_chunk_args, tasks))
+    else:
+        results = [simulate_chunk(*task) for task in tasks]
+
+    if not results:
+        return pd.DataFrame({name: np.empty(0, dtype=dtype) for name in SIMULATION_COLUMNS}, index=df.index)
+    return pd.DataFrame(
+        {name: np.concatenate([r[name] for r in results]).astype(dtype) for name in SIMULATION_COLUMNS},
+        index=df.index,
+    )
@@ -0,0 +1,315 @@
+"""Multi-supplier sourcing: split each reorder across the product's qualified suppliers.
+
+Every row flagged ``should_reorder`` is allocated over its product's
+suppliers. For the whole batch the problem is
+
+    minimise    sum_ij c_ij x_ij + F y_ij  +  P sum_i s_i
+    subject to  sum_j x_ij + s_i >= q_i                 cover the reorder quantity
+                moq_ij y_ij <= x_ij <= cap_ij y_ij      MOQ and per-order capacity
+                sum_i x_ij <= capacity_j                supplier capacity per cycle
+                y_ij in {0, 1}
+
+where i is an inventory row, j one of its product's suppliers, c_ij the
+landed unit cost (unit_cost marked up by config.SOURCING_WEIGHTS for long
+and variable lead times and unreliability) and F the fixed cost of an order
+line. A reorder below a supplier's MOQ is rounded up to it when that is the
+cheapest option. The shortfall s_i carries a penalty above any landed cost,
+so the problem is always feasible and quantity is only left unsourced when
+capacities leave no other choice.
+
+A single MIP over 100k rows is far too slow for HiGHS, so it is solved in
+three batched stages:
+
+1. For each row, every subset of its MAX_OPTIONS cheapest suppliers is
+   priced at once: given the subset, filling MOQs and then the cheapest
+   lines first is optimal. Rows whose suppliers have no capacity limit are
+   done here, exactly.
+2. If those choices overrun a supplier's capacity, an LP over the candidate
+   subsets of the rows sharing capacitated suppliers (one convex combination
+   per row, capacity rows across all of them) is solved with HiGHS. In a
+   basic solution at most one row per binding capacity is fractional.
+3. The fractional rows are solved as the MIP above against the capacity
+   the others left over. So are the rows left short while a supplier they
+   could order from has capacity to spare and, up to MAX_RETRY_ROWS, the
+   rows holding capacity the short ones could use.
+
+Every line's cap includes its supplier's capacity. Rows short only because
+others hold cheaper capacity they would need can still be sourced above
+the exact optimum.
+"""
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from sqlalchemy import bindparam, text
+
+from agents import config
+from agents.db import connect
+from agents.state import get_inventory_frame
+
+SOURCING_OPTIONS_QUERY = text("""
+    SELECT
+        ps.product_id,
+        ps.supplier_id,
+        ps.unit_cost,
+        ps.average_lead_time_days,
+        ps.lead_time_std_dev,
+        ps.min_order_qty,
+        ps.max_order_qty,
+        s.reliability_score,
+        s.capacity_units
+    FROM product_suppliers ps
+    JOIN suppliers s ON ps.supplier_id = s.supplier_id
+    WHERE ps.product_id IN :product_ids
+    ORDER BY ps.product_id, ps.supplier_id
+""").bindparams(bindparam("product_ids", expanding=True))
+
+PLAN_COLUMNS = ["product_id", "warehouse_id", "supplier_id", "order_qty", "unit_cost", "landed_unit_cost",
+                "average_lead_time_days", "reliability_score", "order_cost"]
+
+MAX_OPTIONS = 5  # cheapest suppliers per row whose subsets are enumerated (2**5 candidates)
+FRACTIONAL_TOL = 1e-6
+MAX_RETRY_ROWS = 2000  # most rows stage 3 re-solves so that short rows can displace others
+
+
+def load_sourcing_options(product_ids, chunk_size: int = 10_000) -> pd.DataFrame:
+    """Every qualified supplier of ``product_ids`` with its terms, one row per (product, supplier)."""
+    product_ids = np.unique(np.asarray(product_ids, dtype=np.int64)).tolist()
+    with connect() as conn:
+        frames = [pd.read_sql(SOURCING_OPTIONS_QUERY, conn, params={"product_ids": product_ids[i:i + chunk_size]})
+                  for i in range(0, len(product_ids), chunk_size)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def landed_unit_cost(options: pd.DataFrame, weights: dict = None) -> np.ndarray:
+    """unit_cost marked up for lead time, lead-time variability and unreliability."""
+    weights = weights or config.SOURCING_WEIGHTS
+    unit_cost = options["unit_cost"].to_numpy(dtype=float)
+    markup = (weights.get("lead_time_days", 0) * options["average_lead_time_days"].fillna(0).to_numpy(dtype=float)
+              + weights.get("lead_time_std_dev", 0) * options["lead_time_std_dev"].fillna(0).to_numpy(dtype=float)
+              + weights.get("unreliability", 0) * (1 - options["reliability_score"].fillna(1).to_numpy(dtype=float)))
+    return unit_cost * (1 + markup)
+
+
+def _allocate(cost, moq, cap, qty, on):
+    """Cheapest quantities when exactly the lines in ``on`` are ordered from.
+
+    All arguments are (rows, k) arrays (``qty`` is per row) with each row's
+    lines in ascending cost. Returns (x, shortfall, line cost).
+    """
+    base = np.where(on, moq, 0.0)
+    room = np.where(on, cap - moq, 0.0)
+    need = np.maximum(0.0, qty - base.sum(axis=1))
+    filled_before = np.cumsum(room, axis=1) - room
+    x = base + np.clip(need[:, None] - filled_before, 0.0, room)
+    shortfall = np.maximum(0.0, need - room.sum(axis=1))
+    return x, shortfall, (cost * x).sum(axis=1)
+
+
+def _mask_bits(masks, k: int) -> np.ndarray:
+    return ((np.asarray(masks)[..., None] >> np.arange(k)) & 1).astype(bool)
+
+
+def _solve_mip(row, cost, moq, cap, qty, supplier, capacity, order_cost, penalty, time_limit, mip_gap):
+    """The module-level MIP for the lines of a few rows; returns (x, solver message).
+
+    ``row`` indexes ``qty``, ``supplier`` indexes ``capacity`` (inf = unlimited).
+    """
+    m, n = len(row), len(qty)
+    c = np.concatenate([cost, np.full(m, order_cost), np.full(n, penalty)])
+    integrality = np.concatenate([np.zeros(m), np.ones(m), np.zeros(n)])
+    upper = np.concatenate([cap, np.where(cap >= moq, 1.0, 0.0), qty])  # MOQ above max_order_qty: unusable
+    eye_m = sp.identity(m, format="csr")
+
+    cover = sp.hstack([sp.csr_array((np.ones(m), (row, np.arange(m))), shape=(n, m)),
+                       sp.csr_array((n, m)), sp.identity(n, format="csr")])
+    constraints = [LinearConstraint(cover, qty, np.inf),
+                   LinearConstraint(sp.hstack([eye_m, -sp.diags_array(moq), sp.csr_array((m, n))]), 0, np.inf),
+                   LinearConstraint(sp.hstack([eye_m, -sp.diags_array(cap), sp.csr_array((m, n))]), -np.inf, 0)]
+
+    limited = np.unique(supplier[np.isfinite(capacity[supplier])])
+    if len(limited):
+        keep = np.isin(supplier, limited)
+        shared = sp.csr_array((np.ones(keep.sum()), (np.searchsorted(limited, supplier[keep]), np.flatnonzero(keep))),
+                              shape=(len(limited), m))
+        constraints.append(LinearConstraint(sp.hstack([shared, sp.csr_array((len(limited), m + n))]),
+                                            -np.inf, np.maximum(capacity[limited], 0)))
+
+    result = milp(c, integrality=integrality, bounds=Bounds(0, upper), constraints=constraints,
+                  options={"time_limit": time_limit, "mip_rel_gap": mip_gap})
+    if result.x is None:
+        raise RuntimeError(f"Sourcing optimization failed: {result.message}")
+    # Integral at the optimum: with y fixed this is a transportation problem
+    return np.rint(result.x[:m]), result.message
+
+
+def solve_sourcing(demand: pd.DataFrame, options: pd.DataFrame, order_cost: float = None,
+                   time_limit: float = None, mip_gap: float = None) -> tuple:
+    """Allocate ``demand`` (product_id, qty, optional warehouse_id) across ``options``.
+
+    Returns (plan, info): one plan row per order line with a positive
+    quantity, and a dict with the unsourced quantity per demand row and how
+    the solve went.
+    """
+    order_cost = config.SOURCING_ORDER_COST if order_cost is None else order_cost
+    time_limit = config.SOURCING_TIME_LIMIT if time_limit is None else time_limit
+    mip_gap = config.SOURCING_MIP_GAP if mip_gap is None else mip_gap
+
+    demand = demand.reset_index(drop=True)
+    qty = demand["qty"].to_numpy(dtype=float)
+    n = len(demand)
+    info = {"status": "optimal", "unsourced": qty.copy(), "lp_rows": 0, "mip_rows": 0}
+    if n == 0:
+        return pd.DataFrame(columns=PLAN_COLUMNS), info
+
+    # Candidate lines: one per (demand row, supplier of its product), cheapest first
+    lines = demand[["product_id"]].reset_index(names="row").merge(options, on="product_id", how="inner")
+    lines["landed_unit_cost"] = landed_unit_cost(lines)
+    lines = lines.sort_values(["row", "landed_unit_cost", "supplier_id"], ignore_index=True)
+    row = lines["row"].to_numpy()
+    cost = lines["landed_unit_cost"].to_numpy()
+    moq = lines["min_order_qty"].fillna(1).to_numpy(dtype=float)
+    supplier_ids, supplier = np.unique(lines["supplier_id"].to_numpy(), return_inverse=True)
+    capacity = (lines.groupby("supplier_id")["capacity_units"].first().reindex(supplier_ids)
+                .fillna(np.inf).to_numpy(dtype=float))
+    # Ordering more than max(q, MOQ) on one line never pays, and no line can take more than its
+    # supplier's whole capacity, so both bound x as well
+    cap = np.minimum.reduce([lines["max_order_qty"].fillna(np.inf).to_numpy(dtype=float),
+                             np.maximum(qty[row], moq), np.maximum(capacity[supplier], 0)])
+    penalty = 10 * (cost.max(initial=0) + order_cost) + 1
+
+    # (n, K) views of each row's K cheapest lines; slot -1 = no line
+    rank = lines.groupby("row").cumcount().to_numpy()
+    k = int(np.clip(rank.max(initial=0) + 1, 1, MAX_OPTIONS))
+    slot = np.full((n, k), -1)
+    enumerated = rank < k
+    slot[row[enumerated], rank[enumerated]] = np.flatnonzero(enumerated)
+    exists = slot >= 0
+    s = np.where(exists, slot, 0)
+    c_k, moq_k, cap_k = (np.where(exists, a[s], 0.0) for a in (cost, moq, cap))
+    usable = exists & (cap_k >= moq_k)
+    limited_k = exists & np.isfinite(capacity[supplier[s]])
+
+    # Stage 1: price every subset of every row
+    masks = np.arange(1 << k)
+    totals = np.empty((len(masks), n))
+    for mask, on in zip(masks, _mask_bits(masks, k)):
+        on = np.broadcast_to(on, (n, k))
+        _, shortfall, line_cost = _allocate(c_k, moq_k, cap_k, qty, on)
+        totals[mask] = line_cost + order_cost * on.sum(axis=1) + penalty * shortfall
+        totals[mask, ~(usable | ~on).all(axis=1)] = np.inf
+    choice = totals.argmin(axis=0)
+
+    x_k = np.zeros((n, k))
+    solved = np.ones(n, dtype=bool)
+    x_k[:], _, _ = _allocate(c_k, moq_k, cap_k, qty, _mask_bits(choice, k))
+    used = np.bincount(supplier[s[exists]], weights=x_k[exists], minlength=len(supplier_ids))
+
+    mip_rows = np.zeros(0, dtype=np.int64)
+    if (used > capacity + FRACTIONAL_TOL).any():
+        # Stage 2: LP over candidate subsets of the rows sharing capacitated suppliers
+        coupled = np.flatnonzero(limited_k.any(axis=1))
+        uses_limited = np.array([(bits & limited_k[coupled]).any(axis=1) for bits in _mask_bits(masks, k)])
+        free_best = np.where(uses_limited, np.inf, totals[:, coupled]).min(axis=0)
+        # A subset costing more than the best one free of capacity limits is never worth it
+        cand_mask, cand = np.nonzero(np.isfinite(totals[:, coupled]) & (totals[:, coupled] <= free_best))
+        cand_row = coupled[cand]
+        on = _mask_bits(cand_mask, k)
+        cand_x, _, _ = _allocate(c_k[cand_row], moq_k[cand_row], cap_k[cand_row], qty[cand_row], on)
+
+        p = len(cand_row)
+        entry_p, entry_slot = np.nonzero((cand_x > 0) & limited_k[cand_row])
+        limited = np.flatnonzero(np.isfinite(capacity))
+        entry_supplier = np.searchsorted(limited, supplier[s[cand_row[entry_p], entry_slot]])
+        usage = sp.csr_array((cand_x[entry_p, entry_slot], (entry_supplier, entry_p)), shape=(len(limited), p))
+        position = np.searchsorted(coupled, cand_row)
+        assign = sp.csr_array((np.ones(p), (position, np.arange(p))), shape=(len(coupled), p))
+        result = linprog(totals[cand_mask, cand_row], A_ub=usage, b_ub=capacity[limited], A_eq=assign,
+                         b_eq=np.ones(len(coupled)), bounds=(0, 1), method="highs",
+                         options={"time_limit": time_limit})
+        if result.x is None:
+            raise RuntimeError(f"Sourcing optimization failed: {result.message}")
+
+        best = pd.Series(result.x).groupby(position).idxmax().to_numpy()
+        integral = result.x[best] >= 1 - FRACTIONAL_TOL
+        x_k[coupled[integral]] = cand_x[best[integral]]
+        mip_rows = coupled[~integral]
+        x_k[mip_rows] = 0.0
+        solved[mip_rows] = False
+        info.update(status=result.message, lp_rows=len(coupled))
+
+    x = np.zeros(len(lines))
+    x[s[exists & solved[:, None]]] = x_k[exists & solved[:, None]]
+
+    # Rows left short while a supplier they could order from still has capacity are re-solved
+    # exactly against what the other rows leave over. Within MAX_RETRY_ROWS, so are the rows
+    # holding capacity they could use, hop by hop, so that those can move to other suppliers
+    left = capacity - np.bincount(supplier, weights=x, minlength=len(supplier_ids))
+    short = qty - np.bincount(row, weights=x, minlength=n) > FRACTIONAL_TOL
+    room = (cap >= moq) & (np.minimum(cap - x, left[supplier]) > FRACTIONAL_TOL)
+    retry = np.zeros(n, dtype=bool)
+    retry[row[short[row] & room & ((x > 0) | (left[supplier] >= moq))]] = True
+    limited_line = (cap >= moq) & np.isfinite(capacity[supplier])
+    grown = retry.copy()
+    grown[row[short[row] & limited_line]] = True
+    while grown.sum() <= MAX_RETRY_ROWS:
+        retry |= grown
+        contested = np.zeros(len(supplier_ids), dtype=bool)
+        contested[supplier[retry[row] & limited_line]] = True
+        grown = retry.copy()
+        grown[row[(x > 0) & contested[supplier]]] = True
+        if (grown == retry).all():
+            break
+    if retry.any():
+        mip_rows = np.union1d(mip_rows, np.flatnonzero(retry))
+        x[np.isin(row, mip_rows)] = 0.0
+
+    if len(mip_rows):
+        # Stage 3: the fractional and retried rows, with all their lines, against the capacity left over
+        left = capacity - np.bincount(supplier, weights=x, minlength=len(supplier_ids))
+        mip_lines = np.flatnonzero(np.isin(row, mip_rows))
+        x[mip_lines], info["status"] = _solve_mip(
+            np.searchsorted(mip_rows, row[mip_lines]), cost[mip_lines], moq[mip_lines], cap[mip_lines],
+            qty[mip_rows], supplier[mip_lines], left, order_cost, penalty, time_limit, mip_gap)
+        info["mip_rows"] = len(mip_rows)
+
+    info["unsourced"] = np.maximum(0.0, qty - np.bincount(row, weights=x, minlength=n))
+    ordered = x > 0
+    plan = lines.loc[ordered].assign(order_qty=x[ordered].astype(np.int64))
+    if "warehouse_id" in demand:
+        plan["warehouse_id"] = demand["warehouse_id"].to_numpy()[plan["row"].to_numpy()]
+    plan["landed_unit_cost"] = plan["landed_unit_cost"].round(4)
+    plan["order_cost"] = (plan["order_qty"] * plan["unit_cost"]).round(2)
+    plan = plan.reindex(columns=[c for c in PLAN_COLUMNS if c in plan])
+    return plan.sort_values([c for c in ("product_id", "warehouse_id", "supplier_id") if c in plan],
+                            ignore_index=True), info
+
+
+def sourcing_node(state: dict) -> dict:
+    """Choose suppliers and quantities for every row flagged ``should_reorder``.
+
+    Writes ``state["sourcing_plan"]`` (one row per purchase order line) and
+    ``state["sourcing_summary"]``.
+    """
+    inventory = get_inventory_frame(state)
+    flagged = pd.DataFrame()
+    if inventory is not None and not inventory.empty and "should_reorder" in inventory:
+        flagged = inventory.loc[inventory["should_reorder"].astype(bool)
+                                & (inventory["recommended_reorder_qty"] > 0)]
+
+    keys = [c for c in ("product_id", "warehouse_id") if c in flagged]
+    demand = flagged[keys].assign(qty=flagged["recommended_reorder_qty"].to_numpy()) if keys else pd.DataFrame()
+    options = load_sourcing_options(demand["product_id"]) if len(demand) else pd.DataFrame()
+    plan, info = solve_sourcing(demand, options) if len(demand) else (pd.DataFrame(columns=PLAN_COLUMNS), None)
+
+    state["sourcing_plan"] = plan
+    state["sourcing_summary"] = {
+        "rows": len(demand),
+        "order_lines": len(plan),
+        "split_rows": int(plan.groupby(keys).size().gt(1).sum()) if len(plan) else 0,
+        "ordered_qty": int(plan["order_qty"].sum()) if len(plan) else 0,
+        "unsourced_qty": int(info["unsourced"].sum()) if info else 0,
+        "total_cost": float(plan["order_cost"].sum()) if len(plan) else 0.0,
+        "status": info["status"] if info else "nothing to source",
+    }
+    return state
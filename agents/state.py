@@ -0,0 +1,71 @@
+from collections.abc import Sequence
+
+import pandas as pd
+
+
+class InventoryRecords(Sequence):
+    """Read-only list-of-dicts view over the inventory frame.
+
+    Nodes pass the catalog around as a DataFrame; this view keeps the old
+    ``state["inventory_data"]`` contract working for consumers that index or
+    iterate records. Records are only materialized when first accessed.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self._frame = frame
+        self._records = None
+
+    def _materialize(self) -> list:
+        if self._records is None:
+            self._records = self._frame.to_dict(orient="records")
+        return self._records
+
+    def __getitem__(self, index):
+        return self._materialize()[index]
+
+    def __len__(self):
+        return len(self._frame)
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __eq__(self, other):
+        if isinstance(other, InventoryRecords):
+            other = other._materialize()
+        return self._materialize() == other
+
+    def __repr__(self):
+        return f"InventoryRecords({len(self)} records)"
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self._frame
+
+
+def get_inventory_frame(state: dict) -> pd.DataFrame:
+    """Return the columnar inventory table carried in ``state``.
+
+    Falls back to building it from ``state["inventory_data"]`` so callers that
+    still hand in plain records (tests, notebooks) keep working.
+    """
+    frame = state.get("inventory_frame")
+    if frame is not None:
+        return frame
+
+    records = state.get("inventory_data", [])
+    if isinstance(records, InventoryRecords):
+        return records.frame
+    return pd.DataFrame(list(records))
+
+
+def set_inventory_frame(state: dict, frame: pd.DataFrame) -> dict:
+    """Store ``frame`` in ``state`` along with its lazy records view."""
+    frame = frame.reset_index(drop=True)
+    state["inventory_frame"] = frame
+    state["inventory_data"] = InventoryRecords(frame)
+    return state
+
+
+def inventory_records(state: dict) -> list:
+    """Materialize the inventory table as a list of dicts (output boundary)."""
+    return get_inventory_frame(state).to_dict(orient="records")
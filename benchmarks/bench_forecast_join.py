@@ -0,0 +1,63 @@
+"""Scaling benchmark for attaching 30-day forecasts to the inventory table.
+
+Compares the keyed join in agents.forcast_demand.attach_forecast against the
+old per-record scan of the forecast frame, which is quadratic in catalog size.
+
+    python -m benchmarks.bench_forecast_join
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from agents.forcast_demand import attach_forecast
+
+def make_tables(n_products, seed=0):
+    rng = np.random.default_rng(seed)
+    inventory = pd.DataFrame({
+        "product_id": np.arange(1, n_products + 1),
+        "available_stock": rng.integers(0, 500, n_products),
+    })
+    # ~90% of products have recent demand, in arbitrary order
+    with_demand = rng.permutation(n_products)[: int(n_products * 0.9)] + 1
+    forecast = pd.DataFrame({
+        "product_id": with_demand,
+        "forecasted_demand_30d": rng.integers(0, 600, len(with_demand)),
+    })
+    return inventory, forecast
+
+def scan_per_record(inventory, forecast):
+    """The pre-join implementation: one full scan of ``forecast`` per product."""
+    enriched = []
+    for record in inventory.to_dict(orient="records"):
+        match = forecast[forecast['product_id'] == record['product_id']]
+        record['forecasted_demand_30d'] = int(match['forecasted_demand_30d'].iloc[0]) if not match.empty else 0
+        enriched.append(record)
+    return enriched
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--scan-limit", type=int, default=5_000,
+                        help="largest size to run the per-record scan for")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'products':>10} {'join (s)':>10} {'us/product':>11} {'scan (s)':>10}")
+    for n in args.sizes:
+        inventory, forecast = make_tables(n)
+        join_time = best_of(lambda: attach_forecast(inventory, forecast), args.repeat)
+        scan = f"{best_of(lambda: scan_per_record(inventory, forecast), 1):10.3f}" if n <= args.scan_limit else f"{'-':>10}"
+        print(f"{n:>10} {join_time:10.4f} {join_time / n * 1e6:11.3f} {scan}")
+
+if __name__ == "__main__":
+    main()
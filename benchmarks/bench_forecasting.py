@@ -0,0 +1,37 @@
+"""Timing for the batched per-SKU forecasting models.
+
+    python -m benchmarks.bench_forecasting --products 100000 --days 365
+"""
+import argparse
+import time
+
+import numpy as np
+
+from agents.forecasting import forecast_demand
+
+def make_history(n_products, days, intermittent_share=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    weekly = np.array([1.0, 1.0, 1.1, 1.1, 1.2, 1.6, 1.4])
+    rate = rng.uniform(2, 20, n_products)[:, None] * weekly[np.arange(days) % 7][None, :]
+    history = rng.poisson(rate).astype(np.float32)
+
+    sparse = rng.random(n_products) < intermittent_share
+    history[sparse] *= rng.random((sparse.sum(), days)) < 0.15
+    return np.asfortranarray(history)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    history = make_history(args.products, args.days)
+    start = time.perf_counter()
+    out = forecast_demand(history)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.products} SKUs x {args.days} days: {elapsed:.2f}s")
+    print(out["forecast_method"].value_counts().to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Per-node and end-to-end benchmarks at increasing catalog sizes.
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --output new.json --compare results.json
+
+The in-memory nodes (classify, risk, recommend) run on synthetic states of
+every size. fetch_inventory_node, forecast_demand_node and the compiled graph
+read the database, so they run against a throwaway SQLite catalog populated
+for each size up to --db-max-products. With --database-url they run once
+against that database instead, e.g. a local Postgres loaded with
+``data/data_generator.py --bulk``.
+
+Every benchmark reports the best wall time over --repeat runs and, from one
+extra run under tracemalloc, the peak Python/NumPy allocation. --compare exits
+with status 1 if any benchmark got slower than the baseline by more than
+--threshold.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from agents import config, db
+from agents.analyze_risk import risk_analyzer_node
+from agents.classify_products import classify_product_node
+from agents.fetch_inventory import fetch_inventory_node
+from agents.forcast_demand import forecast_demand_node
+from agents.recommend import recommend_reorder_node
+from agents.state import get_inventory_frame, set_inventory_frame
+from benchmarks.synthetic import make_inventory_frame, populate_catalog
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def measure(fn, repeat: int = 3, trace_memory: bool = True) -> dict:
+    """Best and median wall time of ``fn()``, plus its peak traced allocation."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    result = {"seconds": min(timings), "seconds_median": statistics.median(timings)}
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def node_runner(node, frame: pd.DataFrame, **state):
+    """A zero-argument call of ``node`` on a fresh state holding ``frame``."""
+    return lambda: node(set_inventory_frame(dict(state), frame))
+
+
+def in_memory_states(n_products: int) -> dict:
+    """Input state for each in-memory node, as produced by the node before it."""
+    frame = make_inventory_frame(n_products)
+    classified = get_inventory_frame(classify_product_node(set_inventory_frame({}, frame)))
+    analyzed = get_inventory_frame(risk_analyzer_node(set_inventory_frame({}, classified)))
+    return {
+        "classify_product_node": (classify_product_node, frame),
+        "risk_analyzer_node": (risk_analyzer_node, classified),
+        "recommend_reorder_node": (recommend_reorder_node, analyzed),
+    }
+
+
+def run_in_memory(sizes, repeat: int, trace_memory: bool, report) -> list:
+    results = []
+    for n in sizes:
+        for name, (node, frame) in in_memory_states(n).items():
+            results.append(report({"benchmark": name, "products": n,
+                                   **measure(node_runner(node, frame), repeat, trace_memory)}))
+    return results
+
+
+def run_database(products: int, repeat: int, trace_memory: bool, report) -> list:
+    """DB-backed benchmarks against whatever ``config.DATABASE_URL`` points at."""
+    from supply_chain_graph import graph
+
+    fetched = get_inventory_frame(fetch_inventory_node({}))
+    classified = get_inventory_frame(classify_product_node(set_inventory_frame({}, fetched)))
+    benchmarks = {
+        "fetch_inventory_node": lambda: fetch_inventory_node({}),
+        "forecast_demand_node": node_runner(forecast_demand_node, classified),
+        "graph": lambda: graph.invoke({}),
+    }
+    results = []
+    for name, fn in benchmarks.items():
+        results.append(report({"benchmark": name, "products": products,
+                               **measure(fn, repeat, trace_memory)}))
+    return results
+
+
+def use_database(url: str):
+    config.DATABASE_URL = url
+    db.dispose_engine()
+
+
+def run_sqlite(sizes, days: int, repeat: int, trace_memory: bool, report) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = Path(tmp) / f"catalog_{n}.db"
+            use_database(f"sqlite:///{path}")
+            start = time.perf_counter()
+            populate_catalog(db.get_engine(), n_products=n, days=days, n_suppliers=max(5, n // 200))
+            print(f"  populated SQLite catalog of {n} products x {days} days in {time.perf_counter() - start:.1f}s")
+            results += run_database(n, repeat, trace_memory, report)
+            db.dispose_engine()
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": "external" if args.database_url else "sqlite",
+        "history_days": args.history_days,
+        "repeat": args.repeat,
+        "config": {
+            "FLOAT_DTYPE": config.FLOAT_DTYPE,
+            "REORDER_POLICY": config.REORDER_POLICY,
+            "DEMAND_SOURCE": config.DEMAND_SOURCE,
+            "FORECAST_METHOD": config.FORECAST_METHOD,
+            "FORECAST_HISTORY_DAYS": config.FORECAST_HISTORY_DAYS,
+        },
+    }
+
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """Benchmarks whose best time exceeds the baseline's by more than ``threshold``."""
+    previous = {(r["benchmark"], r["products"]): r["seconds"] for r in baseline}
+    regressions = []
+    for r in results:
+        before = previous.get((r["benchmark"], r["products"]))
+        if before and r["seconds"] > before * (1 + threshold):
+            regressions.append({**r, "baseline_seconds": before, "ratio": r["seconds"] / before})
+    return regressions
+
+
+def print_result(r: dict) -> dict:
+    peak = f"{r['peak_mb']:9.1f} MB" if "peak_mb" in r else ""
+    print(f"{r['benchmark']:<24} {r['products']:>10,} {r['seconds']:10.4f}s {peak}")
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--db-max-products", type=int, default=10_000,
+                        help="largest size populated into the SQLite stand-in")
+    parser.add_argument("--history-days", type=int, default=60,
+                        help="days of demand_history per product in the SQLite stand-in")
+    parser.add_argument("--database-url", help="run DB-backed benchmarks against this database instead")
+    parser.add_argument("--skip-db", action="store_true", help="only run the in-memory nodes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against --compare before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    trace_memory = not args.no_memory
+    print(f"{'benchmark':<24} {'products':>10} {'best':>11} {'peak':>12}")
+    results = run_in_memory(args.sizes, args.repeat, trace_memory, print_result)
+    if args.database_url:
+        use_database(args.database_url)
+        with db.connect() as conn:
+            products = conn.execute(text("SELECT COUNT(*) FROM products")).scalar_one()
+        results += run_database(products, args.repeat, trace_memory, print_result)
+    elif not args.skip_db:
+        db_sizes = [n for n in args.sizes if n <= args.db_max_products]
+        results += run_sqlite(db_sizes, args.history_days, args.repeat, trace_memory, print_result)
+
+    report = {"metadata": metadata(args), "results": results}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']} @ {r['products']:,}: "
+                  f"{r['baseline_seconds']:.4f}s -> {r['seconds']:.4f}s ({r['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Synthetic catalogs for benchmarks and tests.
+
+``make_inventory_frame`` builds the in-memory table that fetch_inventory_node
+produces; ``populate_catalog`` writes the same shape into a database (SQLite
+or Postgres) so the DB-backed nodes and the compiled graph can run against it.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ["Electronics", "Food", "Clothing", "Pharma"]
+
+
+def make_inventory_frame(n_products: int, seed: int = 0) -> pd.DataFrame:
+    """Inventory state for ``n_products`` with every column the nodes read."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_products + 1)
+    current = rng.integers(100, 500, n_products)
+    committed = rng.integers(0, 100, n_products)
+    demand = rng.uniform(0, 20, n_products) * (rng.random(n_products) > 0.05)
+
+    return pd.DataFrame({
+        "product_id": ids,
+        "warehouse_id": 1,
+        "sku": pd.Series(ids).map("SKU{}".format),
+        "name": pd.Series(ids).map("Product {}".format),
+        "category": rng.choice(CATEGORIES, n_products),
+        "current_stock": current,
+        "committed_stock": committed,
+        "reorder_point": rng.integers(50, 150, n_products),
+        "available_stock": current - committed,
+        "average_lead_time_days": rng.integers(5, 20, n_products),
+        "lead_time_std_dev": rng.uniform(1, 4, n_products).round(2),
+        "unit_cost": rng.uniform(5, 50, n_products).round(2),
+        "supplier_id": rng.integers(1, 500, n_products),
+        "reliability_score": rng.uniform(0.7, 0.99, n_products).round(2),
+        "average_daily_demand": demand,
+        "recent_demand_30d": np.round(demand * 30).astype(np.int64),
+        "last_stockout_date": None,
+        "shelf_life_days": rng.integers(10, 365, n_products),
+        "financial_classification": rng.choice(list("ABC"), n_products),
+        "operational_risk": rng.choice(list("ABC"), n_products),
+        "forecasted_demand_30d": np.round(demand * 30).astype(np.int64),
+    })
+
+
+def populate_catalog(engine, n_products: int = 60, days: int = 60, seed: int = 0, n_suppliers: int = 5,
+                     n_warehouses: int = 1, suppliers_per_product: int = 3):
+    """Write a synthetic catalog in the supply_chain_optimizer layout into ``engine``.
+
+    Every product is stocked at each of ``n_warehouses`` locations; warehouse 1
+    is the central one the others are replenished from. Products have up to
+    ``suppliers_per_product`` qualified suppliers, the first one primary.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_products + 1)
+    warehouse_ids = np.arange(1, n_warehouses + 1)
+    n_rows = n_products * n_warehouses
+    chunksize = 50_000
+
+    pd.DataFrame({
+        "product_id": ids,
+        "sku": [f"SKU{1000 + i}" for i in ids],
+        "name": [f"Product {i}" for i in ids],
+        "category": rng.choice(CATEGORIES, n_products),
+        "unit_cost": rng.uniform(5, 100, n_products).round(2),
+        "selling_price": rng.uniform(110, 250, n_products).round(2),
+        "shelf_life_days": rng.integers(10, 365, n_products),
+        "financial_classification": rng.choice(list("ABC"), n_products),
+        "operational_risk": rng.choice(list("ABC"), n_products),
+        "updated_at": datetime(2025, 1, 1),
+    }).to_sql("products", engine, index=False, chunksize=chunksize)
+    suppliers = pd.DataFrame({
+        "supplier_id": np.arange(1, n_suppliers + 1),
+        "name": [f"Supplier {i}" for i in range(1, n_suppliers + 1)],
+        "reliability_score": rng.uniform(0.7, 0.99, n_suppliers).round(2),
+        "updated_at": datetime(2025, 1, 1),
+    })
+    primary = pd.DataFrame({
+        "product_id": ids,
+        "supplier_id": rng.integers(1, n_suppliers + 1, n_products),
+        "average_lead_time_days": rng.integers(5, 20, n_products),
+        "lead_time_std_dev": rng.uniform(1, 4, n_products).round(2),
+        "worst_case_lead_time": rng.integers(20, 30, n_products),
+        "unit_cost": rng.uniform(5, 50, n_products).round(2),
+        "updated_at": datetime(2025, 1, 1),
+    })
+    pd.DataFrame({
+        "warehouse_id": warehouse_ids,
+        "code": ["MAIN"] + [f"DC{i:03d}" for i in warehouse_ids[1:]],
+        "name": [f"Warehouse {i}" for i in warehouse_ids],
+        "parent_warehouse_id": [None] + [1] * (n_warehouses - 1),
+        "updated_at": datetime(2025, 1, 1),
+    }).to_sql("warehouses", engine, index=False)
+    pd.DataFrame({
+        "product_id": np.repeat(ids, n_warehouses),
+        "warehouse_id": np.tile(warehouse_ids, n_products),
+        "current_stock": rng.integers(100, 500, n_rows),
+        "committed_stock": rng.integers(0, 100, n_rows),
+        "reorder_point": rng.integers(50, 150, n_rows),
+        "last_stockout_date": None,
+        "last_updated": datetime(2025, 1, 1),
+    }).to_sql("inventory", engine, index=False, chunksize=chunksize)
+
+    # Python date objects so SQLite stores plain ISO dates comparable with bound parameters
+    dates = np.array([date.today() - timedelta(days=d) for d in range(days, 0, -1)], dtype=object)
+    block = max(1, 500_000 // max(days * n_warehouses, 1))
+    for start in range(0, n_products, block):
+        block_ids = ids[start:start + block]
+        pd.DataFrame({
+            "product_id": np.repeat(block_ids, n_warehouses * days),
+            "warehouse_id": np.tile(np.repeat(warehouse_ids, days), len(block_ids)),
+            "date": np.tile(dates, len(block_ids) * n_warehouses),
+            "actual_demand": rng.integers(0, 20, len(block_ids) * n_warehouses * days),
+            "stockout_quantity": 0,
+            "created_at": datetime(2025, 1, 1),
+        }).to_sql("demand_history", engine, index=False, if_exists="append", chunksize=chunksize)
+
+    # Sourcing data is drawn last so the rest of the catalog is the same for any supplier count
+    suppliers["capacity_units"] = np.where(rng.random(n_suppliers) < 0.5, None,
+                                           rng.integers(20, 60, n_suppliers) * n_products)
+    suppliers.to_sql("suppliers", engine, index=False)
+    _product_suppliers(rng, primary, n_suppliers, suppliers_per_product).to_sql(
+        "product_suppliers", engine, index=False, chunksize=chunksize)
+    return ids
+
+
+def _product_suppliers(rng, primary: pd.DataFrame, n_suppliers: int, suppliers_per_product: int) -> pd.DataFrame:
+    """``primary`` plus up to ``suppliers_per_product - 1`` alternative suppliers per product."""
+    n = len(primary)
+    extra = rng.integers(0, min(suppliers_per_product, n_suppliers), n)
+    rank = np.arange(extra.sum()) - np.repeat(np.cumsum(extra) - extra, extra) + 1
+    base = primary.loc[primary.index.repeat(extra)].reset_index(drop=True)
+    m = len(base)
+    alternatives = base.assign(
+        supplier_id=(base["supplier_id"].to_numpy() - 1 + rank) % n_suppliers + 1,
+        average_lead_time_days=rng.integers(5, 20, m),
+        lead_time_std_dev=rng.uniform(1, 4, m).round(2),
+        worst_case_lead_time=rng.integers(20, 30, m),
+        unit_cost=(base["unit_cost"].to_numpy() * rng.uniform(0.85, 1.2, m)).round(2),
+    )
+    frame = pd.concat([primary.assign(is_primary=True), alternatives.assign(is_primary=False)], ignore_index=True)
+    frame["min_order_qty"] = rng.choice([1, 10, 25, 50], len(frame))
+    frame["max_order_qty"] = np.where(rng.random(len(frame)) < 0.5, None, rng.integers(100, 1000, len(frame)))
+    return frame.sort_values(["product_id", "supplier_id"], ignore_index=True)
@@ -1,15 +1,35 @@
 import psycopg2
 from faker import Faker
+import argparse
+import io
 import random
+import time
 from datetime import datetime, timedelta
 
+import numpy as np
+import pandas as pd
+
+# Secondary indexes on demand_history, dropped during bulk loads and rebuilt after
+DEMAND_INDEXES = {
+    "idx_demand_product_date": "CREATE INDEX idx_demand_product_date ON demand_history(product_id, date);",
+    "idx_demand_created_at": "CREATE INDEX idx_demand_created_at ON demand_history(created_at);",
+}
+DEMAND_UNIQUE_CONSTRAINT = "demand_history_product_warehouse_date_key"
+DEFAULT_WAREHOUSE_ID = 1  # created by database_setup
+MOQ_CHOICES = [1, 10, 25, 50, 100]
+
 class DataPopulator:
-    def __init__(self, user=None, host='localhost', database='supply_chain_optimizer'):
+    def __init__(self, user=None, host='localhost', database='supply_chain_optimizer', seed=None):
         import os
         self.user = user or os.getenv('USER')
         self.host = host
         self.database = database
+        self.seed = seed
         self.fake = Faker()
+        if seed is not None:
+            random.seed(seed)
+            self.fake.seed_instance(seed)
+        self.rng = np.random.default_rng(seed)
 
     def get_connection(self):
         return psycopg2.connect(
@@ -40,16 +60,33 @@ class DataPopulator:
             (
                 self.fake.company(),
                 self.fake.city(),
-                round(random.uniform(0.7, 0.99), 2)
+                round(random.uniform(0.7, 0.99), 2),
+                random.choice([None, random.randint(5_000, 50_000)])
             ) for _ in range(n)
         ]
 
-    def generate_demand_history(self, cur, product_ids, days=180):
+    def generate_warehouses(self, n=1):
+        """Regional DCs beyond the default warehouse, each replenished from it."""
+        return [
+            (f"DC{i:03d}", f"{self.fake.city()} DC", self.fake.state(), DEFAULT_WAREHOUSE_ID)
+            for i in range(2, n + 1)
+        ]
+
+    def insert_warehouses(self, cur, n):
+        cur.executemany("""
+            INSERT INTO warehouses (code, name, region, parent_warehouse_id)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (code) DO NOTHING
+        """, self.generate_warehouses(n))
+        cur.execute("SELECT warehouse_id FROM warehouses ORDER BY warehouse_id LIMIT %s;", (n,))
+        return [row[0] for row in cur.fetchall()]
+
+    def generate_demand_history(self, cur, product_ids, days=180, warehouse_ids=(DEFAULT_WAREHOUSE_ID,)):
         today = datetime.now().date()
         start_date = today - timedelta(days=days)
 
         demand_rows = []
-        for pid in product_ids:
+        for pid, wid in ((p, w) for p in product_ids for w in warehouse_ids):
             actual_demands = []
             for i in range(days):
                 date = start_date + timedelta(days=i)
@@ -68,84 +105,262 @@ class DataPopulator:
                 day_of_week = date.isoweekday()
                 stockout_quantity = random.randint(0, 2) if actual_demand > forecasted_demand else 0
 
-                demand_rows.append((pid, date, forecasted_demand, actual_demand, stockout_quantity, day_of_week))
+                demand_rows.append((pid, wid, date, forecasted_demand, actual_demand, stockout_quantity, day_of_week))
 
         cur.executemany("""
-            INSERT INTO demand_history (product_id, date, forecasted_demand, actual_demand, stockout_quantity, day_of_week)
-            VALUES (%s, %s, %s, %s, %s, %s);
+            INSERT INTO demand_history (product_id, warehouse_id, date, forecasted_demand, actual_demand,
+            stockout_quantity, day_of_week)
+            VALUES (%s, %s, %s, %s, %s, %s, %s);
         """, demand_rows)
 
-    def populate(self):
+    def populate(self, n_products=20, n_suppliers=10, days=180, n_warehouses=1, suppliers_per_product=3):
         conn = self.get_connection()
         cur = conn.cursor()
+        warehouse_ids = self.insert_warehouses(cur, n_warehouses)
 
         # Insert into products
-        products = self.generate_products()
+        products = self.generate_products(n_products)
         cur.executemany("""
             INSERT INTO products (sku, name, category, unit_cost, selling_price, shelf_life_days, financial_classification, operational_risk)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """, products)
         
         # Insert into suppliers
-        suppliers = self.generate_suppliers()
+        suppliers = self.generate_suppliers(n_suppliers)
         cur.executemany("""
-            INSERT INTO suppliers (name, location, reliability_score)
-            VALUES (%s, %s, %s)
+            INSERT INTO suppliers (name, location, reliability_score, capacity_units)
+            VALUES (%s, %s, %s, %s)
         """, suppliers)
 
-        # Link each product with a supplier
-        cur.execute("SELECT product_id FROM products;")
+        # Link each product with 1..suppliers_per_product suppliers, the first one primary
+        cur.execute("SELECT product_id FROM products ORDER BY product_id;")
         product_ids = [row[0] for row in cur.fetchall()]
-        cur.execute("SELECT supplier_id FROM suppliers;")
+        cur.execute("SELECT supplier_id FROM suppliers ORDER BY supplier_id;")
         supplier_ids = [row[0] for row in cur.fetchall()]
 
         product_suppliers = [
             (
                 pid,
-                random.choice(supplier_ids),
-                f"SUP-{pid}",
+                sid,
+                rank == 0,
+                f"SUP-{pid}-{sid}",
                 random.randint(5, 20),
                 round(random.uniform(1, 4), 2),
                 round(random.uniform(0.7, 1.0), 4),
                 random.randint(15, 30),
                 random.randint(3, 10),
                 round(random.uniform(5, 50), 2),
-                random.randint(4, 25)
-            ) for pid in product_ids
+                random.randint(4, 25),
+                random.choice(MOQ_CHOICES),
+                random.choice([None, random.randint(200, 2_000)])
+            )
+            for pid in product_ids
+            for rank, sid in enumerate(random.sample(
+                supplier_ids, random.randint(1, min(suppliers_per_product, len(supplier_ids)))))
         ]
         cur.executemany("""
-            INSERT INTO product_suppliers (product_id, supplier_id, supplier_sku, average_lead_time_days,
+            INSERT INTO product_suppliers (product_id, supplier_id, is_primary, supplier_sku, average_lead_time_days,
             lead_time_std_dev, lead_time_reliability_score, worst_case_lead_time, best_case_lead_time,
-            unit_cost, last_delivery_performance)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+            unit_cost, last_delivery_performance, min_order_qty, max_order_qty)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
         """, product_suppliers)
 
-        # Inventory
+        # Inventory at every warehouse
         inventory = [
             (
                 pid,
+                wid,
                 random.randint(100, 500),
                 random.randint(0, 100),
                 random.randint(50, 150),
                 round(random.uniform(5.0, 30.0), 2),
                 datetime.now().date() - timedelta(days=random.randint(5, 60)),
                 datetime.now().date() - timedelta(days=random.randint(0, 30))
-            ) for pid in product_ids
+            ) for pid in product_ids for wid in warehouse_ids
         ]
         cur.executemany("""
-            INSERT INTO inventory (product_id, current_stock, committed_stock, reorder_point,
+            INSERT INTO inventory (product_id, warehouse_id, current_stock, committed_stock, reorder_point,
             days_of_supply, last_stockout_date, last_reorder_date)
-            VALUES (%s, %s, %s, %s, %s, %s, %s);
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
         """, inventory)
 
         # Demand history
-        self.generate_demand_history(cur, product_ids, days=180)
+        self.generate_demand_history(cur, product_ids, days=days, warehouse_ids=warehouse_ids)
 
         conn.commit()
         cur.close()
         conn.close()
         print("Synthetic data population complete!")
 
+    # ------------------------------------------------------------------
+    # Bulk load path: vectorized generation streamed through COPY FROM STDIN
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def copy_frame(cur, table, frame):
+        """Stream ``frame`` into ``table`` with COPY; columns are matched by name."""
+        buffer = io.StringIO()
+        frame.to_csv(buffer, header=False, index=False, na_rep="")
+        buffer.seek(0)
+        columns = ", ".join(frame.columns)
+        cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def optional_ints(self, n, low, high, share_null=0.5):
+        """Integers in [low, high], NULL for about ``share_null`` of rows."""
+        values = pd.Series(self.rng.integers(low, high + 1, n), dtype="Int64")
+        return values.mask(self.rng.random(n) < share_null)
+
+    def bulk_products(self, n):
+        words = np.array([self.fake.word().capitalize() for _ in range(min(n, 2000))])
+        return pd.DataFrame({
+            "sku": [f"SKU{1000 + i}" for i in range(n)],
+            "name": self.rng.choice(words, n),
+            "category": self.rng.choice(['Electronics', 'Food', 'Clothing', 'Pharma'], n),
+            "unit_cost": self.rng.uniform(5.0, 100.0, n).round(2),
+            "selling_price": self.rng.uniform(110.0, 250.0, n).round(2),
+            "shelf_life_days": self.rng.integers(30, 366, n),
+            "financial_classification": self.rng.choice(['A', 'B', 'C'], n),
+            "operational_risk": self.rng.choice(['A', 'B', 'C'], n),
+        })
+
+    def bulk_suppliers(self, n):
+        return pd.DataFrame({
+            "name": [self.fake.company() for _ in range(n)],
+            "location": [self.fake.city() for _ in range(n)],
+            "reliability_score": self.rng.uniform(0.7, 0.99, n).round(2),
+            "capacity_units": self.optional_ints(n, 5_000, 50_000),
+        })
+
+    def bulk_product_suppliers(self, product_ids, supplier_ids, suppliers_per_product=3):
+        """1..suppliers_per_product distinct suppliers per product, the first one primary."""
+        counts = self.rng.integers(1, min(suppliers_per_product, len(supplier_ids)) + 1, len(product_ids))
+        rank = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        # Consecutive suppliers from a random start are distinct per product
+        start = np.repeat(self.rng.integers(0, len(supplier_ids), len(product_ids)), counts)
+        product_ids = np.repeat(product_ids, counts)
+        supplier_id = supplier_ids[(start + rank) % len(supplier_ids)]
+        n = len(product_ids)
+        return pd.DataFrame({
+            "product_id": product_ids,
+            "supplier_id": supplier_id,
+            "is_primary": rank == 0,
+            "supplier_sku": [f"SUP-{pid}-{sid}" for pid, sid in zip(product_ids, supplier_id)],
+            "average_lead_time_days": self.rng.integers(5, 21, n),
+            "lead_time_std_dev": self.rng.uniform(1, 4, n).round(2),
+            "lead_time_reliability_score": self.rng.uniform(0.7, 1.0, n).round(4),
+            "worst_case_lead_time": self.rng.integers(15, 31, n),
+            "best_case_lead_time": self.rng.integers(3, 11, n),
+            "unit_cost": self.rng.uniform(5, 50, n).round(2),
+            "last_delivery_performance": self.rng.integers(4, 26, n),
+            "min_order_qty": self.rng.choice(MOQ_CHOICES, n),
+            "max_order_qty": self.optional_ints(n, 200, 2_000),
+        })
+
+    def bulk_inventory(self, product_ids, warehouse_ids=(DEFAULT_WAREHOUSE_ID,)):
+        n = len(product_ids) * len(warehouse_ids)
+        today = np.datetime64(datetime.now().date())
+        return pd.DataFrame({
+            "product_id": np.repeat(product_ids, len(warehouse_ids)),
+            "warehouse_id": np.tile(warehouse_ids, len(product_ids)),
+            "current_stock": self.rng.integers(100, 501, n),
+            "committed_stock": self.rng.integers(0, 101, n),
+            "reorder_point": self.rng.integers(50, 151, n),
+            "days_of_supply": self.rng.uniform(5.0, 30.0, n).round(2),
+            "last_stockout_date": today - self.rng.integers(5, 61, n).astype("timedelta64[D]"),
+            "last_reorder_date": today - self.rng.integers(0, 31, n).astype("timedelta64[D]"),
+        })
+
+    def bulk_demand_history(self, product_ids, days, warehouse_ids=(DEFAULT_WAREHOUSE_ID,)):
+        """Same demand model as generate_demand_history, for a whole block of products at once."""
+        n = len(product_ids) * len(warehouse_ids)
+        start_date = np.datetime64(datetime.now().date() - timedelta(days=days))
+        dates = start_date + np.arange(days).astype("timedelta64[D]")
+
+        actual = self.rng.integers(5, 21, (n, days))
+        # Forecast is the trailing 90-day mean once 90 days are available
+        window = 90
+        cumulative = np.concatenate([np.zeros((n, 1), dtype=np.int64), actual.cumsum(axis=1)], axis=1)
+        forecast = actual.astype(float)
+        if days > window:
+            forecast[:, window:] = np.round((cumulative[:, window:days] - cumulative[:, :days - window]) / window)
+        forecast = np.maximum(0, forecast + self.rng.integers(-3, 4, (n, days))).astype(np.int64)
+        stockout = np.where(actual > forecast, self.rng.integers(0, 3, (n, days)), 0)
+
+        return pd.DataFrame({
+            "product_id": np.repeat(product_ids, len(warehouse_ids) * days),
+            "warehouse_id": np.tile(np.repeat(warehouse_ids, days), len(product_ids)),
+            "date": np.tile(dates, n),
+            "forecasted_demand": forecast.ravel(),
+            "actual_demand": actual.ravel(),
+            "stockout_quantity": stockout.ravel(),
+            "day_of_week": np.tile((dates.astype("datetime64[D]").view("int64") + 3) % 7 + 1, n),
+        })
+
+    def drop_demand_indexes(self, cur):
+        for name in DEMAND_INDEXES:
+            cur.execute(f"DROP INDEX IF EXISTS {name};")
+        cur.execute(f"ALTER TABLE demand_history DROP CONSTRAINT IF EXISTS {DEMAND_UNIQUE_CONSTRAINT};")
+
+    def rebuild_demand_indexes(self, cur):
+        cur.execute(f"ALTER TABLE demand_history ADD CONSTRAINT {DEMAND_UNIQUE_CONSTRAINT} UNIQUE (product_id, warehouse_id, date);")
+        for ddl in DEMAND_INDEXES.values():
+            cur.execute(ddl)
+        cur.execute("ANALYZE demand_history;")
+
+    def bulk_populate(self, n_products=100_000, n_suppliers=500, days=730, batch_products=2_000, n_warehouses=1,
+                      suppliers_per_product=3):
+        """Load a large synthetic dataset with COPY, in a single transaction.
+
+        Rows are generated in vectorized NumPy blocks of ``batch_products``
+        products, so memory stays bounded regardless of ``n_products``.
+        demand_history indexes are dropped for the load and rebuilt at the end.
+        """
+        started = time.perf_counter()
+        conn = self.get_connection()
+        cur = conn.cursor()
+
+        warehouse_ids = np.array(self.insert_warehouses(cur, n_warehouses))
+        self.copy_frame(cur, "products", self.bulk_products(n_products))
+        self.copy_frame(cur, "suppliers", self.bulk_suppliers(n_suppliers))
+
+        cur.execute("SELECT product_id FROM products ORDER BY product_id;")
+        product_ids = np.array([row[0] for row in cur.fetchall()])
+        cur.execute("SELECT supplier_id FROM suppliers ORDER BY supplier_id;")
+        supplier_ids = np.array([row[0] for row in cur.fetchall()])
+
+        self.copy_frame(cur, "product_suppliers",
+                        self.bulk_product_suppliers(product_ids, supplier_ids, suppliers_per_product))
+        self.copy_frame(cur, "inventory", self.bulk_inventory(product_ids, warehouse_ids))
+
+        self.drop_demand_indexes(cur)
+        for start in range(0, len(product_ids), batch_products):
+            block = product_ids[start:start + batch_products]
+            self.copy_frame(cur, "demand_history", self.bulk_demand_history(block, days, warehouse_ids))
+        self.rebuild_demand_indexes(cur)
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print(f"Bulk load of {len(product_ids)} products x {len(warehouse_ids)} warehouses x {days} days complete "
+              f"in {time.perf_counter() - started:.1f}s")
+
 if __name__ == "__main__":
-    populator = DataPopulator()
-    populator.populate()
+    parser = argparse.ArgumentParser(description="Populate the supply chain database with synthetic data.")
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--suppliers", type=int, default=10)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--warehouses", type=int, default=1, help="stock locations, each holding every product")
+    parser.add_argument("--suppliers-per-product", type=int, default=3,
+                        help="maximum qualified suppliers per product")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible datasets")
+    parser.add_argument("--bulk", action="store_true", help="vectorized generation loaded with COPY")
+    parser.add_argument("--batch-products", type=int, default=2_000,
+                        help="products per COPY block in --bulk mode")
+    args = parser.parse_args()
+
+    populator = DataPopulator(seed=args.seed)
+    if args.bulk:
+        populator.bulk_populate(args.products, args.suppliers, args.days, args.batch_products, args.warehouses,
+                                args.suppliers_per_product)
+    else:
+        populator.populate(args.products, args.suppliers, args.days, args.warehouses, args.suppliers_per_product)
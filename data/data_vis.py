@@ -1,19 +1,13 @@
-import psycopg2
-import pandas as pd
-import os
-from sqlalchemy import create_engine, text
+"""Write a snapshot of every table (row counts and sample rows) to a text report.
+
+Run from the repository root: ``python -m data.data_vis``.
+"""
 from datetime import datetime
 
-def get_connection():
-    return psycopg2.connect(
-        host='localhost',
-        database='supply_chain_optimizer',
-        user=os.getenv('USER')
-    )
+import pandas as pd
+from sqlalchemy import text
 
-def get_sqlalchemy_engine():
-    user = os.getenv('USER')
-    return create_engine(f'postgresql://{user}@localhost:5432/supply_chain_optimizer')
+from agents.db import get_engine
 
 def print_table_sample(engine, table_name, limit=10, file=None):
     try:
@@ -45,7 +39,7 @@ def get_table_counts(engine, table_names):
     return counts
 
 def explore_data():
-    engine = get_sqlalchemy_engine()
+    engine = get_engine()
 
     table_names = [
         "products",
@@ -3,6 +3,8 @@ from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import os
 from datetime import datetime
 
+from pipeline.results_store import RESULTS_DDL, RESULTS_INDEXES
+
 class DatabaseSetup:
     def __init__(self, user=None):
         self.user = user or os.getenv('USER')
@@ -22,10 +24,18 @@ class DatabaseSetup:
         conn = self.get_connection()
         cur = conn.cursor()
         tables = [
+            "reorder_recommendations",
+            "pipeline_runs",
+            "rollup_recent_rows",
+            "rollup_watermarks",
+            "demand_rollups",
             "supply_events",
             "demand_history",
+            "order_items",
+            "purchase_orders",
             "inventory",
             "warehouses",
+            "product_suppliers",
             "suppliers",
             "products"
         ]
@@ -56,7 +66,8 @@ class DatabaseSetup:
                 shelf_life_days INTEGER, -- for perishable goods
                 financial_classification CHAR(1) CHECK (financial_classification IN ('A', 'B', 'C')), -- Revenue-based ABC
                 operational_risk CHAR(1) CHECK (operational_risk IN ('A', 'B', 'C')), -- Risk-based classification
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
         
@@ -67,15 +78,20 @@ class DatabaseSetup:
                 name VARCHAR(200) NOT NULL,
                 location VARCHAR(100) NOT NULL,
                 reliability_score DECIMAL(3,2) CHECK (reliability_score >= 0 AND reliability_score <= 1),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                capacity_units INTEGER, -- units per planning cycle across all products; NULL = unlimited
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
         
         cur.execute("""
             CREATE TABLE IF NOT EXISTS product_suppliers (
                 product_supplier_id SERIAL PRIMARY KEY,
-                product_id INTEGER REFERENCES products(product_id) UNIQUE, -- Only one supplier per product
+                product_id INTEGER REFERENCES products(product_id),
                 supplier_id INTEGER REFERENCES suppliers(supplier_id),
+                is_primary BOOLEAN NOT NULL DEFAULT FALSE, -- supplier used for lead times in planning
+                min_order_qty INTEGER NOT NULL DEFAULT 1, -- MOQ per order line
+                max_order_qty INTEGER, -- per-order capacity; NULL = unlimited
                 supplier_sku VARCHAR(100),
                 average_lead_time_days INTEGER NOT NULL,
                 lead_time_std_dev DECIMAL(5,2) DEFAULT 0.0, -- Standard deviation of lead times
@@ -84,15 +100,37 @@ class DatabaseSetup:
                 best_case_lead_time INTEGER, -- 5th percentile lead time
                 unit_cost DECIMAL(10,2) NOT NULL,
                 last_delivery_performance INTEGER, -- actual days for last order
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
         
-        # Current inventory table
+        # Stock locations; parent_warehouse_id is the upstream echelon that
+        # replenishes this one (NULL = replenished directly by suppliers)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS warehouses (
+                warehouse_id SERIAL PRIMARY KEY,
+                code VARCHAR(20) UNIQUE NOT NULL,
+                name VARCHAR(200) NOT NULL,
+                region VARCHAR(100),
+                parent_warehouse_id INTEGER REFERENCES warehouses(warehouse_id),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        # Default location for single-warehouse data and pre-warehouse databases
+        cur.execute("""
+            INSERT INTO warehouses (warehouse_id, code, name) VALUES (1, 'MAIN', 'Main warehouse')
+            ON CONFLICT (warehouse_id) DO NOTHING;
+        """)
+        cur.execute("SELECT setval('warehouses_warehouse_id_seq', GREATEST((SELECT MAX(warehouse_id) FROM warehouses), 1));")
+
+        # Current inventory table, one row per product and warehouse
         cur.execute("""
             CREATE TABLE IF NOT EXISTS inventory (
                 inventory_id SERIAL PRIMARY KEY,
-                product_id INTEGER REFERENCES products(product_id) UNIQUE,
+                product_id INTEGER REFERENCES products(product_id),
+                warehouse_id INTEGER NOT NULL DEFAULT 1 REFERENCES warehouses(warehouse_id),
                 current_stock INTEGER NOT NULL CHECK (current_stock >= 0),
                 committed_stock INTEGER DEFAULT 0, -- stock allocated to orders
                 available_stock INTEGER GENERATED ALWAYS AS (current_stock - committed_stock) STORED,
@@ -100,7 +138,8 @@ class DatabaseSetup:
                 days_of_supply DECIMAL(5,2), -- current_stock / average_daily_demand
                 last_stockout_date DATE,
                 last_reorder_date DATE,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                CONSTRAINT inventory_product_warehouse_key UNIQUE (product_id, warehouse_id)
             );
         """)
  
@@ -109,6 +148,7 @@ class DatabaseSetup:
             CREATE TABLE IF NOT EXISTS purchase_orders (
                 po_id SERIAL PRIMARY KEY,
                 supplier_id INTEGER REFERENCES suppliers(supplier_id),
+                warehouse_id INTEGER NOT NULL DEFAULT 1 REFERENCES warehouses(warehouse_id),
                 po_number VARCHAR(50) UNIQUE,
                 order_date DATE NOT NULL,
                 expected_delivery_date DATE NOT NULL,
@@ -138,21 +178,63 @@ class DatabaseSetup:
             CREATE TABLE IF NOT EXISTS demand_history (
                 demand_id SERIAL PRIMARY KEY,
                 product_id INTEGER REFERENCES products(product_id),
+                warehouse_id INTEGER NOT NULL DEFAULT 1 REFERENCES warehouses(warehouse_id),
                 date DATE NOT NULL,
                 forecasted_demand INTEGER,
                 actual_demand INTEGER NOT NULL CHECK (actual_demand >= 0),
                 stockout_quantity INTEGER DEFAULT 0, -- unmet demand due to stockout
                 day_of_week INTEGER CHECK (day_of_week BETWEEN 1 AND 7),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(product_id, date)
+                CONSTRAINT demand_history_product_warehouse_date_key UNIQUE (product_id, warehouse_id, date)
             );
         """)
         
+        # Rolling 7/30/90-day demand aggregates per product and warehouse (see agents/rollups.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS demand_rollups (
+                product_id INTEGER REFERENCES products(product_id),
+                warehouse_id INTEGER NOT NULL DEFAULT 1 REFERENCES warehouses(warehouse_id),
+                demand_sum_7d BIGINT NOT NULL DEFAULT 0,
+                demand_count_7d INTEGER NOT NULL DEFAULT 0,
+                demand_sumsq_7d BIGINT NOT NULL DEFAULT 0,
+                demand_sum_30d BIGINT NOT NULL DEFAULT 0,
+                demand_count_30d INTEGER NOT NULL DEFAULT 0,
+                demand_sumsq_30d BIGINT NOT NULL DEFAULT 0,
+                demand_sum_90d BIGINT NOT NULL DEFAULT 0,
+                demand_count_90d INTEGER NOT NULL DEFAULT 0,
+                demand_sumsq_90d BIGINT NOT NULL DEFAULT 0,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (product_id, warehouse_id)
+            );
+        """)
+
+        # Incremental refresh position of each rollup
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_watermarks (
+                rollup_name VARCHAR(50) PRIMARY KEY,
+                as_of_date DATE NOT NULL, -- windows end on this date
+                last_created_at TIMESTAMP NOT NULL -- demand_history rows created up to here are applied
+            );
+        """)
+
+        # demand_history rows a rollup applied that were created after its watermark
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_recent_rows (
+                rollup_name VARCHAR(50) NOT NULL,
+                product_id INTEGER NOT NULL,
+                warehouse_id INTEGER NOT NULL,
+                date DATE NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (rollup_name, product_id, warehouse_id, date)
+            );
+        """)
+
         # Supply chain events (deliveries, stockouts, etc.)
         cur.execute("""
             CREATE TABLE IF NOT EXISTS supply_events (
                 event_id SERIAL PRIMARY KEY,
                 product_id INTEGER REFERENCES products(product_id),
+                warehouse_id INTEGER NOT NULL DEFAULT 1 REFERENCES warehouses(warehouse_id),
                 supplier_id INTEGER REFERENCES suppliers(supplier_id),
                 event_type VARCHAR(50) NOT NULL, -- 'delivery', 'stockout', 'reorder', 'transfer'
                 quantity INTEGER,
@@ -163,10 +245,91 @@ class DatabaseSetup:
             );
         """)
         
+        # Persisted run outputs (see pipeline/results_store.py); one partition
+        # per run date is created on first write
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_runs (
+                run_id SERIAL PRIMARY KEY,
+                run_at TIMESTAMP NOT NULL,
+                run_date DATE NOT NULL,
+                mode VARCHAR(20) NOT NULL,
+                row_count INTEGER NOT NULL
+            );
+        """)
+        # Columns and indexes are defined once, in pipeline/results_store.py
+        cur.execute(RESULTS_DDL.rstrip() + " PARTITION BY RANGE (run_date);")
+        for ddl in RESULTS_INDEXES:
+            cur.execute(ddl)
+
         # Create indexes for better performance
         cur.execute("CREATE INDEX IF NOT EXISTS idx_inventory_product ON inventory(product_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_inventory_warehouse ON inventory(warehouse_id);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_demand_product_date ON demand_history(product_id, date);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_supply_events_date ON supply_events(event_date);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_order_items_po ON order_items(po_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_demand_created_at ON demand_history(created_at);")
+
+        self.migrate_to_warehouses(cur)
+        self.migrate_to_multi_sourcing(cur)
+
+        # Any number of qualified suppliers per product, exactly one of them primary
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_product_suppliers_product_supplier
+            ON product_suppliers(product_id, supplier_id);
+        """)
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_product_suppliers_primary
+            ON product_suppliers(product_id) WHERE is_primary;
+        """)
+
+        # Change tracking for incremental runs (see pipeline/incremental.py)
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.updated_at := CURRENT_TIMESTAMP;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION touch_last_updated() RETURNS trigger AS $$
+            BEGIN
+                NEW.last_updated := CURRENT_TIMESTAMP;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        for table in ("products", "suppliers", "product_suppliers", "warehouses"):
+            # Databases created before change tracking lack the column
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;")
+            cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_updated_at ON {table};")
+            cur.execute(f"""
+                CREATE TRIGGER trg_{table}_updated_at BEFORE UPDATE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+            """)
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table}(updated_at);")
+        cur.execute("DROP TRIGGER IF EXISTS trg_inventory_last_updated ON inventory;")
+        cur.execute("""
+            CREATE TRIGGER trg_inventory_last_updated BEFORE UPDATE ON inventory
+            FOR EACH ROW EXECUTE FUNCTION touch_last_updated();
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_inventory_last_updated ON inventory(last_updated);")
+
+        # Wake stockout monitors (pipeline/alerts.py) when events or stock change
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION notify_supply_chain_change() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('supply_chain_changes', TG_TABLE_NAME);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        for table, action in (("supply_events", "INSERT"), ("inventory", "INSERT OR UPDATE")):
+            cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_notify ON {table};")
+            cur.execute(f"""
+                CREATE TRIGGER trg_{table}_notify AFTER {action} ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_supply_chain_change();
+            """)
         
         conn.commit()
         cur.close()
@@ -174,6 +337,61 @@ class DatabaseSetup:
         
         print("Database tables created successfully!")
     
+    def migrate_to_warehouses(self, cur):
+        """Move tables created before warehouses existed onto (product, warehouse) keys.
+
+        Existing rows land in the default warehouse 1. Tables that already
+        have the new keys are left alone, so this is safe to run repeatedly.
+        """
+        legacy_keys = {
+            "inventory": ("inventory_product_id_key", "inventory_product_warehouse_key",
+                          "UNIQUE (product_id, warehouse_id)"),
+            "demand_history": ("demand_history_product_id_date_key", "demand_history_product_warehouse_date_key",
+                               "UNIQUE (product_id, warehouse_id, date)"),
+            "demand_rollups": ("demand_rollups_pkey", "demand_rollups_pkey",
+                               "PRIMARY KEY (product_id, warehouse_id)"),
+        }
+        for table, (old_key, new_key, definition) in legacy_keys.items():
+            cur.execute(f"""
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS warehouse_id INTEGER NOT NULL DEFAULT 1
+                REFERENCES warehouses(warehouse_id);
+            """)
+            cur.execute("""
+                SELECT 1 FROM pg_constraint c
+                JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY (c.conkey)
+                WHERE c.conname = %s AND c.conrelid = %s::regclass
+                GROUP BY c.conname
+                HAVING NOT bool_or(a.attname = 'warehouse_id')
+            """, (old_key, table))
+            if cur.fetchone():
+                cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT {old_key};")
+                cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {new_key} {definition};")
+        for table in ("supply_events", "purchase_orders"):
+            cur.execute(f"""
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS warehouse_id INTEGER NOT NULL DEFAULT 1
+                REFERENCES warehouses(warehouse_id);
+            """)
+
+    def migrate_to_multi_sourcing(self, cur):
+        """Lift the one-supplier-per-product constraint of older databases.
+
+        The existing supplier of every product becomes its primary one.
+        """
+        cur.execute("ALTER TABLE suppliers ADD COLUMN IF NOT EXISTS capacity_units INTEGER;")
+        cur.execute("""
+            ALTER TABLE product_suppliers
+                ADD COLUMN IF NOT EXISTS is_primary BOOLEAN NOT NULL DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS min_order_qty INTEGER NOT NULL DEFAULT 1,
+                ADD COLUMN IF NOT EXISTS max_order_qty INTEGER;
+        """)
+        cur.execute("""
+            SELECT 1 FROM pg_constraint
+            WHERE conname = 'product_suppliers_product_id_key' AND conrelid = 'product_suppliers'::regclass
+        """)
+        if cur.fetchone():
+            cur.execute("UPDATE product_suppliers SET is_primary = TRUE;")
+            cur.execute("ALTER TABLE product_suppliers DROP CONSTRAINT product_suppliers_product_id_key;")
+
     def check_connection(self):
         """Test database connection"""
         try:
@@ -0,0 +1,311 @@
+"""Event-driven stockout alerting.
+
+``StockoutMonitor`` plans the catalog once, keeps every row's risk inputs in
+memory and then follows two change feeds:
+
+- ``supply_events`` past an ``event_id`` watermark, applied as deltas:
+  deliveries add stock and settle the quantity on order, stockouts zero the
+  stock, reorders add to the quantity on order and transfers add their
+  signed quantity;
+- ``inventory`` rows past a ``last_updated`` watermark, whose stock replaces
+  the in-memory value.
+
+Each poll handles a whole batch of changes with array operations and
+re-scores only the touched rows with the vectorized risk and reorder
+kernels. Reorders are judged on the inventory position (stock plus quantity
+on order). An alert is emitted when a row runs out, becomes at risk of
+stockout or newly needs a reorder.
+
+On PostgreSQL the monitor sleeps on ``LISTEN supply_chain_changes`` (see
+data/database_setup.py) between polls, so a commit wakes it immediately;
+elsewhere it polls every ``poll_interval`` seconds.
+
+Watermarks alone would lose changes that commit out of order: ``last_updated``
+is the writing transaction's start time and event ids are allocated before
+commit, so a slow transaction can become visible below a watermark already
+passed. The monitor therefore re-reads inventory rows updated within
+``ALERT_LAG`` seconds of its watermark and applies each row version once,
+and it re-queries event ids skipped in the sequence until they show up or
+``ALERT_LAG`` seconds have passed (rolled-back inserts leave permanent gaps).
+Every change whose transaction commits within ``ALERT_LAG`` seconds of that
+point is applied exactly once; later commits can still be missed. Late events
+are applied after the ones already seen, not in event_id order.
+"""
+import json
+import select
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from agents import config
+from agents.analyze_risk import compute_risk_metrics, risk_analyzer_node
+from agents.classify_products import classify_product_node
+from agents.db import connect, get_engine
+from agents.fetch_inventory import INVENTORY_KEY, fetch_inventory_node
+from agents.forcast_demand import forecast_demand_node
+from agents.forecasting import _row_keys
+from agents.recommend import compute_reorder, recommend_reorder_node
+from agents.state import get_inventory_frame
+
+MONITOR_NODES = (fetch_inventory_node, classify_product_node, forecast_demand_node, risk_analyzer_node,
+                 recommend_reorder_node)
+NOTIFY_CHANNEL = "supply_chain_changes"
+ALERT_KINDS = ("stockout", "at_risk", "reorder")
+ALERT_COLUMNS = ["product_id", "warehouse_id", "sku", "available_stock", "on_order", "days_until_stockout",
+                 "should_reorder", "recommended_reorder_qty", "reorder_reason"]
+
+EVENTS_QUERY = text("""
+    SELECT event_id, product_id, COALESCE(warehouse_id, 1) AS warehouse_id, event_type, quantity
+    FROM supply_events
+    WHERE event_id > :after_event_id
+    ORDER BY event_id
+    LIMIT :limit
+""")
+
+# Ids skipped by EVENTS_QUERY that may still be committed
+EVENTS_BY_ID_QUERY = text("""
+    SELECT event_id, product_id, COALESCE(warehouse_id, 1) AS warehouse_id, event_type, quantity
+    FROM supply_events
+    WHERE event_id IN :event_ids
+    ORDER BY event_id
+""").bindparams(bindparam("event_ids", expanding=True))
+
+INVENTORY_CHANGES_QUERY = text("""
+    SELECT product_id, warehouse_id, current_stock, committed_stock, last_updated
+    FROM inventory
+    WHERE last_updated > :since
+""")
+
+ROW_VERSIONS_QUERY = text("SELECT product_id, warehouse_id, last_updated FROM inventory")
+
+WATERMARKS_QUERY = text("""
+    SELECT
+        (SELECT MAX(event_id) FROM supply_events) AS event_id,
+        (SELECT MAX(last_updated) FROM inventory) AS inventory
+""")
+
+# Lower bound when the inventory table is empty
+EPOCH = pd.Timestamp("1970-01-01")
+
+
+class JsonlAlertSink:
+    """Append alerts to a JSON-lines file, one alert per line."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __call__(self, alerts: list):
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps(alert, default=str) + "\n" for alert in alerts)
+
+
+def plan_catalog() -> pd.DataFrame:
+    """Full plan of the current catalog: the monitor's starting state."""
+    state = {}
+    for node in MONITOR_NODES:
+        state = node(state)
+    return get_inventory_frame(state)
+
+
+class StockoutMonitor:
+    """In-memory per-row risk state kept current from supply events and inventory changes.
+
+    ``sink`` is called with the list of alerts of every poll that produced
+    any, e.g. ``queue.Queue().put`` or a JsonlAlertSink.
+    """
+
+    def __init__(self, sink, frame: pd.DataFrame = None, batch_size: int = None, lag: float = None):
+        self.sink = sink
+        self.batch_size = batch_size or config.ALERT_BATCH_SIZE
+        self.lag = config.ALERT_LAG if lag is None else lag
+        # Watermarks are read before planning, so changes made meanwhile are replayed
+        with connect() as conn:
+            row = conn.execute(WATERMARKS_QUERY).one()
+            versions = pd.read_sql(ROW_VERSIONS_QUERY, conn)
+        self.last_event_id = int(row.event_id or 0)
+        self.inventory_watermark = EPOCH if row.inventory is None else pd.Timestamp(row.inventory)
+        self.open_gaps = {}  # skipped event_id -> monotonic time after which it is given up
+
+        frame = plan_catalog() if frame is None else frame
+        frame = frame.sort_values(INVENTORY_KEY, kind="stable").reset_index(drop=True)
+        frame["reorder_reason"] = frame["reorder_reason"].astype(object)
+        frame["on_order"] = 0
+        self.frame = frame
+        self._keys = _row_keys(frame["product_id"], frame["warehouse_id"])
+        # last_updated of the inventory version each row reflects
+        self._applied_version = np.full(len(frame), EPOCH.to_datetime64(), dtype="datetime64[us]")
+        self._fresh_inventory(versions)
+        self.events_processed = 0
+        self.alerts_emitted = 0
+
+    def _locate(self, product_ids, warehouse_ids) -> np.ndarray:
+        """Row position of each (product, warehouse); -1 for locations not in the plan."""
+        keys = _row_keys(product_ids, warehouse_ids)
+        pos = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[pos] == keys, pos, -1) if len(self._keys) else np.full(len(keys), -1)
+
+    def apply_events(self, events: pd.DataFrame) -> list:
+        """Apply ``supply_events`` rows (in event_id order) and return the resulting alerts."""
+        rows = self._locate(events["product_id"], events["warehouse_id"])
+        known = rows >= 0
+        rows = rows[known]
+        kind = events["event_type"].to_numpy(dtype=object)[known]
+        qty = events["quantity"].fillna(0).to_numpy(dtype=np.int64)[known]
+        event_ids = events["event_id"].to_numpy(dtype=np.int64)[known]
+        self.events_processed += len(events)
+
+        touched, local = np.unique(rows, return_inverse=True)
+        stock = self.frame["current_stock"].to_numpy(dtype=np.int64)[touched]
+        on_order = self.frame["on_order"].to_numpy(dtype=np.int64)[touched]
+
+        # A stockout resets the row; only stock movements after its last stockout count
+        order = np.arange(len(rows))
+        is_stockout = kind == "stockout"
+        reset_at = np.full(len(touched), -1)
+        np.maximum.at(reset_at, local[is_stockout], order[is_stockout])
+        moves = np.isin(kind, ("delivery", "transfer")) & (order > reset_at[local])
+        stock = np.where(reset_at >= 0, 0, stock)
+        np.add.at(stock, local, np.where(moves, qty, 0))
+        np.add.at(on_order, local, np.select([kind == "reorder", kind == "delivery"], [qty, -qty], 0))
+
+        last_event = np.zeros(len(touched), dtype=np.int64)
+        np.maximum.at(last_event, local, event_ids)
+        self._set(touched, {"current_stock": np.maximum(stock, 0), "on_order": np.maximum(on_order, 0)})
+        return self._rescore(touched, last_event)
+
+    def _fresh_inventory(self, changes: pd.DataFrame) -> pd.DataFrame:
+        """Changed rows whose ``last_updated`` version is newer than the one applied; marks them applied."""
+        rows = self._locate(changes["product_id"], changes["warehouse_id"])
+        version = pd.to_datetime(changes["last_updated"], format="ISO8601").to_numpy(dtype="datetime64[us]")
+        fresh = (rows >= 0) & (version > self._applied_version[np.maximum(rows, 0)])
+        self._applied_version[rows[fresh]] = version[fresh]
+        return changes.loc[fresh]
+
+    def apply_inventory(self, changes: pd.DataFrame) -> list:
+        """Take the stock of changed ``inventory`` rows as authoritative and return the resulting alerts."""
+        rows = self._locate(changes["product_id"], changes["warehouse_id"])
+        known = rows >= 0
+        changes = changes.loc[known]
+        stock = {c: changes[c].to_numpy(dtype=np.int64) for c in ("current_stock", "committed_stock")}
+        self._set(rows[known], stock)
+        touched = np.unique(rows[known])
+        return self._rescore(touched, np.zeros(len(touched), dtype=np.int64))
+
+    def _set(self, rows: np.ndarray, columns: dict):
+        for name, values in columns.items():
+            dtype = self.frame[name].dtype
+            self.frame.iloc[rows, self.frame.columns.get_loc(name)] = np.asarray(values).astype(dtype, copy=False)
+
+    def _rescore(self, rows: np.ndarray, event_ids: np.ndarray) -> list:
+        """Recompute risk and reorders for ``rows``; alerts for rows that crossed a threshold."""
+        if len(rows) == 0:
+            return []
+        sub = self.frame.iloc[rows]
+        available = (sub["current_stock"] - sub["committed_stock"]).to_numpy(dtype=np.int64)
+        sub = sub.assign(available_stock=available)
+        risk = compute_risk_metrics(sub, dtype=config.FLOAT_DTYPE)
+        reorder = compute_reorder(sub.assign(available_stock=available + sub["on_order"].to_numpy()))
+
+        crossed = {
+            "stockout": (available <= 0) & (self.frame["available_stock"].to_numpy()[rows] > 0),
+            "at_risk": risk["at_risk_of_stockout"].to_numpy() & ~sub["at_risk_of_stockout"].to_numpy(dtype=bool),
+            "reorder": reorder["should_reorder"].to_numpy() & ~sub["should_reorder"].to_numpy(dtype=bool),
+        }
+        self._set(rows, {
+            "available_stock": available,
+            **{name: values.to_numpy() for name, values in risk.items()},
+            **{name: values.to_numpy() for name, values in reorder.items()},
+        })
+
+        flagged = np.flatnonzero(np.logical_or.reduce(list(crossed.values())))
+        if not len(flagged):
+            return []
+        current = self.frame.iloc[rows[flagged]][ALERT_COLUMNS].to_dict(orient="records")
+        emitted_at = datetime.now().isoformat(timespec="milliseconds")
+        alerts = []
+        for i, record in zip(flagged, current):
+            for kind in ALERT_KINDS:
+                if crossed[kind][i]:
+                    alerts.append({"alert": kind, **record, "event_id": int(event_ids[i]) or None,
+                                   "emitted_at": emitted_at})
+        self.alerts_emitted += len(alerts)
+        return alerts
+
+    def _read_events(self, conn) -> pd.DataFrame:
+        """New events past the watermark plus skipped ids that have been committed since."""
+        events = pd.read_sql(EVENTS_QUERY, conn, params={"after_event_id": self.last_event_id,
+                                                         "limit": self.batch_size})
+        now = time.monotonic()
+        self.open_gaps = {i: deadline for i, deadline in self.open_gaps.items() if deadline > now}
+        late = pd.DataFrame()
+        if self.open_gaps:
+            late = pd.read_sql(EVENTS_BY_ID_QUERY, conn, params={"event_ids": list(self.open_gaps)})
+            for event_id in late["event_id"].tolist():
+                del self.open_gaps[int(event_id)]
+        if len(events):
+            ids = events["event_id"].to_numpy(dtype=np.int64)
+            skipped = np.setdiff1d(np.arange(self.last_event_id + 1, ids.max()), ids)
+            self.open_gaps.update(dict.fromkeys(skipped.tolist(), now + self.lag))
+            self.last_event_id = int(ids.max())
+        return pd.concat([late, events], ignore_index=True) if len(late) else events
+
+    def poll(self) -> int:
+        """Apply the changes committed since the last poll; returns how many were new."""
+        since = self.inventory_watermark
+        if since - EPOCH > pd.Timedelta(seconds=self.lag):
+            since -= pd.Timedelta(seconds=self.lag)
+        with connect() as conn:
+            changes = pd.read_sql(INVENTORY_CHANGES_QUERY, conn, params={"since": since.to_pydatetime()})
+            events = self._read_events(conn)
+        alerts = []
+        if len(changes):
+            newest = pd.to_datetime(changes["last_updated"], format="ISO8601").max()
+            self.inventory_watermark = max(self.inventory_watermark, newest)
+            changes = self._fresh_inventory(changes)
+        if len(changes):
+            alerts += self.apply_inventory(changes)
+        if len(events):
+            alerts += self.apply_events(events)
+        if alerts:
+            self.sink(alerts)
+        return len(changes) + len(events)
+
+    def run(self, poll_interval: float = None, stop: threading.Event = None):
+        """Poll until ``stop`` is set, waiting for a notification (or ``poll_interval``) when idle."""
+        poll_interval = config.ALERT_POLL_INTERVAL if poll_interval is None else poll_interval
+        stop = stop or threading.Event()
+        with _notifications() as listener:
+            while not stop.is_set():
+                if self.poll() >= self.batch_size:
+                    continue  # backlog: keep draining
+                if listener is None:
+                    stop.wait(poll_interval)
+                elif select.select([listener], [], [], poll_interval)[0]:
+                    listener.poll()
+                    listener.notifies.clear()
+
+
+@contextmanager
+def _notifications():
+    """A DBAPI connection LISTENing on NOTIFY_CHANNEL on PostgreSQL, else None."""
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        yield None
+        return
+    raw = engine.raw_connection()
+    try:
+        listener = raw.driver_connection
+        listener.autocommit = True
+        with listener.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+        yield listener
+    finally:
+        with raw.driver_connection.cursor() as cur:
+            cur.execute("UNLISTEN *;")
+        raw.close()
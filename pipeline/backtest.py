@@ -0,0 +1,248 @@
+"""Rolling-horizon backtest of reorder policies over ``demand_history``.
+
+History is replayed day by day for every (product, warehouse) at once, with
+stock on hand, stock on order and a ring buffer of arriving orders held as
+row-length arrays. Each replayed day:
+
+1. orders due that day arrive;
+2. the day's demand is served from stock on hand. Demand is
+   ``actual_demand + stockout_quantity``, i.e. including what went unmet
+   back then. Demand that cannot be served is lost;
+3. the policy reviews every row through recommend.compute_reorder. It sees
+   its inventory position (on hand plus on order) and a demand estimate
+   from the trailing ``warmup_days`` only, never the future. Orders arrive
+   after the row's rounded ``average_lead_time_days``.
+
+The first ``warmup_days`` of history only seed the demand estimate. The
+replay starts with the stock the policy would order from an empty position.
+Per row it reports fill rate, stockout days, lost units, holding cost
+(``BACKTEST_HOLDING_COST_RATE`` of unit cost per unit-year) and the number
+of orders placed.
+
+``sweep_policies`` runs several policy configurations over the same history
+on a process pool.
+"""
+import argparse
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from agents import config
+from agents.classify_products import classify_product_node
+from agents.db import connect
+from agents.fetch_inventory import INVENTORY_KEY, fetch_inventory_node
+from agents.forecasting import ID_CHUNK_SIZE, fill_demand_matrix
+from agents.recommend import compute_reorder
+from agents.state import get_inventory_frame
+
+# Unmet demand is recorded separately, so true demand is the sum of both
+BACKTEST_HISTORY_QUERY = text("""
+    SELECT product_id, warehouse_id, date, actual_demand + COALESCE(stockout_quantity, 0) AS actual_demand
+    FROM demand_history
+    WHERE date > :start
+      AND date <= :as_of
+      AND product_id BETWEEN :min_product_id AND :max_product_id
+""")
+
+# Columns the policies see besides the simulated position and demand estimate
+POLICY_INPUT_COLUMNS = ["average_lead_time_days", "lead_time_std_dev", "reorder_point", "unit_cost"]
+
+
+def load_backtest_inputs(days: int = 365, as_of: date = None, warmup_days: int = None) -> tuple:
+    """(frame, demand) for the current catalog: one row per location, ``warmup_days + days`` of history.
+
+    ``frame`` is the fetched and classified catalog sorted by location, so
+    class-based policy routing works as in the pipeline. ``demand`` is a
+    Fortran-ordered (rows x days) matrix ending on ``as_of``, by default
+    yesterday: today's demand is still accumulating.
+    """
+    as_of = as_of or date.today() - timedelta(days=1)
+    warmup_days = config.BACKTEST_WARMUP_DAYS if warmup_days is None else warmup_days
+    total_days = warmup_days + days
+
+    frame = get_inventory_frame(classify_product_node(fetch_inventory_node({})))
+    frame = frame.sort_values(INVENTORY_KEY, kind="stable", ignore_index=True)
+    demand = np.zeros((len(frame), total_days), dtype=np.float32, order="F")
+    params = {"start": as_of - timedelta(days=total_days), "as_of": as_of}
+    with connect() as conn:
+        # Row blocks of the sorted frame span contiguous product id ranges
+        for start in range(0, len(frame), ID_CHUNK_SIZE):
+            block = frame.iloc[start:start + ID_CHUNK_SIZE]
+            history = pd.read_sql(BACKTEST_HISTORY_QUERY, conn, params={
+                **params,
+                "min_product_id": int(block["product_id"].iloc[0]),
+                "max_product_id": int(block["product_id"].iloc[-1]),
+            })
+            demand[start:start + len(block)] = fill_demand_matrix(
+                block["product_id"], total_days, as_of, history, block["warehouse_id"])
+    return frame, demand
+
+
+def _policy_frame(frame: pd.DataFrame, policy_by: str) -> pd.DataFrame:
+    """Static policy inputs; the daily frames only add position and demand columns to these."""
+    columns = [c for c in POLICY_INPUT_COLUMNS + ([policy_by] if policy_by else []) if c in frame]
+    return frame[columns].reset_index(drop=True)
+
+
+def run_backtest(frame: pd.DataFrame, demand: np.ndarray, policy: str = None, policy_by: str = None,
+                 policy_map: dict = None, policy_params: dict = None, warmup_days: int = None,
+                 holding_cost_rate: float = None) -> pd.DataFrame:
+    """Replay ``demand`` (rows x days, aligned with ``frame``) under a policy; one result row per row of ``frame``.
+
+    Policy arguments default to the pipeline's REORDER_POLICY* settings.
+    """
+    warmup_days = config.BACKTEST_WARMUP_DAYS if warmup_days is None else warmup_days
+    holding_cost_rate = config.BACKTEST_HOLDING_COST_RATE if holding_cost_rate is None else holding_cost_rate
+    policy_by = policy_by if policy_by is not None else config.REORDER_POLICY_BY
+    n, total_days = demand.shape
+    window = max(1, warmup_days)
+    if total_days <= warmup_days:
+        raise ValueError(f"Need more than {warmup_days} days of history to backtest, got {total_days}")
+
+    static = _policy_frame(frame, policy_by)
+    lead = np.maximum(1, np.rint(np.nan_to_num(
+        frame["average_lead_time_days"].to_numpy(dtype=np.float64, na_value=np.nan)))).astype(np.int64)
+    unit_cost = np.nan_to_num(frame["unit_cost"].to_numpy(dtype=np.float64, na_value=np.nan))
+    daily_holding = unit_cost * holding_cost_rate / 365.0
+    rows = np.arange(n)
+
+    def review(position, window_sum, window_sumsq):
+        mean = window_sum / window
+        std = np.sqrt(np.maximum(window_sumsq / window - mean * mean, 0.0))
+        decision = compute_reorder(static.assign(available_stock=position, average_daily_demand=mean,
+                                                 demand_std_dev=std),
+                                   policy, policy_by, policy_map, policy_params, reasons=False)
+        return np.where(decision["should_reorder"].to_numpy(), decision["recommended_reorder_qty"].to_numpy(), 0)
+
+    warmup = demand[:, :warmup_days].astype(np.float64)
+    window_sum = warmup.sum(axis=1)
+    window_sumsq = (warmup * warmup).sum(axis=1)
+    on_hand = review(np.zeros(n), window_sum, window_sumsq).astype(np.float64)
+    on_order = np.zeros(n)
+    # arriving[day % horizon] holds the quantities due on that day
+    horizon = int(lead.max(initial=1)) + 1
+    arriving = np.zeros((horizon, n))
+
+    demand_units = np.zeros(n)
+    served_units = np.zeros(n)
+    stockout_days = np.zeros(n, dtype=np.int64)
+    on_hand_days = np.zeros(n)
+    orders_placed = np.zeros(n, dtype=np.int64)
+
+    for t in range(warmup_days, total_days):
+        slot = arriving[t % horizon]
+        on_hand += slot
+        on_order -= slot
+        slot[:] = 0.0
+
+        today = demand[:, t].astype(np.float64)
+        served = np.minimum(on_hand, today)
+        on_hand -= served
+        demand_units += today
+        served_units += served
+        stockout_days += served < today
+        on_hand_days += on_hand
+
+        dropped = demand[:, t - window].astype(np.float64) if t >= window else 0.0
+        window_sum += today - dropped
+        window_sumsq += today * today - dropped * dropped
+
+        qty = review(on_hand + on_order, window_sum, window_sumsq)
+        placed = qty > 0
+        arriving[(t + lead[placed]) % horizon, rows[placed]] += qty[placed]
+        on_order += qty
+        orders_placed += placed
+
+    replayed = total_days - warmup_days
+    result = frame[[c for c in INVENTORY_KEY + ["sku"] if c in frame]].reset_index(drop=True)
+    result["demand_units"] = demand_units.astype(np.int64)
+    result["served_units"] = served_units.astype(np.int64)
+    result["lost_units"] = result["demand_units"] - result["served_units"]
+    result["fill_rate"] = np.divide(served_units, demand_units, out=np.ones(n), where=demand_units > 0)
+    result["stockout_days"] = stockout_days
+    result["holding_cost"] = (on_hand_days * daily_holding).round(2)
+    result["average_on_hand"] = on_hand_days / replayed
+    result["orders_placed"] = orders_placed
+    return result
+
+
+def summarize(results: pd.DataFrame) -> dict:
+    """Catalog-wide totals of a run_backtest result."""
+    demand = int(results["demand_units"].sum())
+    return {
+        "rows": len(results),
+        "fill_rate": float(results["served_units"].sum() / demand) if demand else 1.0,
+        "stockout_days": int(results["stockout_days"].sum()),
+        "rows_with_stockouts": int((results["stockout_days"] > 0).sum()),
+        "lost_units": int(results["lost_units"].sum()),
+        "holding_cost": round(float(results["holding_cost"].sum()), 2),
+        "orders_placed": int(results["orders_placed"].sum()),
+    }
+
+
+# Set once per sweep worker so the history matrix is shipped once, not per scenario
+_sweep_inputs = None
+
+
+def _init_sweep_worker(frame, demand):
+    global _sweep_inputs
+    _sweep_inputs = (frame, demand)
+
+
+def _run_scenario(scenario: dict) -> dict:
+    frame, demand = _sweep_inputs
+    return summarize(run_backtest(frame, demand, **scenario))
+
+
+def sweep_policies(frame: pd.DataFrame, demand: np.ndarray, scenarios: dict, workers: int = None,
+                   mp_context=None) -> pd.DataFrame:
+    """Summaries of ``scenarios`` ({name: run_backtest keyword arguments}), one row per scenario.
+
+    ``workers > 1`` runs scenarios on a process pool; inside daemonic
+    processes they always run inline.
+    """
+    workers = config.BACKTEST_WORKERS if workers is None else workers
+    names = list(scenarios)
+    if workers > 1 and len(names) > 1 and not multiprocessing.current_process().daemon:
+        ctx = multiprocessing.get_context(mp_context)
+        with ProcessPoolExecutor(max_workers=min(workers, len(names)), mp_context=ctx,
+                                 initializer=_init_sweep_worker, initargs=(frame, demand)) as pool:
+            summaries = list(pool.map(_run_scenario, [scenarios[name] for name in names]))
+    else:
+        summaries = [summarize(run_backtest(frame, demand, **scenarios[name])) for name in names]
+    return pd.DataFrame(summaries, index=pd.Index(names, name="scenario"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest reorder policies against demand_history.")
+    parser.add_argument("--days", type=int, default=365, help="days of history to replay")
+    parser.add_argument("--as-of", type=date.fromisoformat, help="last replayed day (default: yesterday, the last complete day)")
+    parser.add_argument("--warmup-days", type=int, help="history that seeds the demand estimate")
+    parser.add_argument("--policy", action="append",
+                        help="policy to replay; repeat to sweep several (default: SUPPLY_CHAIN_REORDER_POLICY)")
+    parser.add_argument("--policy-params", type=json.loads, default=None,
+                        help='kernel arguments per policy, e.g. \'{"sS": {"reorder_days_coverage": 14}}\'')
+    parser.add_argument("--workers", type=int, help="processes for policy sweeps")
+    parser.add_argument("--output", help="write per-row results of a single policy to this CSV file")
+    args = parser.parse_args(argv)
+
+    frame, demand = load_backtest_inputs(args.days, args.as_of, args.warmup_days)
+    policies = args.policy or [config.REORDER_POLICY]
+    scenarios = {name: {"policy": name, "policy_params": args.policy_params, "warmup_days": args.warmup_days}
+                 for name in policies}
+    if len(policies) == 1:
+        results = run_backtest(frame, demand, **scenarios[policies[0]])
+        if args.output:
+            results.to_csv(args.output, index=False)
+        print(pd.DataFrame([summarize(results)], index=pd.Index(policies, name="scenario")).to_string())
+    else:
+        print(sweep_policies(frame, demand, scenarios, args.workers).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Result cache for pipeline runs, keyed by data version.
+
+The key of a cached result combines:
+
+- the data version: the change watermarks of the source tables (see
+  pipeline.incremental), the product count (so deletions invalidate),
+  today's date, the database URL and the config fingerprint;
+- a digest of the input state, so e.g. different shards are cached apart.
+
+Any write to the source tables moves the version, so stale entries are
+never returned; they simply age out of the LRU.
+
+Results live in an in-process LRU bounded by the memory of the inventory
+frames it holds. With ``disk_dir`` set there is a second tier: the frame is
+written as Parquet and the rest of the state is pickled next to it, so a new
+process can start warm.
+
+    cache = ResultCache()
+    state = cache.invoke(graph)                          # whole graph
+    graph = build_graph(cache.wrap)                      # or just the DB-backed nodes
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+
+from agents import config
+from agents.db import connect
+from agents.state import get_inventory_frame, set_inventory_frame
+from pipeline.incremental import config_fingerprint, read_watermarks
+
+# Nodes whose output depends on the database rather than only on their input
+CACHED_NODES = ("fetch_inventory", "forecast_demand")
+
+PRODUCT_COUNT_QUERY = text("SELECT COUNT(*) FROM products")
+
+# Derived from inventory_frame; rebuilt on a hit rather than stored
+DERIVED_KEYS = ("inventory_frame", "inventory_data")
+
+
+def data_version() -> str:
+    """Cheap fingerprint of everything a run reads: a few index lookups and a count."""
+    with connect() as conn:
+        products = conn.execute(PRODUCT_COUNT_QUERY).scalar_one()
+    watermarks = read_watermarks()
+    watermarks.pop("read_at")  # when they were read, not a version of the data
+    parts = {
+        "watermarks": watermarks,
+        "products": products,
+        "as_of": date.today().isoformat(),
+        "database": config.DATABASE_URL,
+        "config": config_fingerprint(),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def state_digest(state: dict) -> str:
+    """Content hash of a pipeline state; frames are hashed by value."""
+    digest = hashlib.sha256()
+    for key in sorted(state or {}):
+        if key == "inventory_data":
+            continue
+        value = state[key]
+        digest.update(key.encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(",".join(map(str, value.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:32]
+
+
+def _state_bytes(state: dict) -> int:
+    frame = get_inventory_frame(state)
+    return 1024 + (0 if frame is None else int(frame.memory_usage(deep=True).sum()))
+
+
+class ResultCache:
+    """Two-tier (memory, optional disk) LRU of pipeline states."""
+
+    def __init__(self, max_mb: int = None, disk_dir: str = None, disk_max_mb: int = None):
+        self.max_bytes = (config.CACHE_MAX_MB if max_mb is None else max_mb) * 2**20
+        disk_dir = disk_dir or config.CACHE_DIR
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = (config.CACHE_DISK_MAX_MB if disk_max_mb is None else disk_max_mb) * 2**20
+        self._entries = OrderedDict()  # key -> (state, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, namespace: str, state: dict = None) -> str:
+        return f"{namespace}-{data_version()}-{state_digest(state)}"
+
+    def get(self, key: str):
+        """Cached state for ``key`` (a fresh dict each time), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._restore(entry[0])
+
+        state = self._read_disk(key)
+        with self._lock:
+            if state is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, state)
+        return self._restore(state)
+
+    def put(self, key: str, state: dict):
+        state = {k: v for k, v in state.items() if k != "inventory_data"}
+        self._remember(key, state)
+        self._write_disk(key, state)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key: str, state: dict):
+        nbytes = _state_bytes(state)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (state, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    @staticmethod
+    def _restore(state: dict) -> dict:
+        frame = state.get("inventory_frame")
+        restored = {k: v for k, v in state.items() if k not in DERIVED_KEYS}
+        return set_inventory_frame(restored, frame) if frame is not None else restored
+
+    def _read_disk(self, key: str):
+        if self.disk_dir is None or not (self.disk_dir / f"{key}.pkl").exists():
+            return None
+        try:
+            with open(self.disk_dir / f"{key}.pkl", "rb") as f:
+                state = pickle.load(f)
+            if (self.disk_dir / f"{key}.parquet").exists():
+                state["inventory_frame"] = pd.read_parquet(self.disk_dir / f"{key}.parquet")
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None  # evicted or half-written by another process
+        os.utime(self.disk_dir / f"{key}.pkl")
+        return state
+
+    def _write_disk(self, key: str, state: dict):
+        if self.disk_dir is None:
+            return
+        frame = state.get("inventory_frame")
+        if frame is not None:
+            frame.to_parquet(self.disk_dir / f"{key}.parquet.tmp", index=False)
+            os.replace(self.disk_dir / f"{key}.parquet.tmp", self.disk_dir / f"{key}.parquet")
+        rest = {k: v for k, v in state.items() if k not in DERIVED_KEYS}
+        with open(self.disk_dir / f"{key}.pkl.tmp", "wb") as f:
+            pickle.dump(rest, f)
+        # The .pkl marks the entry complete, so it is written last
+        os.replace(self.disk_dir / f"{key}.pkl.tmp", self.disk_dir / f"{key}.pkl")
+        self._prune_disk()
+
+    def _prune_disk(self):
+        entries = sorted(self.disk_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+        sizes = {p: p.stat().st_size + (p.with_suffix(".parquet").stat().st_size
+                                        if p.with_suffix(".parquet").exists() else 0) for p in entries}
+        total = sum(sizes.values())
+        for path in entries[:-1]:  # always keep the newest
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix(".parquet").unlink(missing_ok=True)
+            total -= sizes[path]
+
+    def invoke(self, graph, input: dict = None) -> dict:
+        """``graph.invoke(input)``, answered from the cache while the data is unchanged."""
+        key = self.key("graph", input)
+        state = self.get(key)
+        if state is None:
+            state = graph.invoke(input or {})
+            self.put(key, state)
+        return state
+
+    async def ainvoke(self, graph, input: dict = None) -> dict:
+        key = self.key("graph", input)
+        state = self.get(key)
+        if state is None:
+            state = await graph.ainvoke(input or {})
+            self.put(key, state)
+        return state
+
+    def wrap(self, name: str, node):
+        """``build_graph`` wrapper caching the DB-backed nodes in CACHED_NODES."""
+        if name not in CACHED_NODES:
+            return node
+
+        if inspect.iscoroutinefunction(node):
+            @wraps(node)
+            async def cached(state):
+                key = self.key(name, state)
+                hit = self.get(key)
+                if hit is not None:
+                    state.update(hit)
+                    return state
+                result = await node(state)
+                self.put(key, result)
+                return result
+        else:
+            @wraps(node)
+            def cached(state):
+                key = self.key(name, state)
+                hit = self.get(key)
+                if hit is not None:
+                    state.update(hit)
+                    return state
+                result = node(state)
+                self.put(key, result)
+                return result
+
+        return cached
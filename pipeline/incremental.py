@@ -0,0 +1,221 @@
+"""Incremental re-planning: recompute only the products whose inputs changed.
+
+The previous run's per-product output is kept in a Parquet store together
+with the change-tracking watermarks it was computed at. A run then
+
+1. reads the current maxima of inventory.last_updated, demand_history.created_at
+   and products / suppliers / product_suppliers.updated_at;
+2. selects the products with a row newer than the stored watermarks, plus
+   products that left the catalog;
+3. re-fetches just those and runs classify -> forecast -> risk -> recommend on them;
+4. recomputes the catalog-wide ABC thresholds from the stored revenue vector
+   (no database round trip) and re-runs recommend for rows whose class moved.
+
+A full run happens when there is no store, when the day rolled over (every
+demand window moved) or when the pipeline configuration changed.
+
+The tracked timestamps are taken when the writing transaction starts, so a
+change can commit after a run read its watermarks yet carry an older
+timestamp. Rows stamped up to ``INCREMENTAL_LAG`` seconds before that read
+are therefore selected again; this re-plans a few products that were already
+up to date. Changes that take longer than the lag to commit are only picked
+up by the next full run.
+"""
+import hashlib
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from agents import config
+from agents.analyze_risk import risk_analyzer_node
+from agents.classify_products import (
+    FINANCIAL_CUTOFFS, abc_thresholds, classify_product_node, classify_products, compute_revenue,
+)
+from agents.db import connect
+from agents.fetch_inventory import INVENTORY_KEY, fetch_inventory_for_products, fetch_inventory_node
+from agents.forcast_demand import forecast_demand_node
+from agents.purchase_orders import purchase_order_node
+from agents.recommend import recommend_reorder_node
+from agents.rollups import refresh_rollups
+from agents.sourcing import sourcing_node
+from agents.state import get_inventory_frame, set_inventory_frame
+
+PLAN_NODES = (classify_product_node, forecast_demand_node, risk_analyzer_node, recommend_reorder_node)
+STORE_FILE = "products.parquet"
+META_FILE = "meta.json"
+
+# Lower bound for sources that had no rows at the previous run
+EPOCH = "0001-01-01 00:00:00"
+
+WATERMARKS_QUERY = text("""
+    SELECT
+        (SELECT MAX(last_updated) FROM inventory) AS inventory,
+        (SELECT MAX(created_at) FROM demand_history) AS demand_history,
+        (SELECT MAX(updated_at) FROM products) AS products,
+        (SELECT MAX(updated_at) FROM suppliers) AS suppliers,
+        (SELECT MAX(updated_at) FROM product_suppliers) AS product_suppliers,
+        CURRENT_TIMESTAMP AS read_at
+""")
+
+CHANGED_PRODUCTS_QUERY = text("""
+    SELECT product_id FROM inventory WHERE last_updated > :inventory
+    UNION
+    SELECT product_id FROM demand_history WHERE created_at > :demand_history
+    UNION
+    SELECT product_id FROM products WHERE updated_at > :products
+    UNION
+    SELECT product_id FROM product_suppliers WHERE updated_at > :product_suppliers
+    UNION
+    SELECT ps.product_id
+    FROM product_suppliers ps
+    JOIN suppliers s ON s.supplier_id = ps.supplier_id
+    WHERE s.updated_at > :suppliers
+""")
+
+PRODUCT_IDS_QUERY = text("SELECT product_id FROM products")
+
+
+def config_fingerprint() -> str:
+    """Hash of every setting that changes per-product results."""
+    settings = {
+        "float_dtype": config.FLOAT_DTYPE,
+        "reorder_policy": config.REORDER_POLICY,
+        "reorder_policy_by": config.REORDER_POLICY_BY,
+        "reorder_policy_map": config.REORDER_POLICY_MAP,
+        "reorder_policy_params": config.REORDER_POLICY_PARAMS,
+        "demand_source": config.DEMAND_SOURCE,
+        "forecast_method": config.FORECAST_METHOD,
+        "forecast_history_days": config.FORECAST_HISTORY_DAYS,
+        "financial_cutoffs": FINANCIAL_CUTOFFS,
+        "classification": [config.CLASSIFICATION_CRITERIA, config.XYZ_CUTOFFS],
+        "sourcing": [config.SOURCING_WEIGHTS, config.SOURCING_ORDER_COST],
+        "risk": [config.RISK_METHOD, config.SIMULATION_SCENARIOS, config.SIMULATION_SEED,
+                 config.SIMULATION_RISK_THRESHOLD],
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def read_watermarks() -> dict:
+    """Latest change timestamp per tracked table, as strings the database compares natively."""
+    with connect() as conn:
+        row = conn.execute(WATERMARKS_QUERY).one()
+    return {k: None if v is None else str(v) for k, v in row._mapping.items()}
+
+
+def changed_product_ids(since: dict, lag: float = None) -> np.ndarray:
+    """Products with any tracked row newer than the ``since`` watermarks.
+
+    Rows up to ``lag`` seconds older than ``since["read_at"]``, when the
+    watermarks were read, count as well: they may have committed after it.
+    """
+    lag = pd.Timedelta(seconds=config.INCREMENTAL_LAG if lag is None else lag)
+    since = dict(since)
+    read_at = since.pop("read_at", None)
+    params = {}
+    for key, watermark in since.items():
+        if watermark is None:
+            params[key] = EPOCH
+            continue
+        watermark = pd.Timestamp(watermark)
+        # Stores written before read_at was tracked look back from the watermark itself
+        floor = pd.Timestamp(read_at).tz_localize(None) - lag if read_at else watermark - lag
+        params[key] = f"{min(watermark, floor):%Y-%m-%d %H:%M:%S.%f}"
+    with connect() as conn:
+        ids = conn.execute(CHANGED_PRODUCTS_QUERY, params).scalars().all()
+    return np.unique(np.asarray(ids, dtype=np.int64))
+
+
+def load_store(store_dir) -> tuple:
+    """(frame, metadata) of the previous run, or (None, None) if there is none."""
+    store_dir = Path(store_dir)
+    if not (store_dir / META_FILE).exists() or not (store_dir / STORE_FILE).exists():
+        return None, None
+    meta = json.loads((store_dir / META_FILE).read_text())
+    return pd.read_parquet(store_dir / STORE_FILE), meta
+
+
+def save_store(store_dir, frame: pd.DataFrame, meta: dict):
+    """Replace the stored results; metadata is written last so a partial write is never trusted."""
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    (store_dir / META_FILE).unlink(missing_ok=True)
+    tmp = store_dir / f"{STORE_FILE}.tmp"
+    frame.to_parquet(tmp, index=False)
+    os.replace(tmp, store_dir / STORE_FILE)
+    (store_dir / META_FILE).write_text(json.dumps(meta, indent=2))
+
+
+def plan_products(frame: pd.DataFrame, thresholds: tuple) -> pd.DataFrame:
+    """Run the per-product nodes on ``frame`` against fixed ABC thresholds."""
+    state = set_inventory_frame({"abc_thresholds": thresholds, "rollups_fresh": True}, frame)
+    for node in PLAN_NODES:
+        state = node(state)
+    return get_inventory_frame(state)
+
+
+def _full_run() -> tuple:
+    frame = get_inventory_frame(fetch_inventory_node({"rollups_fresh": True}))
+    thresholds = abc_thresholds(compute_revenue(frame))
+    return plan_products(frame, thresholds), thresholds
+
+
+def _reclassify(frame: pd.DataFrame, thresholds: tuple) -> int:
+    """Apply new ABC thresholds in place; re-recommend rows whose class moved."""
+    classes = classify_products(frame, thresholds)
+    moved = classes["computed_financial_class"].to_numpy() != frame["computed_financial_class"].to_numpy()
+    frame[classes.columns] = classes
+    if moved.any():
+        redone = get_inventory_frame(recommend_reorder_node(set_inventory_frame({}, frame.loc[moved])))
+        redone.index = frame.index[moved]
+        frame.loc[moved, redone.columns] = redone
+    return int(moved.sum())
+
+
+def run_incremental(store_dir=None, force_full: bool = False) -> dict:
+    """Bring the stored plan up to date and return it as the final state.
+
+    ``state["incremental_summary"]`` reports the mode and how many products
+    were recomputed, removed and reclassified.
+    """
+    store_dir = store_dir or config.INCREMENTAL_STORE_DIR
+    if config.DEMAND_SOURCE == "rollup":
+        refresh_rollups()
+
+    watermarks = read_watermarks()
+    meta = {"as_of": date.today().isoformat(), "config": config_fingerprint(), "watermarks": watermarks}
+    previous, previous_meta = (None, None) if force_full else load_store(store_dir)
+
+    if previous is None or any(previous_meta[k] != meta[k] for k in ("as_of", "config")):
+        frame, thresholds = _full_run()
+        summary = {"mode": "full", "recomputed": len(frame), "removed": 0, "reclassified": 0}
+    else:
+        changed = changed_product_ids(previous_meta["watermarks"])
+        with connect() as conn:
+            current_ids = conn.execute(PRODUCT_IDS_QUERY).scalars().all()
+        removed = np.setdiff1d(previous["product_id"].to_numpy(), np.asarray(current_ids, dtype=np.int64))
+
+        old_thresholds = tuple(previous_meta["abc_thresholds"])
+        fresh = plan_products(fetch_inventory_for_products(changed), old_thresholds) if len(changed) else None
+        kept = previous.loc[~previous["product_id"].isin(np.concatenate([changed, removed]))]
+        frames = [f for f in (kept, fresh) if f is not None and not f.empty]
+        frame = pd.concat(frames, ignore_index=True) if frames else previous.iloc[:0]
+        frame = frame.sort_values([c for c in INVENTORY_KEY if c in frame], kind="stable").reset_index(drop=True)
+
+        thresholds = abc_thresholds(compute_revenue(frame))
+        reclassified = _reclassify(frame, thresholds) if thresholds != old_thresholds else 0
+        summary = {"mode": "incremental", "recomputed": len(changed), "removed": len(removed),
+                   "reclassified": reclassified}
+
+    meta["abc_thresholds"] = list(thresholds)
+    save_store(store_dir, frame, meta)
+
+    state = set_inventory_frame({}, frame)
+    state["abc_thresholds"] = thresholds
+    state["incremental_summary"] = summary
+    # Supplier capacities are shared across products, so sourcing is always re-solved
+    return purchase_order_node(sourcing_node(state))
@@ -0,0 +1,211 @@
+"""Per-node instrumentation for the compiled graph.
+
+``NodeInstrumentation.wrap`` is passed to ``build_graph`` and wraps every
+registered node. Each call records:
+
+- wall and CPU time;
+- rows in the inventory frame before and after the node;
+- growth of the process peak RSS while the node ran;
+- time spent in SQL, from SQLAlchemy cursor events.
+
+Each call is logged as one JSON line on the ``supply_chain.nodes`` logger, and
+the totals render in the Prometheus text format for a node_exporter textfile
+collector. With ``profile_dir`` set, every call also runs under cProfile and
+leaves ``<node>.prof`` and a ``<node>.txt`` report there. Coroutine nodes are
+measured across their awaits, so their wall time includes waiting on the
+database and their CPU time anything else the process did meanwhile.
+
+Nothing is wrapped and no SQL listeners exist unless an instance is created,
+so an uninstrumented graph pays no overhead.
+"""
+import contextvars
+import cProfile
+import inspect
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from agents.state import get_inventory_frame
+
+logger = logging.getLogger("supply_chain.nodes")
+
+# SQL timings go to the accumulator of the node running in this context
+_sql_timer = contextvars.ContextVar("supply_chain_sql_timer", default=None)
+_sql_listeners_installed = False
+_sql_listeners_lock = threading.Lock()
+
+# ru_maxrss is KiB on Linux and bytes on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sql_timer.get() is not None:
+        conn.info.setdefault("supply_chain_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _sql_timer.get()
+    starts = conn.info.get("supply_chain_query_start")
+    if timer is not None and starts:
+        timer[0] += time.perf_counter() - starts.pop()
+        timer[1] += 1
+
+
+def install_sql_timing():
+    """Time cursor executions on every engine; idempotent."""
+    global _sql_listeners_installed
+    with _sql_listeners_lock:
+        if not _sql_listeners_installed:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            _sql_listeners_installed = True
+
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+def _rows(state) -> int:
+    frame = get_inventory_frame(state) if isinstance(state, dict) else None
+    return 0 if frame is None else len(frame)
+
+
+class NodeInstrumentation:
+    """Collects one record per node call and exports the totals."""
+
+    def __init__(self, profile_dir: str = None, log: bool = True):
+        self.records = []
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.log = log
+        self._lock = threading.Lock()
+        if self.profile_dir:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+        install_sql_timing()
+
+    def wrap(self, name: str, node):
+        """Return ``node`` (a function or coroutine function) instrumented under ``name``."""
+        if inspect.iscoroutinefunction(node):
+            @wraps(node)
+            async def instrumented(state):
+                call = self._start(state)
+                try:
+                    result = await node(state)
+                finally:
+                    self._stop(call)
+                return self._finish(name, call, result)
+        else:
+            @wraps(node)
+            def instrumented(state):
+                call = self._start(state)
+                try:
+                    result = node(state)
+                finally:
+                    self._stop(call)
+                return self._finish(name, call, result)
+
+        return instrumented
+
+    def _start(self, state) -> dict:
+        call = {"rows_in": _rows(state), "sql": [0.0, 0], "rss": peak_rss_bytes()}
+        call["token"] = _sql_timer.set(call["sql"])
+        call["profiler"] = cProfile.Profile() if self.profile_dir else None
+        if call["profiler"] is not None:
+            call["profiler"].enable()
+        call["wall"], call["cpu"] = time.perf_counter(), time.process_time()
+        return call
+
+    def _stop(self, call: dict):
+        call["wall"] = time.perf_counter() - call["wall"]
+        call["cpu"] = time.process_time() - call["cpu"]
+        if call["profiler"] is not None:
+            call["profiler"].disable()
+        _sql_timer.reset(call["token"])
+
+    def _finish(self, name: str, call: dict, result):
+        self.record({
+            "node": name,
+            "wall_seconds": call["wall"],
+            "cpu_seconds": call["cpu"],
+            "sql_seconds": call["sql"][0],
+            "sql_statements": call["sql"][1],
+            "rows_in": call["rows_in"],
+            "rows_out": _rows(result),
+            "peak_rss_delta_bytes": peak_rss_bytes() - call["rss"],
+        })
+        if call["profiler"] is not None:
+            self._dump_profile(name, call["profiler"])
+        return result
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.records.append(entry)
+        if self.log:
+            logger.info(json.dumps({"event": "node_completed", **entry}))
+
+    def _dump_profile(self, name: str, profiler: cProfile.Profile):
+        profiler.dump_stats(self.profile_dir / f"{name}.prof")
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(40)
+        (self.profile_dir / f"{name}.txt").write_text(report.getvalue())
+
+    def summary(self) -> dict:
+        """Per-node totals over every recorded call, in first-call order."""
+        totals = {}
+        with self._lock:
+            records = list(self.records)
+        for r in records:
+            t = totals.setdefault(r["node"], {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                              "sql_seconds": 0.0, "sql_statements": 0,
+                                              "peak_rss_delta_bytes": 0})
+            t["calls"] += 1
+            for key in ("wall_seconds", "cpu_seconds", "sql_seconds", "sql_statements"):
+                t[key] += r[key]
+            t["peak_rss_delta_bytes"] = max(t["peak_rss_delta_bytes"], r["peak_rss_delta_bytes"])
+            t["rows_in"], t["rows_out"] = r["rows_in"], r["rows_out"]
+        return totals
+
+    def render_prometheus(self) -> str:
+        """Per-node totals in the Prometheus text exposition format."""
+        metrics = [
+            ("supply_chain_node_calls_total", "counter", "Node invocations", "calls"),
+            ("supply_chain_node_wall_seconds_total", "counter", "Wall time spent in the node", "wall_seconds"),
+            ("supply_chain_node_cpu_seconds_total", "counter", "Process CPU time spent in the node", "cpu_seconds"),
+            ("supply_chain_node_sql_seconds_total", "counter", "Time spent executing SQL", "sql_seconds"),
+            ("supply_chain_node_sql_statements_total", "counter", "SQL statements executed", "sql_statements"),
+            ("supply_chain_node_rows_in", "gauge", "Inventory rows entering the node on its last call", "rows_in"),
+            ("supply_chain_node_rows_out", "gauge", "Inventory rows leaving the node on its last call", "rows_out"),
+            ("supply_chain_node_peak_rss_delta_bytes", "gauge", "Largest growth of peak RSS during one call",
+             "peak_rss_delta_bytes"),
+        ]
+        summary = self.summary()
+        out = []
+        for name, kind, help_text, key in metrics:
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for node, totals in summary.items():
+                out.append(f'{name}{{node="{node}"}} {totals[key]}')
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write the totals for a node_exporter textfile collector."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
@@ -0,0 +1,271 @@
+"""Persisted run outputs: every run's recommendations, queryable without re-running.
+
+``write_run`` stores one row per (product, warehouse) of a run's final state
+in ``reorder_recommendations`` and registers the run in ``pipeline_runs``.
+On PostgreSQL the table is partitioned by ``run_date`` (one partition per
+day, created on first write; see data/database_setup.py) and rows are
+bulk-loaded with COPY. Other databases get a plain table and batched inserts.
+
+Dashboards read precomputed results through ``latest_recommendations``
+(newest row per SKU and location, read from the partitions since the last
+full run) and ``run_diff`` (what changed between two runs). Both are served
+by the (product_id, warehouse_id, run_id) and (run_id) indexes. ``export_parquet`` writes a run as a Hive-partitioned
+Parquet dataset for offline consumers.
+"""
+import argparse
+import csv
+import io
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from agents.db import begin, connect
+from agents.fetch_inventory import INVENTORY_KEY
+from agents.state import get_inventory_frame
+
+RESULTS_TABLE = "reorder_recommendations"
+
+# Stored per row; columns a run did not produce (e.g. stockout_probability
+# outside simulation mode) are stored as NULL
+RESULT_COLUMNS = {
+    "product_id": "INTEGER NOT NULL",
+    "warehouse_id": "INTEGER NOT NULL",
+    "sku": "VARCHAR(50)",
+    "computed_financial_class": "CHAR(1)",
+    "computed_operational_risk": "CHAR(1)",
+    "forecasted_demand_30d": "INTEGER",
+    "available_stock": "INTEGER",
+    "days_until_stockout": "DOUBLE PRECISION",
+    "expected_consumption_during_lead_time": "DOUBLE PRECISION",
+    "at_risk_of_stockout": "BOOLEAN",
+    "stockout_probability": "DOUBLE PRECISION",
+    "should_reorder": "BOOLEAN",
+    "recommended_reorder_qty": "INTEGER",
+    "reorder_reason": "VARCHAR(100)",
+}
+
+# What run_diff compares between two runs
+DIFF_COLUMNS = ["computed_financial_class", "at_risk_of_stockout", "should_reorder", "recommended_reorder_qty"]
+
+RUNS_DDL = """
+    CREATE TABLE IF NOT EXISTS pipeline_runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_at TIMESTAMP NOT NULL,
+        run_date DATE NOT NULL,
+        mode VARCHAR(20) NOT NULL,
+        row_count INTEGER NOT NULL
+    )
+"""
+
+# The one definition of the results table: ensure_tables creates it as is,
+# data/database_setup.py adds PARTITION BY RANGE (run_date) on PostgreSQL
+RESULTS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+        run_id INTEGER NOT NULL,
+        run_date DATE NOT NULL,
+        {", ".join(f"{name} {sql_type}" for name, sql_type in RESULT_COLUMNS.items())}
+    )
+"""
+
+RESULTS_INDEXES = (
+    f"CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_location_run ON {RESULTS_TABLE}(product_id, warehouse_id, run_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_run ON {RESULTS_TABLE}(run_id)",
+)
+
+INSERT_RUN = text("""
+    INSERT INTO pipeline_runs (run_at, run_date, mode, row_count)
+    VALUES (:run_at, :run_date, :mode, :row_count)
+    RETURNING run_id
+""")
+
+# The newest run that planned the whole catalog; rows stored before its
+# run_date are superseded for every location that still exists
+LAST_FULL_RUN_QUERY = text("""
+    SELECT run_date FROM pipeline_runs
+    WHERE mode = 'full'
+    ORDER BY run_id DESC
+    LIMIT 1
+""")
+
+# Newest run per (product, warehouse), then that run's row. Both sides are
+# bounded by run_date so PostgreSQL only scans the partitions from the last
+# full run on
+LATEST_QUERY = f"""
+    SELECT r.*
+    FROM {RESULTS_TABLE} r
+    JOIN (
+        SELECT product_id, warehouse_id, MAX(run_id) AS run_id
+        FROM {RESULTS_TABLE}
+        WHERE run_date >= :since{{product_filter}}
+        GROUP BY product_id, warehouse_id
+    ) latest
+      ON latest.product_id = r.product_id AND latest.warehouse_id = r.warehouse_id AND latest.run_id = r.run_id
+    WHERE r.run_date >= :since
+    ORDER BY r.product_id, r.warehouse_id
+"""
+
+RUN_ROWS_QUERY = text(f"""
+    SELECT * FROM {RESULTS_TABLE}
+    WHERE run_id = :run_id AND run_date = :run_date
+    ORDER BY product_id, warehouse_id
+""")
+
+
+def ensure_tables(conn):
+    """Create the results tables where the schema setup script did not (e.g. SQLite)."""
+    if conn.dialect.name == "postgresql":
+        return  # partitioned tables come from data/database_setup.py
+    conn.execute(text(RUNS_DDL))
+    conn.execute(text(RESULTS_DDL))
+    for ddl in RESULTS_INDEXES:
+        conn.execute(text(ddl))
+
+
+def _ensure_partition(conn, run_date: date):
+    name = f"{RESULTS_TABLE}_{run_date:%Y%m%d}"
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {RESULTS_TABLE} "
+        f"FOR VALUES FROM ('{run_date}') TO ('{run_date + timedelta(days=1)}')"
+    ))
+
+
+def results_frame(frame: pd.DataFrame, run_id: int, run_date: date) -> pd.DataFrame:
+    """The stored columns of ``frame``, tagged with the run."""
+    rows = pd.DataFrame({"run_id": run_id, "run_date": run_date}, index=frame.index)
+    for name, sql_type in RESULT_COLUMNS.items():
+        if name not in frame:
+            rows[name] = 1 if name == "warehouse_id" else None
+        elif sql_type.startswith("INTEGER"):
+            # Nullable integers, so COPY never sees "12.0"
+            rows[name] = pd.array(frame[name].to_numpy(), dtype="Int64")
+        else:
+            rows[name] = frame[name].to_numpy()
+    return rows.reset_index(drop=True)
+
+
+def _copy_rows(conn, rows: pd.DataFrame):
+    """Bulk-load ``rows`` through COPY on the connection's psycopg2 cursor."""
+    buffer = io.StringIO()
+    rows.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL, na_rep="")
+    buffer.seek(0)
+    with conn.connection.driver_connection.cursor() as cur:
+        cur.copy_expert(f"COPY {RESULTS_TABLE} ({', '.join(rows.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def write_run(state: dict, mode: str = "full", run_at: datetime = None) -> int:
+    """Persist the final state of a run; returns its run_id."""
+    frame = get_inventory_frame(state)
+    run_at = run_at or datetime.now()
+    run_date = run_at.date()
+
+    with begin() as conn:
+        ensure_tables(conn)
+        run_id = conn.execute(INSERT_RUN, {"run_at": run_at, "run_date": run_date, "mode": mode,
+                                           "row_count": len(frame)}).scalar_one()
+        rows = results_frame(frame, run_id, run_date)
+        if conn.dialect.name == "postgresql":
+            _ensure_partition(conn, run_date)
+            _copy_rows(conn, rows)
+        elif len(rows):
+            rows.to_sql(RESULTS_TABLE, conn, index=False, if_exists="append", chunksize=10_000)
+    return run_id
+
+
+def _read(query, params: dict) -> pd.DataFrame:
+    with connect() as conn:
+        ensure_tables(conn)
+        return pd.read_sql(query, conn, params=params)
+
+
+def list_runs(limit: int = 20) -> pd.DataFrame:
+    """The most recent runs, newest first."""
+    return _read(text("SELECT * FROM pipeline_runs ORDER BY run_id DESC LIMIT :limit"), {"limit": limit})
+
+
+def run_results(run_id: int) -> pd.DataFrame:
+    """Every stored row of one run."""
+    runs = _read(text("SELECT run_date FROM pipeline_runs WHERE run_id = :run_id"), {"run_id": run_id})
+    if runs.empty:
+        raise KeyError(f"No stored run {run_id}")
+    # run_date lets PostgreSQL prune to the run's partition
+    run_date = pd.Timestamp(runs["run_date"].iloc[0]).date()
+    return _read(RUN_ROWS_QUERY, {"run_id": run_id, "run_date": run_date})
+
+
+def latest_recommendations(product_ids=None) -> pd.DataFrame:
+    """Newest stored row per (product, warehouse), optionally for ``product_ids`` only.
+
+    Only runs from the day of the newest full run on are read (every run if
+    there is none yet); partial runs after it still supersede its rows.
+    """
+    runs = _read(LAST_FULL_RUN_QUERY, {})
+    since = pd.Timestamp(runs["run_date"].iloc[0]).date() if len(runs) else date.min
+    if product_ids is None:
+        return _read(text(LATEST_QUERY.format(product_filter="")), {"since": since})
+    query = text(LATEST_QUERY.format(product_filter="\n          AND product_id IN :product_ids"))
+    query = query.bindparams(bindparam("product_ids", expanding=True))
+    return _read(query, {"since": since, "product_ids": [int(i) for i in product_ids]})
+
+
+def run_diff(run_id: int = None, base_run_id: int = None) -> pd.DataFrame:
+    """Rows that differ between ``base_run_id`` and ``run_id`` (default: the two newest runs).
+
+    ``change`` is "added", "removed" or "changed"; compared columns appear
+    with ``_base`` and ``_new`` suffixes.
+    """
+    if run_id is None or base_run_id is None:
+        runs = list_runs(2)["run_id"].tolist()
+        if len(runs) < 2:
+            raise ValueError("run_diff needs two stored runs")
+        run_id, base_run_id = run_id or runs[0], base_run_id or runs[1]
+
+    keep = INVENTORY_KEY + ["sku"] + DIFF_COLUMNS
+    merged = run_results(base_run_id)[keep].merge(
+        run_results(run_id)[keep], on=INVENTORY_KEY, how="outer", suffixes=("_base", "_new"), indicator=True
+    )
+    changed = np.zeros(len(merged), dtype=bool)
+    for name in DIFF_COLUMNS:
+        base, new = merged[f"{name}_base"], merged[f"{name}_new"]
+        changed |= ~((base == new) | (base.isna() & new.isna())).to_numpy(dtype=bool)
+    merged["change"] = np.select(
+        [merged["_merge"] == "right_only", merged["_merge"] == "left_only"], ["added", "removed"], "changed"
+    )
+    merged["sku"] = merged["sku_new"].fillna(merged["sku_base"])
+    diff = merged.loc[changed, INVENTORY_KEY + ["sku", "change"]
+                      + [f"{name}_{side}" for name in DIFF_COLUMNS for side in ("base", "new")]]
+    return diff.reset_index(drop=True)
+
+
+def export_parquet(state: dict, directory, run_id: int = None, run_at: datetime = None) -> Path:
+    """Write a run's rows under ``directory/run_date=YYYY-MM-DD/``; returns the file written."""
+    run_at = run_at or datetime.now()
+    rows = results_frame(get_inventory_frame(state), run_id if run_id is not None else -1, run_at.date())
+    partition = Path(directory) / f"run_date={run_at.date()}"
+    partition.mkdir(parents=True, exist_ok=True)
+    name = f"run_{run_id}.parquet" if run_id is not None else f"run_{run_at:%H%M%S%f}.parquet"
+    path = partition / name
+    rows.drop(columns=["run_date"]).to_parquet(path, index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query stored pipeline results.")
+    parser.add_argument("command", choices=["runs", "latest", "diff"])
+    parser.add_argument("--product-id", type=int, action="append", help="limit `latest` to these products")
+    parser.add_argument("--run-id", type=int, help="`diff`: newer run (default: newest)")
+    parser.add_argument("--base-run-id", type=int, help="`diff`: older run (default: the one before)")
+    args = parser.parse_args(argv)
+
+    if args.command == "runs":
+        print(list_runs().to_string(index=False))
+    elif args.command == "latest":
+        print(latest_recommendations(args.product_id).to_string(index=False))
+    else:
+        print(run_diff(args.run_id, args.base_run_id).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
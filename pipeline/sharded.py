@@ -0,0 +1,150 @@
+"""Sharded execution of the supply chain pipeline across worker processes.
+
+Products are partitioned by product_id range, by category or by warehouse,
+and each shard runs fetch -> classify -> forecast -> risk -> recommend in its own process.
+
+The financial ABC classification ranks revenue over the whole catalog, so it
+runs in two phases:
+
+1. every worker fetches its shard and sends its revenue vector to the parent;
+2. the parent computes catalog-wide ABC thresholds and broadcasts them;
+3. workers classify locally against those thresholds and finish their shard.
+
+The parent then concatenates the shard frames in (product_id, warehouse_id)
+order and allocates the reorders to suppliers in one solve, since supplier
+capacities are shared by every shard.
+"""
+import multiprocessing
+import os
+import traceback
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from agents import config
+from agents.analyze_risk import risk_analyzer_node
+from agents.classify_products import abc_thresholds, classify_product_node, compute_revenue
+from agents.db import connect
+from agents.fetch_inventory import INVENTORY_KEY, fetch_inventory_node
+from agents.forcast_demand import forecast_demand_node
+from agents.purchase_orders import purchase_order_node
+from agents.recommend import recommend_reorder_node
+from agents.rollups import refresh_rollups
+from agents.sourcing import sourcing_node
+from agents.state import get_inventory_frame, set_inventory_frame
+
+# Nodes run per shard once the global ABC thresholds are known
+LOCAL_NODES = (classify_product_node, forecast_demand_node, risk_analyzer_node, recommend_reorder_node)
+
+
+def plan_shards(n_shards: int, by: str = "product_id") -> list:
+    """Split the catalog into ``n_shards`` roughly equal shards.
+
+    ``by="product_id"`` gives contiguous id ranges with equal product counts;
+    ``by="category"`` packs whole categories into shards, largest first;
+    ``by="warehouse"`` packs whole warehouses the same way, by inventory rows.
+    """
+    if by == "product_id":
+        query = text("""
+            SELECT MIN(product_id) AS min_product_id, MAX(product_id) AS max_product_id
+            FROM (
+                SELECT product_id, NTILE(:n_shards) OVER (ORDER BY product_id) AS shard
+                FROM products
+            ) tiles
+            GROUP BY shard
+            ORDER BY shard
+        """)
+        with connect() as conn:
+            ranges = pd.read_sql(query, conn, params={"n_shards": n_shards})
+        return [{k: int(v) for k, v in row.items()} for row in ranges.to_dict(orient="records")]
+
+    if by == "category":
+        with connect() as conn:
+            sizes = pd.read_sql(text("SELECT category, COUNT(*) AS n FROM products GROUP BY category"), conn)
+        shards = [{"categories": [], "size": 0} for _ in range(min(n_shards, len(sizes)))]
+        for category, n in sizes.sort_values("n", ascending=False).itertuples(index=False):
+            smallest = min(shards, key=lambda s: s["size"])
+            smallest["categories"].append(category)
+            smallest["size"] += n
+        return [{"categories": s["categories"]} for s in shards if s["categories"]]
+
+    if by == "warehouse":
+        with connect() as conn:
+            sizes = pd.read_sql(text("SELECT warehouse_id, COUNT(*) AS n FROM inventory GROUP BY warehouse_id"), conn)
+        shards = [{"warehouse_ids": [], "size": 0} for _ in range(min(n_shards, len(sizes)))]
+        for warehouse_id, n in sizes.sort_values("n", ascending=False).itertuples(index=False):
+            smallest = min(shards, key=lambda s: s["size"])
+            smallest["warehouse_ids"].append(int(warehouse_id))
+            smallest["size"] += n
+        return [{"warehouse_ids": sorted(s["warehouse_ids"])} for s in shards if s["warehouse_ids"]]
+
+    raise ValueError(f"Unknown shard key {by!r}; expected 'product_id', 'category' or 'warehouse'")
+
+
+def _shard_worker(shard: dict, conn):
+    """Runs in a worker process; talks to the parent over ``conn``."""
+    try:
+        state = fetch_inventory_node({"shard": shard, "rollups_fresh": True})
+        conn.send(("revenue", compute_revenue(get_inventory_frame(state))))
+
+        kind, thresholds = conn.recv()
+        state["abc_thresholds"] = thresholds
+        for node in LOCAL_NODES:
+            state = node(state)
+        conn.send(("result", get_inventory_frame(state)))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def _receive(conn, expected: str):
+    kind, payload = conn.recv()
+    if kind == "error":
+        raise RuntimeError(f"Shard worker failed:\n{payload}")
+    if kind != expected:
+        raise RuntimeError(f"Expected {expected!r} from shard worker, got {kind!r}")
+    return payload
+
+
+def run_sharded(n_workers: int = None, by: str = "product_id", mp_context=None) -> dict:
+    """Run the full pipeline sharded over ``n_workers`` processes; returns the final state."""
+    n_workers = n_workers or os.cpu_count() or 1
+    if config.DEMAND_SOURCE == "rollup":
+        refresh_rollups()
+
+    shards = plan_shards(n_workers, by)
+    ctx = multiprocessing.get_context(mp_context)
+
+    workers = []
+    try:
+        for shard in shards:
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_shard_worker, args=(shard, child_conn), daemon=True)
+            process.start()
+            child_conn.close()
+            workers.append((process, parent_conn))
+
+        # Phase 1: local revenue -> global thresholds
+        revenue = np.concatenate([_receive(conn, "revenue") for _, conn in workers] or [np.empty(0)])
+        thresholds = abc_thresholds(revenue)
+        for _, conn in workers:
+            conn.send(("thresholds", thresholds))
+
+        # Phase 2: local classification and downstream nodes
+        frames = [_receive(conn, "result") for _, conn in workers]
+    finally:
+        for process, conn in workers:
+            conn.close()
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    frames = [f for f in frames if not f.empty]
+    merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not merged.empty:
+        merged = merged.sort_values([c for c in INVENTORY_KEY if c in merged], kind="stable")
+    state = set_inventory_frame({}, merged)
+    state["abc_thresholds"] = thresholds
+    return purchase_order_node(sourcing_node(state))
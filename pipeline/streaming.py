@@ -0,0 +1,80 @@
+"""Streaming execution for catalogs that do not fit in memory.
+
+The inventory table is read through a server-side cursor in bounded batches,
+and each batch flows through classify -> forecast -> risk -> recommend as a
+generator pipeline. Only catalog-wide outputs are kept:
+
+- the ABC revenue thresholds, computed in the database before streaming;
+- the rows flagged ``should_reorder``;
+- summary counts in ``risk_summary``;
+- the supplier allocation of the reorders, solved once at the end.
+
+Peak memory is governed by the batch size, which is derived from
+``max_memory_mb`` and does not grow with the catalog.
+"""
+import pandas as pd
+
+from agents import config
+from agents.analyze_risk import risk_analyzer_node
+from agents.classify_products import classify_product_node
+from agents.fetch_inventory import fetch_abc_thresholds, iter_inventory_batches
+from agents.forcast_demand import forecast_demand_node
+from agents.purchase_orders import purchase_order_node
+from agents.recommend import recommend_reorder_node
+from agents.rollups import refresh_rollups
+from agents.sourcing import sourcing_node
+from agents.state import get_inventory_frame, set_inventory_frame
+
+BATCH_NODES = (classify_product_node, forecast_demand_node, risk_analyzer_node, recommend_reorder_node)
+
+# Working set per row across the batch nodes, dominated by the forecasting
+# history matrix (4 bytes x history days) and the model state arrays.
+BYTES_PER_ROW_BASE = 2048
+BYTES_PER_HISTORY_DAY = 8
+
+
+def batch_size_for_memory(max_memory_mb: int) -> int:
+    """Largest batch whose working set fits in ``max_memory_mb``."""
+    bytes_per_row = BYTES_PER_ROW_BASE + BYTES_PER_HISTORY_DAY * config.FORECAST_HISTORY_DAYS
+    return max(1, int(max_memory_mb * 2**20 // bytes_per_row))
+
+
+def iter_pipeline_batches(batch_size: int, thresholds: tuple, shard: dict = None):
+    """Yield fully processed inventory batches (all columns) one at a time."""
+    for batch in iter_inventory_batches(batch_size, shard):
+        state = set_inventory_frame({"abc_thresholds": thresholds, "rollups_fresh": True}, batch)
+        for node in BATCH_NODES:
+            state = node(state)
+        yield get_inventory_frame(state)
+
+
+def run_streaming(max_memory_mb: int = None, shard: dict = None, on_batch=None) -> dict:
+    """Stream the whole catalog and return only the reorder list and summary.
+
+    ``on_batch`` is called with every processed batch, e.g. to write results
+    out as they are produced.
+    """
+    max_memory_mb = max_memory_mb or config.STREAM_MAX_MEMORY_MB
+    if config.DEMAND_SOURCE == "rollup":
+        refresh_rollups()
+
+    thresholds = fetch_abc_thresholds(shard)
+    batch_size = batch_size_for_memory(max_memory_mb)
+
+    reorders = []
+    summary = {"products": 0, "at_risk_of_stockout": 0, "should_reorder": 0, "batches": 0, "batch_size": batch_size}
+    for batch in iter_pipeline_batches(batch_size, thresholds, shard):
+        if on_batch is not None:
+            on_batch(batch)
+        summary["batches"] += 1
+        summary["products"] += len(batch)
+        summary["at_risk_of_stockout"] += int(batch["at_risk_of_stockout"].sum())
+        flagged = batch.loc[batch["should_reorder"]]
+        summary["should_reorder"] += len(flagged)
+        reorders.append(flagged)
+
+    reorders = pd.concat(reorders, ignore_index=True) if reorders else pd.DataFrame()
+    state = set_inventory_frame({}, reorders)
+    state["abc_thresholds"] = thresholds
+    state["risk_summary"] = summary
+    return purchase_order_node(sourcing_node(state))
@@ -1,42 +1,177 @@
+import argparse
+import asyncio
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
 from typing import TypedDict
 
+import pandas as pd
+
+from agents.state import get_inventory_frame
+
 # Import all node functions
-from agents.fetch_inventory import fetch_inventory_node
+from agents.fetch_inventory import afetch_inventory_node, fetch_inventory_node
 from agents.classify_products import classify_product_node
-from agents.forcast_demand import forecast_demand_node
+from agents.forcast_demand import aforecast_demand_node, forecast_demand_node
 from agents.analyze_risk import risk_analyzer_node
 from agents.recommend import recommend_reorder_node
+from agents.sourcing import sourcing_node
+from agents.purchase_orders import purchase_order_node
 
 class InventoryState(TypedDict):
-    inventory_data: list
+    inventory_frame: pd.DataFrame  # columnar catalog shared by every node, typed by agents/schema.py
+    inventory_data: list  # lazy records view over inventory_frame
     forecasted_data: list
     risk_summary: dict
+    shard: dict  # optional product_id range / categories / warehouse_ids to fetch
+    abc_thresholds: tuple  # catalog-wide ABC revenue thresholds for sharded runs
+    rollups_fresh: bool  # skip the demand rollup refresh in fetch
+    sourcing_plan: pd.DataFrame  # purchase order lines per (product, warehouse, supplier)
+    sourcing_summary: dict
+    po_run_key: str  # PO numbers are unique per run key (default: order date and a hash of the lines)
+    purchase_order_summary: dict
+
+NODES = (
+    ("fetch_inventory", fetch_inventory_node),
+    ("classify_product", classify_product_node),
+    ("forecast_demand", forecast_demand_node),
+    ("risk_analyzer", risk_analyzer_node),
+    ("recommend_reorder", recommend_reorder_node),
+    ("sourcing", sourcing_node),
+    ("purchase_orders", purchase_order_node),
+)
+
+# Native async versions used by graph.ainvoke; the other nodes are CPU-bound
+# and run in a worker thread so they don't block the event loop
+ASYNC_NODES = {
+    "fetch_inventory": afetch_inventory_node,
+    "forecast_demand": aforecast_demand_node,
+}
+
+def in_thread(node):
+    async def run(state):
+        return await asyncio.to_thread(node, state)
+    return run
 
-builder = StateGraph(InventoryState)
+def build_graph(wrap=None):
+    """Compile the pipeline; ``wrap(name, node)`` may replace each node, e.g. to instrument it.
 
-# Register nodes
-builder.add_node("fetch_inventory", fetch_inventory_node)
-builder.add_node("classify_product", classify_product_node)
-builder.add_node("forecast_demand", forecast_demand_node)
-builder.add_node("risk_analyzer", risk_analyzer_node)
-builder.add_node("recommend_reorder", recommend_reorder_node)
+    ``graph.invoke`` runs the sync nodes and ``graph.ainvoke`` their async counterparts.
+    """
+    builder = StateGraph(InventoryState)
+    wrap = wrap or (lambda name, node: node)
 
-# Wire them together
-builder.set_entry_point("fetch_inventory")
-builder.add_edge("fetch_inventory", "classify_product")
-builder.add_edge("classify_product", "forecast_demand")
-builder.add_edge("forecast_demand", "risk_analyzer")
-builder.add_edge("risk_analyzer", "recommend_reorder")
-builder.set_finish_point("recommend_reorder")
+    # Register nodes
+    for name, node in NODES:
+        node = wrap(name, node)
+        anode = wrap(name, ASYNC_NODES[name]) if name in ASYNC_NODES else in_thread(node)
+        builder.add_node(name, RunnableLambda(node, afunc=anode, name=name))
+
+    # Wire them together
+    builder.set_entry_point(NODES[0][0])
+    for (name, _), (next_name, _) in zip(NODES, NODES[1:]):
+        builder.add_edge(name, next_name)
+    builder.set_finish_point(NODES[-1][0])
+
+    return builder.compile()
 
 # Compile the graph
-graph = builder.compile()
+graph = build_graph()
 
 if __name__ == "__main__":
-    final_state = graph.invoke({})
-    
+    parser = argparse.ArgumentParser(description="Run the supply chain reorder pipeline.")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="run sharded across this many worker processes (0 = single process)")
+    parser.add_argument("--shard-by", choices=["product_id", "category", "warehouse"], default="product_id")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream the catalog in bounded batches, keeping only the reorder list")
+    parser.add_argument("--max-memory-mb", type=int, default=None,
+                        help="memory budget per batch in --stream mode")
+    parser.add_argument("--incremental", action="store_true",
+                        help="recompute only products whose inputs changed since the previous run")
+    parser.add_argument("--metrics-file",
+                        help="write per-node timing, row and memory metrics here in Prometheus text format")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="run every node under cProfile and write <node>.prof / <node>.txt to DIR")
+    parser.add_argument("--watch-alerts", metavar="FILE",
+                        help="follow supply_events and inventory changes, appending stockout alerts "
+                             "to FILE as JSON lines")
+    parser.add_argument("--store-results", action="store_true",
+                        help="persist this run's recommendations in the reorder_recommendations table")
+    parser.add_argument("--export-parquet", metavar="DIR",
+                        help="also write this run's recommendations as Parquet under DIR/run_date=YYYY-MM-DD/")
+    parser.add_argument("--create-purchase-orders", action="store_true",
+                        help="write this run's order lines as purchase orders (same as SUPPLY_CHAIN_PURCHASE_ORDERS=1)")
+    args = parser.parse_args()
+
+    if args.watch_alerts:
+        from pipeline.alerts import JsonlAlertSink, StockoutMonitor
+
+        monitor = StockoutMonitor(JsonlAlertSink(args.watch_alerts))
+        print(f"Watching for changes; alerts are appended to {args.watch_alerts} (Ctrl-C to stop)")
+        try:
+            monitor.run()
+        except KeyboardInterrupt:
+            pass
+        print(f"Processed {monitor.events_processed} events, emitted {monitor.alerts_emitted} alerts")
+        raise SystemExit(0)
+
+    if args.create_purchase_orders:
+        from agents import config
+        config.PURCHASE_ORDERS = True
+
+    instrumentation = None
+    if (args.metrics_file or args.profile) and (args.stream or args.shards or args.incremental):
+        parser.error("--metrics-file and --profile instrument the single-process graph only")
+    if args.metrics_file or args.profile:
+        import logging
+        from pipeline.instrumentation import NodeInstrumentation
+
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        instrumentation = NodeInstrumentation(profile_dir=args.profile)
+        graph = build_graph(instrumentation.wrap)
+
+    if args.incremental:
+        from pipeline.incremental import run_incremental
+        final_state = run_incremental()
+        print(final_state["incremental_summary"])
+    elif args.stream:
+        from pipeline.streaming import run_streaming
+        final_state = run_streaming(args.max_memory_mb)
+    elif args.shards:
+        from pipeline.sharded import run_sharded
+        final_state = run_sharded(args.shards, by=args.shard_by)
+    else:
+        final_state = graph.invoke({})
+
+    if instrumentation is not None and args.metrics_file:
+        instrumentation.write_prometheus(args.metrics_file)
+
+    if args.store_results or args.export_parquet:
+        from pipeline.results_store import export_parquet, write_run
+
+        mode = "incremental" if args.incremental else "stream" if args.stream else "sharded" if args.shards else "full"
+        run_id = write_run(final_state, mode) if args.store_results else None
+        if args.export_parquet:
+            export_parquet(final_state, args.export_parquet, run_id)
+
+    inventory = get_inventory_frame(final_state)
+    if inventory.empty:
+        inventory = pd.DataFrame(columns=["sku", "recommended_reorder_qty", "reorder_reason", "should_reorder"])
+    columns = ["sku", "recommended_reorder_qty", "reorder_reason"]
+    multi_warehouse = "warehouse_id" in inventory and inventory["warehouse_id"].nunique() > 1
+    if multi_warehouse:
+        columns.append("warehouse_id")
+    reorders = inventory.loc[inventory["should_reorder"].astype(bool), columns]
+
     print("=== Recommended Reorders ===")
-    for product in final_state["inventory_data"]:
-        if product.get("should_reorder"):
-            print(f"{product['sku']}: reorder {product['recommended_reorder_qty']} units — {product['reorder_reason']}")
+    for product in reorders.to_dict(orient="records"):
+        location = f" @ warehouse {product['warehouse_id']}" if multi_warehouse else ""
+        print(f"{product['sku']}{location}: reorder {product['recommended_reorder_qty']} units — "
+              f"{product['reorder_reason']}")
+
+    if final_state.get("sourcing_summary"):
+        print("=== Sourcing ===")
+        print(final_state["sourcing_summary"])
+    if final_state.get("purchase_order_summary"):
+        print("=== Purchase Orders ===")
+        print(final_state["purchase_order_summary"])
@@ -46,4 +46,23 @@ def tiny_inventory_records():
 
 @pytest.fixture
 def tiny_state(tiny_inventory_records):
-    return {"inventory_data": tiny_inventory_records}
\ No newline at end of file
+    return {"inventory_data": tiny_inventory_records}
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Point the shared engine at a throwaway SQLite file for DB-backed nodes."""
+    from agents import config, db
+
+    monkeypatch.setattr(config, "DATABASE_URL", f"sqlite:///{tmp_path / 'supply_chain.db'}")
+    db.dispose_engine()
+    db.pool_metrics.reset()
+    yield db.get_engine()
+    db.dispose_engine()
+
+
+@pytest.fixture
+def sqlite_catalog(sqlite_db):
+    from benchmarks.synthetic import populate_catalog
+
+    populate_catalog(sqlite_db, n_products=60, days=60)
+    return sqlite_db
@@ -0,0 +1,52 @@
+"""Query plan regression tests against a real Postgres.
+
+Run with a database created by data/database_setup.py (and ideally populated
+by data/data_generator.py):
+
+    SUPPLY_CHAIN_TEST_DATABASE_URL=postgresql://$USER@localhost:5432/supply_chain_optimizer pytest tests/integration
+"""
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from agents.fetch_inventory import INVENTORY_QUERY, inventory_query_params
+
+TEST_DATABASE_URL = os.getenv("SUPPLY_CHAIN_TEST_DATABASE_URL")
+
+@pytest.fixture(scope="module")
+def pg_conn():
+    if not TEST_DATABASE_URL:
+        pytest.skip("SUPPLY_CHAIN_TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL)
+    try:
+        conn = engine.connect()
+    except OperationalError as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    yield conn
+    conn.close()
+    engine.dispose()
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+def explain(conn, query, params):
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query.text}"), params).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    return list(walk(plan[0]["Plan"]))
+
+def test_inventory_query_has_no_correlated_subplan(pg_conn):
+    nodes = explain(pg_conn, INVENTORY_QUERY, inventory_query_params())
+
+    subplans = [n for n in nodes if n.get("Parent Relationship") == "SubPlan"]
+    assert not subplans, "average_daily_demand must not be computed per product row"
+
+def test_inventory_query_scans_demand_history_once(pg_conn):
+    nodes = explain(pg_conn, INVENTORY_QUERY, inventory_query_params())
+
+    demand_scans = [n for n in nodes if n.get("Relation Name") == "demand_history"]
+    assert len(demand_scans) == 1
@@ -0,0 +1,91 @@
+import queue
+
+import pandas as pd
+from sqlalchemy import text
+
+from pipeline.alerts import StockoutMonitor, plan_catalog
+
+EVENT_COLUMNS = ["event_id", "product_id", "warehouse_id", "event_type", "quantity", "event_date"]
+
+def _insert_events(engine, rows):
+    events = pd.DataFrame(rows, columns=EVENT_COLUMNS[:-1]).assign(event_date=pd.Timestamp("2030-01-01"))
+    events.to_sql("supply_events", engine, index=False, if_exists="append")
+
+def test_monitor_rescores_only_changed_rows_and_alerts(sqlite_catalog):
+    pd.DataFrame(columns=EVENT_COLUMNS).astype({"event_id": int, "product_id": int, "warehouse_id": int,
+                                                "quantity": int}).to_sql("supply_events", sqlite_catalog, index=False)
+    alerts = queue.Queue()
+    monitor = StockoutMonitor(alerts.put)
+    baseline = monitor.frame.copy()
+    assert monitor.poll() == 0 and alerts.empty()
+
+    _insert_events(sqlite_catalog, [
+        (1, 1, 1, "stockout", None),
+        (2, 3, 1, "reorder", 500),
+        (3, 3, 1, "delivery", 200),
+        (4, 99999, 1, "delivery", 10),  # unknown product is skipped
+    ])
+    assert monitor.poll() == 4
+    batch = alerts.get_nowait()
+    assert {a["alert"] for a in batch if a["product_id"] == 1} >= {"stockout", "at_risk"}
+    assert all(a["event_id"] == 1 for a in batch if a["product_id"] == 1)
+
+    row = monitor.frame.set_index("product_id")
+    assert row.loc[1, "current_stock"] == 0
+    assert row.loc[3, "current_stock"] == baseline.set_index("product_id").loc[3, "current_stock"] + 200
+    assert row.loc[3, "on_order"] == 300
+    # Untouched rows keep their planned values
+    others = ~monitor.frame["product_id"].isin([1, 3])
+    pd.testing.assert_frame_equal(monitor.frame.loc[others, baseline.columns], baseline.loc[others])
+
+    with sqlite_catalog.begin() as conn:
+        conn.execute(text("UPDATE inventory SET current_stock = 0, last_updated = '2030-01-01 00:00:00' "
+                          "WHERE product_id = 2"))
+    assert monitor.poll() == 1
+    assert [a["product_id"] for a in alerts.get_nowait() if a["alert"] == "stockout"] == [2]
+
+    # Same numbers as re-planning the catalog from scratch
+    fresh = plan_catalog().set_index("product_id").loc[2]
+    rescored = monitor.frame.set_index("product_id").loc[2]
+    for column in ("available_stock", "days_until_stockout", "at_risk_of_stockout", "should_reorder",
+                   "recommended_reorder_qty"):
+        assert rescored[column] == fresh[column]
+
+def test_late_commits_below_the_watermarks_are_applied_once(sqlite_catalog):
+    pd.DataFrame(columns=EVENT_COLUMNS).astype({"event_id": int, "product_id": int, "warehouse_id": int,
+                                                "quantity": int}).to_sql("supply_events", sqlite_catalog, index=False)
+    alerts = queue.Queue()
+    monitor = StockoutMonitor(alerts.put, lag=30)
+
+    # Events 1 and 3 are visible, 2 commits later
+    _insert_events(sqlite_catalog, [(1, 4, 1, "reorder", 100), (3, 4, 1, "reorder", 10)])
+    with sqlite_catalog.begin() as conn:
+        conn.execute(text("UPDATE inventory SET current_stock = 1000, last_updated = '2030-01-01 00:00:10' "
+                          "WHERE product_id = 5"))
+    assert monitor.poll() == 3
+    assert list(monitor.open_gaps) == [2]
+    while not alerts.empty():
+        alerts.get_nowait()
+
+    _insert_events(sqlite_catalog, [(2, 1, 1, "stockout", None)])
+    # Started before the update seen above, committed after it
+    with sqlite_catalog.begin() as conn:
+        conn.execute(text("UPDATE inventory SET current_stock = 0, last_updated = '2030-01-01 00:00:05' "
+                          "WHERE product_id = 2"))
+    assert monitor.poll() == 2
+    stockouts = [a["product_id"] for a in alerts.get_nowait() if a["alert"] == "stockout"]
+    assert sorted(stockouts) == [1, 2] and not monitor.open_gaps
+
+    # The overlap re-reads both inventory rows, but neither is applied twice
+    assert monitor.poll() == 0 and alerts.empty()
+    assert monitor.frame.set_index("product_id").loc[4, "on_order"] == 110
+
+def test_gaps_are_given_up_after_the_lag(sqlite_catalog):
+    pd.DataFrame(columns=EVENT_COLUMNS).astype({"event_id": int, "product_id": int, "warehouse_id": int,
+                                                "quantity": int}).to_sql("supply_events", sqlite_catalog, index=False)
+    monitor = StockoutMonitor(lambda alerts: None, lag=0)
+    _insert_events(sqlite_catalog, [(5, 4, 1, "reorder", 10)])
+    assert monitor.poll() == 1 and len(monitor.open_gaps) == 4
+    _insert_events(sqlite_catalog, [(2, 4, 1, "reorder", 10)])
+    # A rolled-back insert never shows up; with no lag allowed the gap is dropped right away
+    assert monitor.poll() == 0 and not monitor.open_gaps
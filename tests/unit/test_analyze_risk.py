@@ -0,0 +1,33 @@
+import math
+
+import numpy as np
+
+from agents.analyze_risk import risk_analyzer_node, compute_risk_metrics
+from agents.state import get_inventory_frame
+
+def test_risk_metrics_on_tiny_state(tiny_state):
+    out = risk_analyzer_node(tiny_state)
+    rows = list(out["inventory_data"])
+
+    assert rows[0]["at_risk_of_stockout"] == False
+    assert rows[0]["days_until_stockout"] == 14.0
+    assert rows[0]["expected_consumption_during_lead_time"] == 70.0
+
+    assert rows[1]["at_risk_of_stockout"] == True
+    assert rows[1]["days_until_stockout"] == 3.33
+    assert rows[1]["expected_consumption_during_lead_time"] == 60.0
+
+    # Zero demand branch
+    assert rows[2]["at_risk_of_stockout"] == False
+    assert math.isnan(rows[2]["days_until_stockout"])
+    assert rows[2]["expected_consumption_during_lead_time"] == 0
+
+def test_forecast_fallback_and_float32(tiny_state):
+    df = get_inventory_frame(tiny_state)
+    df.loc[0, "average_daily_demand"] = None  # falls back to 150 / 30
+
+    metrics = compute_risk_metrics(df, dtype=np.float32)
+
+    assert metrics["days_until_stockout"].dtype == np.float32
+    assert metrics.loc[0, "days_until_stockout"] == np.float32(14.0)
+    assert metrics.loc[0, "expected_consumption_during_lead_time"] == np.float32(70.0)
@@ -0,0 +1,38 @@
+import asyncio
+
+import pandas as pd
+
+from agents import db
+from agents.fetch_inventory import afetch_inventory_node, fetch_inventory_node
+import supply_chain_graph
+
+def run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await db.dispose_async_engine()
+    return asyncio.run(main())
+
+def test_async_fetch_matches_sync_query(sqlite_catalog):
+    sync = fetch_inventory_node({})["inventory_frame"]
+    out = run(afetch_inventory_node({}))["inventory_frame"]
+    pd.testing.assert_frame_equal(out, sync)
+
+def test_ainvoke_serves_concurrent_requests(sqlite_catalog):
+    full = supply_chain_graph.graph.invoke({})["inventory_frame"]
+    shards = [{"min_product_id": 1, "max_product_id": 30}, {"min_product_id": 31, "max_product_id": 60}]
+
+    async def both():
+        return await asyncio.gather(*(supply_chain_graph.graph.ainvoke({"shard": s}) for s in shards))
+
+    states = run(both())
+    first, second = (s["inventory_frame"].sort_values("product_id", ignore_index=True) for s in states)
+    full = full.sort_values("product_id", ignore_index=True)
+    assert first["product_id"].tolist() == list(range(1, 31))
+    assert second["product_id"].tolist() == list(range(31, 61))
+
+    # Shards classify against their own revenue; every other output matches the full run
+    columns = ["forecasted_demand_30d", "forecast_method", "days_until_stockout", "recommended_reorder_qty"]
+    merged = pd.concat([first, second], ignore_index=True)
+    pd.testing.assert_frame_equal(merged[columns], full[columns])
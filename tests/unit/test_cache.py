@@ -0,0 +1,41 @@
+import pandas as pd
+from sqlalchemy import text
+
+from pipeline.cache import ResultCache
+import supply_chain_graph
+
+def test_graph_results_cached_until_data_changes(sqlite_catalog, tmp_path):
+    cache = ResultCache(disk_dir=tmp_path / "cache")
+    first = cache.invoke(supply_chain_graph.graph)
+    second = cache.invoke(supply_chain_graph.graph)
+    assert (cache.misses, cache.hits) == (1, 1)
+    pd.testing.assert_frame_equal(second["inventory_frame"], first["inventory_frame"])
+
+    # A fresh process starts warm from the Parquet tier
+    warm = ResultCache(disk_dir=tmp_path / "cache")
+    from_disk = warm.invoke(supply_chain_graph.graph)
+    assert warm.disk_hits == 1
+    pd.testing.assert_frame_equal(from_disk["inventory_frame"], first["inventory_frame"], check_dtype=False)
+
+    with sqlite_catalog.begin() as conn:
+        conn.execute(text("UPDATE inventory SET current_stock = 0, last_updated = '2030-01-01 00:00:00' "
+                          "WHERE product_id = 1"))
+    changed = cache.invoke(supply_chain_graph.graph)
+    assert cache.misses == 2
+    stock = changed["inventory_frame"].set_index("product_id")["current_stock"]
+    assert stock[1] == 0
+
+def test_node_cache_and_size_eviction(sqlite_catalog):
+    cache = ResultCache()
+    graph = supply_chain_graph.build_graph(cache.wrap)
+    plain = supply_chain_graph.graph.invoke({})["inventory_frame"]
+
+    graph.invoke({})
+    out = graph.invoke({})["inventory_frame"]
+    assert cache.hits == 2  # fetch_inventory and forecast_demand
+    pd.testing.assert_frame_equal(out, plain)
+
+    tiny = ResultCache(max_mb=0)
+    tiny.invoke(supply_chain_graph.graph)
+    tiny.invoke(supply_chain_graph.graph)
+    assert tiny.hits == 0 and tiny.misses == 2
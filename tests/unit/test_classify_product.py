@@ -1,4 +1,9 @@
+import numpy as np
+import pandas as pd
+
+from agents import config
 from agents.classify_products import classify_product_node
+from agents.state import get_inventory_frame
 
 def test_classify_adds_fields(tiny_state):
     out = classify_product_node(tiny_state)
@@ -10,4 +15,28 @@ def test_classify_adds_fields(tiny_state):
     assert row["computed_operational_risk"] is not None
 
     assert row["computed_financial_class"] in ["A", "B", "C"]
-    assert row["computed_operational_risk"] in ["A", "B", "C"]
\ No newline at end of file
+    assert row["computed_operational_risk"] in ["A", "B", "C"]
+
+def test_classification_keeps_row_order_and_adds_xyz(monkeypatch):
+    monkeypatch.setattr(config, "CLASSIFICATION_CRITERIA", ("abc", "xyz"))
+    df = pd.DataFrame({
+        "product_id": [4, 1, 3, 2, 5],
+        "average_daily_demand": [1.0, 10.0, 5.0, 2.0, 0.0],
+        "recent_demand_variance": [0.04, 100.0, 9.0, 16.0, 0.0],
+        "unit_cost": [1.0, 10.0, 4.0, 2.0, 3.0],
+        "average_lead_time_days": [20, 5, 5, 20, None],
+        "shelf_life_days": [10, 365, 10, 365, 365],
+    })
+    out = get_inventory_frame(classify_product_node({"inventory_frame": df}))
+
+    assert out["product_id"].tolist() == [4, 1, 3, 2, 5]
+    # Running revenue shares 0.8, 0.96, ...: nothing fits in A, product 1 alone in B
+    assert out["computed_financial_class"].tolist() == ["C", "B", "C", "C", "C"]
+    assert out["computed_operational_risk"].tolist() == ["A", "C", "B", "B", "C"]
+    # cv = sqrt(variance) / mean: 0.2, 1.0, 0.6, 2.0 and no demand
+    assert out["computed_variability_class"].tolist() == ["X", "Y", "Y", "Z", "Z"]
+    assert out["computed_abc_xyz_class"].tolist()[3] == "CZ"
+    assert np.array_equal(
+        out["computed_abc_xyz_class"].astype(str),
+        out["computed_financial_class"].astype(str) + out["computed_variability_class"].astype(str),
+    )
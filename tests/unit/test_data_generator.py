@@ -0,0 +1,66 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from data.data_generator import DataPopulator
+
+class RecordingConnection:
+    """psycopg2 stand-in for bulk_populate: keeps what is COPYed and serves generated ids.
+
+    Like a real planner, it returns the rows of a query without ORDER BY in
+    no particular order.
+    """
+    def __init__(self):
+        self.copied = {}
+        self.rows = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        match = re.match(r"SELECT (\w+)_id FROM (\w+)", sql)
+        if not match:
+            return
+        n = params[0] if params else len(self.copied.get(match.group(2), ""))
+        ids = np.arange(1, n + 1)
+        if "ORDER BY" not in sql:
+            ids = np.random.default_rng().permutation(ids)
+        self.rows = [(int(i),) for i in ids]
+
+    def executemany(self, sql, rows):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+    def copy_expert(self, sql, buffer):
+        table = re.match(r"COPY (\w+)", sql).group(1)
+        self.copied[table] = self.copied.get(table, []) + buffer.read().splitlines()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def _bulk_load(seed):
+    conn = RecordingConnection()
+    populator = DataPopulator(seed=seed)
+    populator.get_connection = lambda: conn
+    populator.bulk_populate(n_products=50, n_suppliers=8, days=30, batch_products=20, n_warehouses=2)
+    return conn.copied
+
+def test_bulk_populate_row_counts_and_seed():
+    copied = _bulk_load(seed=7)
+
+    assert len(copied["products"]) == 50 and len(copied["suppliers"]) == 8
+    assert len(copied["inventory"]) == 50 * 2
+    assert len(copied["demand_history"]) == 50 * 2 * 30
+    links = pd.Series([line.split(",")[:2] for line in copied["product_suppliers"]])
+    per_product = links.str[0].value_counts()
+    assert len(per_product) == 50 and per_product.between(1, 3).all()
+
+    # Same seed, same dataset; suppliers are linked by id, not by the order the database returns them
+    assert _bulk_load(seed=7) == copied
+    assert _bulk_load(seed=8)["product_suppliers"] != copied["product_suppliers"]
@@ -0,0 +1,17 @@
+from sqlalchemy import text
+
+from agents import db
+
+def test_engine_is_shared_and_metered(sqlite_db):
+    assert db.get_engine() is sqlite_db
+
+    for _ in range(3):
+        with db.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    assert db.pool_metrics.checkouts == 3
+    assert db.pool_metrics.checkins == 3
+
+    metrics = db.render_pool_metrics()
+    assert "supply_chain_db_pool_checkouts_total 3" in metrics
+    assert "# TYPE supply_chain_db_pool_checkout_wait_seconds_total counter" in metrics
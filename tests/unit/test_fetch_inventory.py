@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from agents import config
+from agents.fetch_inventory import fetch_inventory_node
+from agents.forcast_demand import forecast_demand_node
+
+def load_tables(engine, records):
+    frame = pd.DataFrame(records)
+    frame.assign(category="Food", selling_price=frame["unit_cost"] * 2)[
+        ["product_id", "sku", "name", "category", "unit_cost", "selling_price", "shelf_life_days",
+         "financial_classification", "operational_risk"]
+    ].to_sql("products", engine, index=False)
+    frame[["product_id", "current_stock", "committed_stock", "reorder_point", "last_stockout_date"]].assign(
+        warehouse_id=1).to_sql("inventory", engine, index=False)
+    frame[["product_id", "supplier_id", "average_lead_time_days", "lead_time_std_dev", "unit_cost"]].assign(
+        is_primary=True, worst_case_lead_time=30).to_sql("product_suppliers", engine, index=False)
+    frame[["supplier_id", "reliability_score"]].to_sql("suppliers", engine, index=False)
+
+    today = date.today()
+    pd.DataFrame({
+        "product_id": [1, 1, 2, 2],
+        "warehouse_id": 1,
+        "date": [today, today - timedelta(days=3), today - timedelta(days=1), today - timedelta(days=60)],
+        "actual_demand": [4, 6, 3, 50],
+    }).to_sql("demand_history", engine, index=False)
+
+def test_fetch_aggregates_recent_demand_once(tiny_inventory_records, sqlite_db, monkeypatch):
+    monkeypatch.setattr(config, "FORECAST_METHOD", "rolling_sum")
+    load_tables(sqlite_db, tiny_inventory_records)
+
+    out = fetch_inventory_node({})
+    df = out["inventory_frame"]
+
+    assert df["product_id"].tolist() == [1, 2, 3]
+    assert df["available_stock"].tolist() == [70, 10, 300]
+    assert df["average_daily_demand"].tolist()[:2] == [5.0, 3.0]
+    assert pd.isna(df["average_daily_demand"].iloc[2])
+
+    # The forecast node reuses the aggregate instead of querying again
+    out = forecast_demand_node(out)
+    assert out["inventory_frame"]["forecasted_demand_30d"].tolist() == [10, 3, 0]
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from agents import config
+from agents.forcast_demand import attach_forecast
+from agents.state import get_inventory_frame
+
+def test_attach_forecast_joins_by_product_id(tiny_state):
+    inventory = get_inventory_frame(tiny_state)
+    forecast = pd.DataFrame({"product_id": [3, 1], "forecasted_demand_30d": [12, 150]})
+
+    out = attach_forecast(inventory, forecast)
+
+    # Row order is kept and products without demand default to 0
+    assert out["product_id"].tolist() == [1, 2, 3]
+    assert out["forecasted_demand_30d"].tolist() == [150, 0, 12]
+    assert len(out.columns) == len(inventory.columns)
+
+def test_forecast_node_aggregates_in_sql(tiny_state, sqlite_db, monkeypatch):
+    monkeypatch.setattr(config, "FORECAST_METHOD", "rolling_sum")
+    from datetime import date, timedelta
+    from agents.forcast_demand import forecast_demand_node
+
+    today = date.today()
+    history = pd.DataFrame({
+        "product_id": [1, 1, 2, 2],
+        "warehouse_id": 1,
+        "date": [today, today - timedelta(days=1), today, today - timedelta(days=45)],
+        "actual_demand": [4, 6, 7, 100],
+    })
+    history.to_sql("demand_history", sqlite_db, index=False)
+
+    out = forecast_demand_node(tiny_state)
+
+    assert out["inventory_frame"]["forecasted_demand_30d"].tolist() == [10, 7, 0]
@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from agents import config
+from agents.forecasting import forecast_demand
+from agents.forcast_demand import forecast_demand_node
+
+def test_batched_models_pick_method_per_sku():
+    rng = np.random.default_rng(7)
+    weekly = np.tile([10, 10, 10, 10, 10, 30, 30], 26)  # busy weekends
+    smooth = rng.poisson(weekly, size=(50, weekly.size))
+    sparse = rng.poisson(40, size=(50, weekly.size)) * (rng.random((50, weekly.size)) < 0.1)
+    Y = np.vstack([smooth, sparse, np.zeros((1, weekly.size))]).astype(np.float32)
+
+    out = forecast_demand(Y, first_weekday=0)
+
+    assert out["forecast_method"].tolist() == ["holt_winters"] * 50 + ["croston_sba"] * 50 + ["no_history"]
+    # 182 days of history, so the horizon starts on a Monday: 4 weeks + Mon/Tue
+    assert np.allclose(out["forecasted_demand_30d"][:50].mean(), 4 * 110 + 20, rtol=0.03)
+    assert np.allclose(out["forecasted_demand_30d"][50:100].mean(), 30 * 4, rtol=0.15)
+    assert (out["forecast_variance_30d"][:100] > 0).all()
+    assert out.iloc[-1]["forecasted_demand_30d"] == 0
+
+def test_variability_ignores_days_before_launch():
+    launched = np.r_[np.zeros(60), np.full(30, 10.0)]
+    sparse_launch = np.r_[np.zeros(60), np.tile([12.0, 0, 0], 10)]
+    out = forecast_demand(np.vstack([launched, sparse_launch]).astype(np.float32))
+
+    assert out["forecast_method"].tolist() == ["holt_winters", "croston_sba"]
+    # A steady seller is steady, however long the window before its first sale
+    assert out.loc[0, "demand_std_dev"] == 0
+    selling = sparse_launch[60:]
+    assert np.isclose(out.loc[1, "demand_std_dev"], selling.std(ddof=1))
+    assert np.isclose(out.loc[1, "forecast_variance_30d"], selling.var(ddof=1) * 30)
+
+def test_forecast_node_writes_model_outputs(tiny_state, sqlite_db, monkeypatch):
+    monkeypatch.setattr(config, "FORECAST_METHOD", "model")
+    yesterday = date.today() - timedelta(days=1)
+    days = [yesterday - timedelta(days=i) for i in range(120)]
+    pd.DataFrame({
+        "product_id": [1] * 120 + [2] * 120,
+        "date": days * 2,
+        "actual_demand": [5] * 120 + [3] * 120,
+    }).to_sql("demand_history", sqlite_db, index=False)
+
+    df = forecast_demand_node(tiny_state)["inventory_frame"]
+
+    assert df["forecasted_demand_30d"].tolist() == [150, 90, 0]
+    assert {"forecast_variance_30d", "demand_std_dev", "forecast_method"} <= set(df.columns)
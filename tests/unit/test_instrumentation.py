@@ -0,0 +1,30 @@
+import pandas as pd
+
+from pipeline.instrumentation import NodeInstrumentation
+import supply_chain_graph
+
+def test_instrumented_graph_records_every_node(sqlite_catalog, tmp_path):
+    plain = supply_chain_graph.graph.invoke({})["inventory_frame"]
+
+    instrumentation = NodeInstrumentation(profile_dir=tmp_path / "profile", log=False)
+    graph = supply_chain_graph.build_graph(instrumentation.wrap)
+    out = graph.invoke({})["inventory_frame"]
+    pd.testing.assert_frame_equal(out, plain)
+
+    summary = instrumentation.summary()
+    assert list(summary) == [name for name, _ in supply_chain_graph.NODES]
+    assert summary["fetch_inventory"]["rows_in"] == 0
+    assert summary["fetch_inventory"]["rows_out"] == len(plain)
+    assert summary["fetch_inventory"]["sql_statements"] >= 1
+    assert summary["fetch_inventory"]["sql_seconds"] > 0
+    assert summary["risk_analyzer"]["sql_statements"] == 0
+    assert all(t["calls"] == 1 and t["wall_seconds"] > 0 for t in summary.values())
+
+    assert (tmp_path / "profile" / "forecast_demand.prof").exists()
+    assert "function calls" in (tmp_path / "profile" / "forecast_demand.txt").read_text()
+
+    metrics_file = tmp_path / "nodes.prom"
+    instrumentation.write_prometheus(metrics_file)
+    metrics = metrics_file.read_text()
+    assert '# TYPE supply_chain_node_wall_seconds_total counter' in metrics
+    assert f'supply_chain_node_rows_out{{node="recommend_reorder"}} {len(plain)}' in metrics
@@ -0,0 +1,75 @@
+from datetime import date
+
+import pandas as pd
+
+from agents import config
+from agents.purchase_orders import purchase_order_node
+from agents.sourcing import PLAN_COLUMNS
+
+def _plan(n_lines):
+    i = pd.RangeIndex(n_lines)
+    return pd.DataFrame({
+        "product_id": i + 1,
+        "warehouse_id": i % 3 + 1,
+        "supplier_id": i % 50 + 1,
+        "order_qty": i % 7 + 1,
+        "unit_cost": 2.5,
+        "landed_unit_cost": 2.6,
+        "average_lead_time_days": (i % 50 + 1) / 2,
+        "reliability_score": 0.9,
+        "order_cost": 0.0,
+    })[PLAN_COLUMNS]
+
+def _count(engine, table):
+    return pd.read_sql(f"SELECT COUNT(*) AS n FROM {table}", engine)["n"].iloc[0]
+
+def test_purchase_orders_grouped_per_supplier_and_idempotent(sqlite_db, monkeypatch):
+    monkeypatch.setattr(config, "PURCHASE_ORDERS", True)
+    plan = _plan(50_000)
+    state = purchase_order_node({"sourcing_plan": plan, "po_run_key": "run1"})
+
+    assert state["purchase_order_summary"]["purchase_orders"] == 150  # 50 suppliers x 3 warehouses
+    assert state["purchase_order_summary"]["order_lines"] == 50_000
+    orders = pd.read_sql("SELECT * FROM purchase_orders", sqlite_db).set_index("po_number")
+    items = pd.read_sql("SELECT * FROM order_items", sqlite_db)
+    assert len(items) == 50_000 and items["quantity_ordered"].sum() == plan["order_qty"].sum()
+
+    order = orders.loc["PO-run1-S3-W1"]
+    assert order["supplier_id"] == 3 and order["status"] == "pending"
+    # Lead time 1.5 days rounds up
+    assert pd.Timestamp(order["expected_delivery_date"]) - pd.Timestamp(order["order_date"]) == pd.Timedelta(days=2)
+    lines = plan.loc[(plan["supplier_id"] == 3) & (plan["warehouse_id"] == 1)]
+    assert order["total_cost"] == (lines["order_qty"] * lines["unit_cost"]).sum()
+    assert set(items.loc[items["po_id"] == order["po_id"], "product_id"]) == set(lines["product_id"])
+
+    # Re-running the same run writes nothing
+    rerun = purchase_order_node({"sourcing_plan": plan, "po_run_key": "run1"})
+    assert rerun["purchase_order_summary"]["purchase_orders"] == 0
+    assert rerun["purchase_order_summary"]["existing_orders"] == 150
+    assert rerun["purchase_order_summary"]["skipped_lines"] == 50_000
+    assert _count(sqlite_db, "purchase_orders") == 150 and _count(sqlite_db, "order_items") == 50_000
+
+def test_purchase_orders_disabled_or_empty(sqlite_db, monkeypatch):
+    assert "purchase_order_summary" not in purchase_order_node({"sourcing_plan": _plan(3)})
+    monkeypatch.setattr(config, "PURCHASE_ORDERS", True)
+    state = purchase_order_node({"sourcing_plan": pd.DataFrame(columns=PLAN_COLUMNS)})
+    assert state["purchase_order_summary"]["purchase_orders"] == 0
+
+def test_runs_without_key_are_keyed_by_their_lines(sqlite_db, monkeypatch, caplog):
+    monkeypatch.setattr(config, "PURCHASE_ORDERS", True)
+    first = purchase_order_node({"sourcing_plan": _plan(10)})
+    assert first["po_run_key"].startswith(f"{date.today():%Y%m%d}-")
+
+    # A retried run with the same lines, in any order, writes nothing and reports the skipped lines
+    again = purchase_order_node({"sourcing_plan": _plan(10).iloc[::-1]})
+    assert again["po_run_key"] == first["po_run_key"]
+    assert again["purchase_order_summary"]["skipped_lines"] == 10
+    assert "10 lines not written" in caplog.text
+    assert _count(sqlite_db, "purchase_orders") == 10
+
+    # Different lines the same day get orders of their own
+    plan = _plan(10).assign(order_qty=lambda p: p["order_qty"] + 1)
+    other = purchase_order_node({"sourcing_plan": plan})
+    assert other["po_run_key"] != first["po_run_key"]
+    assert other["purchase_order_summary"]["order_lines"] == 10
+    assert _count(sqlite_db, "purchase_orders") == 20
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from agents import config
+from agents.fetch_inventory import fetch_inventory_node
+from agents.forcast_demand import forecast_demand_node
+from agents.recommend import recommend_reorder_node, compute_reorder
+from agents.policies import REORDER_POLICIES
+from agents.state import get_inventory_frame
+
+def test_heuristic_matches_previous_rules(tiny_state):
+    rows = list(recommend_reorder_node(tiny_state)["inventory_data"])
+
+    # 70 units < 5/day * (14 + 3) days -> cover 30 days
+    assert rows[0]["should_reorder"] == True
+    assert rows[0]["recommended_reorder_qty"] == 80
+    assert rows[0]["reorder_reason"] == "Stockout risk within lead time"
+
+    assert rows[1]["recommended_reorder_qty"] == 80
+    assert rows[2]["should_reorder"] == False
+    assert rows[2]["reorder_reason"] == "No demand"
+
+@pytest.mark.parametrize("policy", sorted(REORDER_POLICIES))
+def test_every_policy_is_a_vector_kernel(tiny_state, policy):
+    # fetch_inventory always provides the recent variance
+    frame = get_inventory_frame(tiny_state).assign(recent_demand_variance=4.0)
+    out = compute_reorder(frame, policy=policy, policy_by=None, policy_params={})
+
+    assert len(out) == 3
+    assert out.loc[2, "reorder_reason"] == "No demand"
+    assert (out["recommended_reorder_qty"] >= 0).all()
+    assert not out.loc[~out["should_reorder"], "recommended_reorder_qty"].any()
+
+def test_policy_selected_per_class(tiny_state):
+    out = compute_reorder(
+        get_inventory_frame(tiny_state),
+        policy="heuristic",
+        policy_by="operational_risk",
+        policy_map={"A": "sQ"},
+        policy_params={"sQ": {"order_cycle_days": 10}},
+    )
+
+    # SKU-B (operational risk A) is at 10 units against a reorder point of 15
+    assert out.loc[1, "reorder_reason"] == "Stock at or below reorder point"
+    assert out.loc[1, "recommended_reorder_qty"] == 30
+    assert out.loc[0, "reorder_reason"] == "Stockout risk within lead time"
+
+def test_service_level_without_model_forecast(sqlite_catalog, monkeypatch):
+    monkeypatch.setattr(config, "FORECAST_METHOD", "rolling_sum")
+    frame = get_inventory_frame(forecast_demand_node(fetch_inventory_node({})))
+    assert "demand_std_dev" not in frame
+
+    out = compute_reorder(frame, policy="service_level", policy_by=None, policy_params={})
+    # Same as a forecast whose demand spread is the recent one
+    std = np.sqrt(frame["recent_demand_variance"].fillna(0).clip(lower=0))
+    expected = compute_reorder(frame.assign(demand_std_dev=std), policy="service_level", policy_by=None,
+                               policy_params={})
+    assert out["recommended_reorder_qty"].tolist() == expected["recommended_reorder_qty"].tolist()
+    assert out["recommended_reorder_qty"].sum() > compute_reorder(
+        frame.assign(demand_std_dev=0.0), policy="service_level", policy_by=None, policy_params={}
+    )["recommended_reorder_qty"].sum()
+
+    with pytest.raises(ValueError, match="demand_std_dev or recent_demand_variance"):
+        compute_reorder(frame.drop(columns="recent_demand_variance"), policy="service_level", policy_by=None,
+                        policy_params={})
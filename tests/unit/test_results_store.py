@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from pipeline.results_store import export_parquet, latest_recommendations, list_runs, run_diff, run_results, write_run
+import supply_chain_graph
+
+def test_runs_are_stored_and_queried_without_rerunning(sqlite_catalog, tmp_path):
+    first = supply_chain_graph.graph.invoke({})
+    first_id = write_run(first)
+    stored = run_results(first_id)
+    frame = first["inventory_frame"]
+    assert len(stored) == len(frame)
+    assert stored["recommended_reorder_qty"].tolist() == frame["recommended_reorder_qty"].tolist()
+    assert stored["stockout_probability"].isna().all()
+
+    with sqlite_catalog.begin() as conn:
+        conn.execute(text("UPDATE inventory SET current_stock = 0 WHERE product_id = 5"))
+    second = supply_chain_graph.graph.invoke({})
+    second_id = write_run(second, mode="full")
+    # A partial run (e.g. streamed reorders only) still leaves every SKU's newest row queryable
+    third_id = write_run({"inventory_frame": second["inventory_frame"].query("product_id == 7")}, mode="stream")
+    assert list_runs()["run_id"].tolist() == [third_id, second_id, first_id]
+
+    latest = latest_recommendations().set_index("product_id")
+    assert len(latest) == len(frame)
+    assert latest.loc[7, "run_id"] == third_id and latest.loc[1, "run_id"] == second_id
+    assert latest_recommendations([5])["available_stock"].tolist() == [
+        second["inventory_frame"].set_index("product_id").loc[5, "available_stock"]]
+
+    diff = run_diff(second_id, first_id)
+    assert 5 in diff["product_id"].tolist()
+    assert set(diff["change"]) == {"changed"}
+    assert (run_diff(third_id, second_id)["change"] == "removed").sum() == len(frame) - 1
+
+    path = export_parquet(second, tmp_path, second_id)
+    assert path.parent.name.startswith("run_date=")
+    pd.testing.assert_series_equal(pd.read_parquet(path)["sku"], stored["sku"], check_dtype=False)
+
+def test_latest_reads_from_the_last_full_run_on(sqlite_catalog):
+    state = supply_chain_graph.graph.invoke({})
+    frame = state["inventory_frame"]
+    retired = frame.head(1).assign(product_id=999)
+    write_run({"inventory_frame": retired}, mode="stream", run_at=datetime(2025, 1, 1))
+    full_id = write_run(state, run_at=datetime(2025, 1, 2))
+    partial_id = write_run({"inventory_frame": frame.query("product_id == 7")}, mode="incremental",
+                           run_at=datetime(2025, 1, 3))
+
+    # Rows stored before the last full run (here a location it no longer plans) are not read
+    latest = latest_recommendations().set_index("product_id")
+    assert 999 not in latest.index and len(latest) == len(frame)
+    assert latest.loc[7, "run_id"] == partial_id and latest.loc[1, "run_id"] == full_id
@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from agents import config, rollups
+
+def create_tables(engine):
+    columns = ", ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in rollups.ROLLUP_COLUMNS)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE demand_history (
+                product_id INTEGER, warehouse_id INTEGER, date DATE, actual_demand INTEGER, created_at TIMESTAMP
+            )
+        """))
+        conn.execute(text(f"CREATE TABLE demand_rollups (product_id INTEGER, warehouse_id INTEGER, {columns}, "
+                          "refreshed_at TIMESTAMP, PRIMARY KEY (product_id, warehouse_id))"))
+        conn.execute(text("""
+            CREATE TABLE rollup_watermarks (rollup_name TEXT PRIMARY KEY, as_of_date DATE, last_created_at TIMESTAMP)
+        """))
+        conn.execute(text("""
+            CREATE TABLE rollup_recent_rows (
+                rollup_name TEXT, product_id INTEGER, warehouse_id INTEGER, date DATE, created_at TIMESTAMP,
+                PRIMARY KEY (rollup_name, product_id, warehouse_id, date)
+            )
+        """))
+
+def insert_history(engine, start, days, created_at, seed):
+    rng = np.random.default_rng(seed)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    pd.DataFrame({
+        "product_id": np.repeat([1, 2, 3], days),
+        "warehouse_id": 1,
+        "date": dates * 3,
+        "actual_demand": rng.integers(0, 20, days * 3),
+        "created_at": created_at,
+    }).to_sql("demand_history", engine, index=False, if_exists="append")
+
+def test_incremental_refresh_matches_full_aggregate(sqlite_db):
+    create_tables(sqlite_db)
+    as_of = date(2025, 6, 30)
+    insert_history(sqlite_db, as_of - timedelta(days=119), 120, datetime(2025, 6, 30, 23), seed=1)
+
+    assert rollups.backfill_rollups(as_of)["products"] == 3
+    assert rollups.verify_rollups().empty
+
+    # Three more days of demand arrive; the windows slide forward
+    insert_history(sqlite_db, as_of + timedelta(days=1), 3, datetime(2025, 7, 3, 23), seed=2)
+    result = rollups.refresh_rollups(as_of + timedelta(days=3))
+
+    assert result["mode"] == "refresh"
+    assert rollups.verify_rollups().empty
+
+    stats = rollups.load_demand_rollups().set_index("product_id")
+    with sqlite_db.connect() as conn:
+        raw = pd.read_sql(text("SELECT * FROM demand_history WHERE product_id = 1"), conn)
+    last_30 = raw.loc[pd.to_datetime(raw["date"]) >= pd.Timestamp(as_of + timedelta(days=3 - 30)), "actual_demand"]
+
+    assert stats.loc[1, "demand_sum_30d"] == last_30.sum()
+    assert stats.loc[1, "demand_count_30d"] == 31
+    assert np.isclose(stats.loc[1, "demand_var_30d"], last_30.var())
+
+def test_late_commit_below_the_watermark_is_counted_once(sqlite_db, monkeypatch):
+    monkeypatch.setattr(config, "ROLLUP_LAG", 600)
+    create_tables(sqlite_db)
+    as_of = date(2025, 6, 30)
+    insert_history(sqlite_db, as_of - timedelta(days=29), 30, datetime(2025, 6, 30, 23), seed=1)
+    rollups.backfill_rollups(as_of)
+    insert_history(sqlite_db, as_of + timedelta(days=1), 1, datetime(2025, 7, 1, 23), seed=2)
+    rollups.refresh_rollups(as_of + timedelta(days=1))
+
+    # An insert that started five minutes before the rows just applied commits only now
+    pd.DataFrame({"product_id": [4], "warehouse_id": [1], "date": [as_of + timedelta(days=1)],
+                  "actual_demand": [7], "created_at": [datetime(2025, 7, 1, 22, 55)]}
+                 ).to_sql("demand_history", sqlite_db, index=False, if_exists="append")
+    rollups.refresh_rollups(as_of + timedelta(days=1))
+    # Stamped exactly at the watermark the refreshes above left behind
+    pd.DataFrame({"product_id": [5], "warehouse_id": [1], "date": [as_of + timedelta(days=1)],
+                  "actual_demand": [3], "created_at": [datetime(2025, 7, 1, 22, 50)]}
+                 ).to_sql("demand_history", sqlite_db, index=False, if_exists="append")
+    rollups.refresh_rollups(as_of + timedelta(days=2))
+    rollups.refresh_rollups(as_of + timedelta(days=2))
+
+    assert rollups.verify_rollups().empty
+    stats = rollups.load_demand_rollups().set_index("product_id")
+    assert stats.loc[4, "demand_sum_7d"] == 7 and stats.loc[4, "demand_count_7d"] == 1
+    with sqlite_db.connect() as conn:
+        raw = pd.read_sql(text("SELECT product_id, SUM(actual_demand) AS total FROM demand_history "
+                               "GROUP BY product_id"), conn).set_index("product_id")["total"]
+    assert stats["demand_sum_90d"].to_dict() == raw.to_dict()
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from agents.fetch_inventory import fetch_inventory_node
+from agents.schema import ABC_CLASSES, SchemaError, apply_schema, categorical
+from agents.state import get_inventory_frame
+import supply_chain_graph
+
+def test_fetch_returns_typed_compact_frame(sqlite_catalog):
+    df = get_inventory_frame(fetch_inventory_node({}))
+
+    assert df["product_id"].dtype == "int64"
+    assert df["available_stock"].dtype == "int32"
+    assert list(df["financial_classification"].cat.categories) == ABC_CLASSES
+
+    out = supply_chain_graph.graph.invoke({})["inventory_frame"]
+    assert out["computed_financial_class"].dtype == pd.CategoricalDtype(ABC_CLASSES)
+    assert isinstance(out["reorder_reason"].dtype, pd.CategoricalDtype)
+    # Records still carry plain labels
+    assert out["computed_financial_class"].iloc[0] in ABC_CLASSES
+
+def test_schema_validation_errors():
+    with pytest.raises(SchemaError, match="financial_classification"):
+        apply_schema(pd.DataFrame({"product_id": [1], "financial_classification": ["D"]}))
+    with pytest.raises(SchemaError, match="current_stock"):
+        apply_schema(pd.DataFrame({"product_id": [1], "current_stock": ["lots"]}))
+    with pytest.raises(SchemaError, match="product_id"):
+        apply_schema(pd.DataFrame({"sku": ["X"]}))
+
+    # Nullable integer columns fall back to floats instead of failing
+    typed = apply_schema(pd.DataFrame({"product_id": [1, 2], "shelf_life_days": [30, None]}))
+    assert typed["shelf_life_days"].dtype.kind == "f"
+
+    assert list(categorical(["b", "x"], ["a", "b"]).categories) == ["a", "b", "x"]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from agents.classify_products import abc_thresholds, assign_abc
+from pipeline.sharded import plan_shards, run_sharded
+import supply_chain_graph
+
+def test_two_phase_thresholds_match_global_ranking():
+    revenue = np.random.default_rng(3).lognormal(3, 1, 1000)
+    order = np.argsort(-revenue)
+    share = np.empty_like(revenue)
+    share[order] = np.cumsum(revenue[order]) / revenue.sum()
+    expected = np.where(share <= 0.7, "A", np.where(share <= 0.9, "B", "C"))
+
+    thresholds = abc_thresholds(np.concatenate([revenue[:400], revenue[400:]]))
+
+    assert (assign_abc(revenue[:400], thresholds) == expected[:400]).all()
+    assert (assign_abc(revenue[400:], thresholds) == expected[400:]).all()
+
+def test_sharded_run_matches_single_process(sqlite_catalog):
+    assert len(plan_shards(3)) == 3
+    assert sum(len(s["categories"]) for s in plan_shards(2, by="category")) == 4
+
+    single = supply_chain_graph.graph.invoke({})["inventory_frame"].sort_values("product_id")
+    for by in ("product_id", "category"):
+        sharded = run_sharded(3, by=by, mp_context="fork")["inventory_frame"]
+
+        assert sharded["product_id"].tolist() == single["product_id"].tolist()
+        for column in ("computed_financial_class", "computed_operational_risk", "forecasted_demand_30d",
+                       "should_reorder", "recommended_reorder_qty"):
+            assert sharded[column].tolist() == single[column].tolist(), column
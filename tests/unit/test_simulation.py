@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from agents import config
+from agents.analyze_risk import risk_analyzer_node
+from agents.simulation import SIMULATION_COLUMNS, simulate_stockouts
+from agents.state import get_inventory_frame
+from benchmarks.synthetic import make_inventory_frame
+
+def test_simulated_risk_on_tiny_state(tiny_state, monkeypatch):
+    monkeypatch.setattr(config, "RISK_METHOD", "simulation")
+    monkeypatch.setattr(config, "SIMULATION_SCENARIOS", 20000)
+    df = get_inventory_frame(risk_analyzer_node(tiny_state)).set_index("sku")
+
+    # Stock equal to mean lead-time demand runs out in a good share of scenarios
+    assert 0.3 < df.loc["SKU-A", "stockout_probability"] < 0.8
+    # 10 units against ~60 expected: nearly always short, by about the difference
+    assert df.loc["SKU-B", "stockout_probability"] > 0.95
+    assert 40 < df.loc["SKU-B", "expected_shortfall"] < 80
+    assert df.loc["SKU-B", "fill_rate_p50"] < 0.3
+    assert bool(df.loc["SKU-B", "at_risk_of_stockout"])
+    # No demand: never short, full fill rate
+    assert df.loc["SKU-C", "stockout_probability"] == 0
+    assert (df.loc["SKU-C", ["fill_rate_p5", "fill_rate_mean"]] == 1).all()
+
+    fill = df[["fill_rate_p5", "fill_rate_p50", "fill_rate_p95"]].to_numpy()
+    assert (np.diff(fill, axis=1) >= 0).all()
+
+def test_unreliable_supplier_raises_stockout_probability():
+    df = pd.DataFrame({
+        "product_id": [1, 2], "available_stock": [90, 90], "average_daily_demand": [5.0, 5.0],
+        "average_lead_time_days": [14, 14], "lead_time_std_dev": [2, 2],
+        "worst_case_lead_time": [28, 28], "reliability_score": [1.0, 0.6],
+    })
+    sim = simulate_stockouts(df, n_scenarios=5000)
+    reliable, unreliable = sim["stockout_probability"]
+    assert unreliable > reliable + 0.3
+
+def test_results_independent_of_chunking_order_and_workers():
+    df = make_inventory_frame(300, seed=3)
+    expected = simulate_stockouts(df, n_scenarios=500, max_memory_mb=100)
+
+    shuffled = df.sample(frac=1, random_state=0)
+    chunked = simulate_stockouts(shuffled, n_scenarios=500, max_memory_mb=0.1, workers=2, mp_context="fork")
+
+    assert list(expected.columns) == SIMULATION_COLUMNS
+    pd.testing.assert_frame_equal(chunked.loc[expected.index], expected)
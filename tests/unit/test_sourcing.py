@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from agents import sourcing
+from agents.sourcing import solve_sourcing
+import supply_chain_graph
+
+def options(**columns):
+    frame = pd.DataFrame(columns)
+    defaults = {"average_lead_time_days": 10, "lead_time_std_dev": 0.0, "reliability_score": 1.0,
+                "min_order_qty": 1, "max_order_qty": np.nan, "capacity_units": np.nan}
+    return frame.assign(**{k: v for k, v in defaults.items() if k not in frame})
+
+def test_moq_order_caps_and_supplier_capacity():
+    opts = options(
+        product_id=[1, 1, 2, 2, 3],
+        supplier_id=[10, 11, 10, 12, 12],
+        unit_cost=[10.0, 12.0, 5.0, 6.0, 4.0],
+        min_order_qty=[1, 1, 1, 1, 50],
+        max_order_qty=[60, np.nan, np.nan, np.nan, np.nan],
+        capacity_units=[100, np.nan, 100, 1000, 1000],
+    )
+    demand = pd.DataFrame({"product_id": [1, 2, 3], "qty": [80, 70, 20]})
+
+    plan, info = solve_sourcing(demand, opts, order_cost=0)
+    qty = plan.set_index(["product_id", "supplier_id"])["order_qty"]
+
+    # Supplier 10 can ship 100 in total and at most 60 of product 1 per order
+    assert qty[1, 10] + qty.get((2, 10), 0) <= 100
+    assert qty[1, 10] <= 60 and qty[1, 10] + qty[1, 11] == 80
+    assert plan.groupby("product_id")["order_qty"].sum()[2] == 70
+    # The only supplier of product 3 has an MOQ above the reorder: rounded up
+    assert qty[3, 12] == 50
+    assert info["unsourced"].sum() == 0
+
+def _exact(demand, opts, order_cost):
+    """(cost, unsourced) of the module's MIP over every line at once."""
+    lines = demand[["product_id"]].reset_index(names="row").merge(opts, on="product_id")
+    cost = sourcing.landed_unit_cost(lines)
+    qty = demand["qty"].to_numpy(float)
+    row = lines["row"].to_numpy()
+    moq = lines["min_order_qty"].to_numpy(float)
+    cap = np.minimum(lines["max_order_qty"].fillna(np.inf).to_numpy(float), np.maximum(qty[row], moq))
+    supplier_ids, supplier = np.unique(lines["supplier_id"].to_numpy(), return_inverse=True)
+    capacity = lines.groupby("supplier_id")["capacity_units"].first().reindex(supplier_ids).fillna(np.inf)
+    exact, _ = sourcing._solve_mip(row, cost, moq, cap, qty, supplier, capacity.to_numpy(float),
+                                   order_cost, 1e6, 60, 0)
+    shortfall = np.maximum(0, qty - np.bincount(row, weights=exact, minlength=len(qty))).sum()
+    return (exact * cost).sum() + order_cost * (exact > 0).sum(), shortfall
+
+def _random_options(rng, n, capacity_units):
+    counts = rng.integers(1, 4, n)
+    product_id = np.repeat(np.arange(n), counts)
+    supplier_id = np.concatenate([rng.choice(6, c, replace=False) for c in counts])
+    return options(
+        product_id=product_id,
+        supplier_id=supplier_id,
+        unit_cost=rng.uniform(5, 20, len(product_id)).round(2),
+        min_order_qty=rng.choice([1, 25, 50], len(product_id)),
+        max_order_qty=np.where(rng.random(len(product_id)) < 0.5, np.nan, 80),
+        capacity_units=np.asarray(capacity_units, dtype=float)[supplier_id],
+    )
+
+def test_batched_solve_matches_exact_mip():
+    rng = np.random.default_rng(7)
+    n = 40
+    opts = _random_options(rng, n, np.full(6, np.nan))
+    demand = pd.DataFrame({"product_id": np.arange(n), "qty": rng.integers(10, 200, n)})
+
+    plan, info = solve_sourcing(demand, opts, order_cost=25)
+
+    want, shortfall = _exact(demand, opts, 25)
+    got = (plan["order_qty"] * plan["landed_unit_cost"]).sum() + 25 * len(plan)
+    assert info["unsourced"].sum() == shortfall
+    assert np.isclose(got, want, rtol=1e-4)
+
+def test_binding_capacities_match_exact_mip():
+    # Suppliers 0, 1, 2 and 4 can ship about half of what is asked of them
+    rng = np.random.default_rng(19)
+    n = 40
+    opts = _random_options(rng, n, [600, 400, 500, np.nan, 300, np.nan])
+    demand = pd.DataFrame({"product_id": np.arange(n), "qty": rng.integers(10, 200, n)})
+
+    plan, info = solve_sourcing(demand, opts, order_cost=25, mip_gap=0)
+
+    want, shortfall = _exact(demand, opts, 25)
+    got = (plan["order_qty"] * plan["landed_unit_cost"]).sum() + 25 * len(plan)
+    assert shortfall > 0 and info["unsourced"].sum() == shortfall
+    assert np.isclose(got, want, rtol=1e-4)
+
+    # Product 1 cannot get more than 14 + 19 units; what product 0 leaves of supplier 2 is still used
+    opts = options(product_id=[0, 0, 1, 1], supplier_id=[0, 2, 1, 2], unit_cost=[5.0, 6.0, 7.0, 8.0],
+                   min_order_qty=10, max_order_qty=[np.nan, np.nan, np.nan, 30], capacity_units=[11, 19, 14, 19])
+    demand = pd.DataFrame({"product_id": [0, 1], "qty": [71, 58]})
+    plan, info = solve_sourcing(demand, opts, order_cost=0)
+    assert plan["order_qty"].sum() == 11 + 19 + 14
+    assert info["unsourced"].sum() == _exact(demand, opts, 0)[1]
+
+def test_graph_sources_every_reorder(sqlite_catalog):
+    state = supply_chain_graph.graph.invoke({})
+    frame, plan = state["inventory_frame"], state["sourcing_plan"]
+    flagged = frame.loc[frame["should_reorder"] & (frame["recommended_reorder_qty"] > 0)]
+
+    assert set(plan["product_id"]) <= set(flagged["product_id"])
+    ordered = plan.groupby("product_id")["order_qty"].sum()
+    summary = state["sourcing_summary"]
+    assert summary["rows"] == len(flagged)
+    assert ordered.sum() + summary["unsourced_qty"] >= flagged["recommended_reorder_qty"].sum()
@@ -0,0 +1,18 @@
+from agents.state import InventoryRecords, get_inventory_frame, set_inventory_frame, inventory_records
+from agents.recommend import recommend_reorder_node
+
+def test_nodes_carry_frame_and_records_view(tiny_state):
+    out = recommend_reorder_node(tiny_state)
+
+    assert "inventory_frame" in out
+    assert isinstance(out["inventory_data"], InventoryRecords)
+    assert len(out["inventory_data"]) == 3
+    assert out["inventory_data"][0]["sku"] == "SKU-A"
+    assert [r["product_id"] for r in out["inventory_data"]] == [1, 2, 3]
+
+def test_records_match_frame(tiny_state):
+    frame = get_inventory_frame(tiny_state)
+    state = set_inventory_frame({}, frame)
+
+    assert get_inventory_frame(state) is state["inventory_frame"]
+    assert inventory_records(state) == list(state["inventory_data"])
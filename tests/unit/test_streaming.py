@@ -0,0 +1,21 @@
+from agents.classify_products import abc_thresholds, compute_revenue
+from agents.fetch_inventory import fetch_abc_thresholds
+from pipeline.streaming import run_streaming
+import supply_chain_graph
+
+def test_streaming_matches_full_run(sqlite_catalog, monkeypatch):
+    full = supply_chain_graph.graph.invoke({})["inventory_frame"]
+    monkeypatch.setattr("pipeline.streaming.batch_size_for_memory", lambda mb: 7)
+
+    batches = []
+    out = run_streaming(max_memory_mb=1, on_batch=lambda b: batches.append(len(b)))
+
+    assert max(batches) == 7
+    assert out["risk_summary"]["products"] == len(full) == sum(batches)
+    assert fetch_abc_thresholds() == abc_thresholds(compute_revenue(full))
+
+    expected = full.loc[full["should_reorder"]].sort_values("product_id")
+    reorders = out["inventory_frame"]
+    assert reorders["product_id"].tolist() == expected["product_id"].tolist()
+    assert reorders["recommended_reorder_qty"].tolist() == expected["recommended_reorder_qty"].tolist()
+    assert reorders["computed_financial_class"].tolist() == expected["computed_financial_class"].tolist()
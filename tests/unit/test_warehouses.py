@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import populate_catalog
+from pipeline.sharded import plan_shards, run_sharded
+import supply_chain_graph
+
+@pytest.fixture
+def warehouse_catalog(sqlite_db):
+    populate_catalog(sqlite_db, n_products=30, days=60, n_warehouses=3)
+    return sqlite_db
+
+def test_pipeline_plans_every_product_warehouse(warehouse_catalog):
+    single = supply_chain_graph.graph.invoke({})["inventory_frame"].sort_values(["product_id", "warehouse_id"])
+
+    assert len(single) == 90
+    assert not single.duplicated(["product_id", "warehouse_id"]).any()
+    # Demand and forecasts are per location, not copies of one product total
+    per_location = single.groupby("product_id")["recent_demand_30d"].nunique()
+    assert (per_location > 1).any()
+
+    shards = plan_shards(2, by="warehouse")
+    assert sorted(w for s in shards for w in s["warehouse_ids"]) == [1, 2, 3]
+
+    sharded = run_sharded(2, by="warehouse", mp_context="fork")["inventory_frame"]
+    columns = ["product_id", "warehouse_id", "computed_financial_class", "forecasted_demand_30d",
+               "should_reorder", "recommended_reorder_qty"]
+    pd.testing.assert_frame_equal(sharded[columns].reset_index(drop=True), single[columns].reset_index(drop=True))